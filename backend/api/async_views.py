@@ -0,0 +1,53 @@
+'''Асинхронные обертки для режима ASGI (foodgram.asgi).
+
+Под ASGI Django выполняет синхронные представления в одном общем потоке
+(thread_sensitive=True), поэтому медленный запрос задерживает все
+остальные. Представления из ASYNC_VIEW_NAMES оборачиваются в корутины,
+которые выполняют работу с ORM и рендеринг ответа в пуле потоков, не
+занимая ни цикл событий, ни общий поток.
+'''
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+ASYNC_VIEW_NAMES = (
+    'recipes-list',
+    'recipes-detail',
+    'recipes-download-shopping-cart',
+    'tags-list',
+    'tags-detail',
+    'ingredients-list',
+    'ingredients-detail',
+)
+
+
+def offload(view):
+    '''Корутина, выполняющая синхронное представление в пуле потоков'''
+    def run(request, *args, **kwargs):
+        close_old_connections()
+        try:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+            return response
+        finally:
+            close_old_connections()
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await sync_to_async(run, thread_sensitive=False)(
+            request, *args, **kwargs)
+
+    return async_view
+
+
+def offload_urls(urls, names=ASYNC_VIEW_NAMES):
+    '''Заменяет представления с указанными именами на асинхронные'''
+    return [
+        URLPattern(url.pattern, offload(url.callback),
+                   url.default_args, url.name)
+        if isinstance(url, URLPattern) and url.name in names else url
+        for url in urls
+    ]
@@ -1,20 +1,42 @@
+from django.db.models import F
 from django_filters.rest_framework import FilterSet, filters
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.catalog import get_catalog
+from recipes.models import Recipe
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(field_name='tags__slug',
-                                             to_field_name='slug',
-                                             queryset=Tag.objects.all())
+    # Теги проверяются по маске Recipe.tags_mask без JOIN и DISTINCT:
+    # tags - хотя бы один из тегов, tags_all - все теги сразу.
+    tags = filters.CharFilter(method='tags_filter')
+    tags_all = filters.CharFilter(method='tags_filter')
     is_favorited = filters.BooleanFilter(
         method='is_favorited_filter')
     is_in_shopping_cart = filters.BooleanFilter(
         method='is_in_shopping_cart_filter')
+    ordering = filters.ChoiceFilter(
+        choices=(('trending', 'Популярные сейчас'),),
+        method='ordering_filter')
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author',)
 
+    def tags_filter(self, queryset, name, value):
+        bits = get_catalog().tag_bits()
+        mask = 0
+        for slug in self.data.getlist(name):
+            if slug in bits:
+                mask |= 1 << bits[slug]
+        if not mask:
+            return queryset.none()
+        queryset = queryset.alias(tags_match=F('tags_mask').bitand(mask))
+        if name == 'tags_all':
+            return queryset.filter(tags_match=mask)
+        return queryset.exclude(tags_match=0)
+
+    def ordering_filter(self, queryset, name, value):
+        return queryset.order_by('-trending_score', '-pub_date')
+
     def is_favorited_filter(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
@@ -26,14 +48,3 @@ class RecipeFilter(FilterSet):
         if value and user.is_authenticated:
             return queryset.filter(shopping_recipe__user=user)
         return queryset
-
-
-class IngredientFilter(FilterSet):
-    name = filters.CharFilter(
-        field_name='name',
-        lookup_expr='istartswith',
-    )
-
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
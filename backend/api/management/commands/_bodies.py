@@ -0,0 +1,94 @@
+'''Синтетические JSON-тела по схемам из foodgram.traffic.
+
+Значения в записи не хранятся, поэтому тело собирается заново: строки и
+картинки той же длины, списки той же длины, а id ингредиентов, тегов и
+рецептов берутся из локальной базы, чтобы запрос прошел валидацию и
+выполнил ту же работу, что и исходный.
+'''
+import base64
+import io
+import random
+import string
+from datetime import date
+from functools import lru_cache
+
+from PIL import Image
+from recipes.models import Ingredient, Recipe, Tag
+
+# Схемы старых записей без длины строки.
+DEFAULT_LENGTH = 20
+IMAGE_PREFIX = 'data:image/png;base64,'
+
+
+class BodyFactory:
+    '''Собирает тела по схемам; id объектов загружаются один раз'''
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.ids = {
+            'ingredients': list(Ingredient.objects.values_list(
+                'pk', flat=True)),
+            'tags': list(Tag.objects.values_list('pk', flat=True)),
+            'recipe': list(Recipe.objects.values_list('pk', flat=True)[:1000]),
+        }
+
+    def build(self, schema, key=None):
+        if isinstance(schema, dict) and set(schema) == {'list', 'len'}:
+            return self.build_list(schema['list'], schema['len'], key)
+        if isinstance(schema, dict):
+            return {name: self.build(item, name)
+                    for name, item in schema.items()}
+        if schema == 'bool':
+            return True
+        if schema == 'number':
+            return self.number(key)
+        if isinstance(schema, str) and schema.startswith(('str', 'image')):
+            kind, _, length = schema.partition(':')
+            length = int(length or DEFAULT_LENGTH)
+            if kind == 'image':
+                return image(length)
+            return self.text(key, length)
+        return None
+
+    def build_list(self, item, length, key):
+        if key in self.ids and item in ('number', None):
+            return self.sample(key, length)
+        items = [self.build(item) for _ in range(length)]
+        if key == 'ingredients':
+            for element, pk in zip(items, self.sample(key, length)):
+                element['id'] = pk
+        return items
+
+    def sample(self, key, length):
+        ids = self.ids[key]
+        return self.random.sample(ids, min(length, len(ids)))
+
+    def number(self, key):
+        if key in self.ids and self.ids[key]:
+            return self.random.choice(self.ids[key])
+        if key == 'amount':
+            return self.random.randint(1, 500)
+        if key == 'cooking_time':
+            return self.random.randint(1, 120)
+        return 1
+
+    def text(self, key, length):
+        if key in ('date', 'start', 'end'):
+            return date.today().isoformat()
+        if key == 'email':
+            return f'{self.text(None, max(length - 12, 1))}@example.com'
+        return ''.join(self.random.choices(string.ascii_lowercase,
+                                           k=max(length, 1)))
+
+
+@lru_cache(maxsize=32)
+def image(length):
+    '''data URI картинки PNG примерно length символов (шум не сжимается)'''
+    size = max(length - len(IMAGE_PREFIX), 4) * 3 // 4
+    side = max(int((size / 3) ** 0.5), 1)
+    generator = random.Random(length)
+    picture = Image.frombytes('RGB', (side, side), bytes(
+        generator.getrandbits(8) for _ in range(side * side * 3)))
+    stored = io.BytesIO()
+    picture.save(stored, format='PNG')
+    return IMAGE_PREFIX + base64.b64encode(stored.getvalue()).decode()
@@ -0,0 +1,18 @@
+def percentile(values, percent):
+    '''Перцентиль по отсортированному списку (ближайший ранг)'''
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1,
+                       int(round(percent / 100 * len(values))) - 1))
+    return values[index]
+
+
+def latency_summary(latencies):
+    '''p50/p90/p99/max в миллисекундах'''
+    latencies = sorted(latencies)
+    return {
+        'p50': percentile(latencies, 50) * 1000,
+        'p90': percentile(latencies, 90) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'max': (latencies[-1] if latencies else 0.0) * 1000,
+    }
@@ -0,0 +1,58 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+from ._stats import latency_summary
+
+
+class Command(BaseCommand):
+    help = ('Load an HTTP endpoint with concurrent requests and report '
+            'throughput and latency percentiles (WSGI vs ASGI comparison).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--header', action='append', default=[],
+                            help='"Name: value", can be repeated.')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        headers = dict(
+            header.split(':', 1) for header in options['header'])
+        headers = {name.strip(): value.strip()
+                   for name, value in headers.items()}
+        urls = options['urls']
+        total = options['requests']
+
+        def fetch(number):
+            request = Request(urls[number % len(urls)], headers=headers)
+            started = time.perf_counter()
+            try:
+                with urlopen(request, timeout=options['timeout']) as response:
+                    response.read()
+                    status = response.status
+            except HTTPError as error:
+                status = error.code
+            except (URLError, OSError):
+                status = None
+            return time.perf_counter() - started, status
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(fetch, range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for latency, _ in results]
+        errors = sum(1 for _, status in results
+                     if status is None or status >= 500)
+        summary = latency_summary(latencies)
+        self.stdout.write(
+            f'requests: {total}, concurrency: {options["concurrency"]}, '
+            f'errors: {errors}\n'
+            f'throughput: {total / elapsed:.1f} req/s\n'
+            'latency, ms: ' + ', '.join(
+                f'{name}={value:.1f}' for name, value in summary.items()))
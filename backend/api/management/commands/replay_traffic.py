@@ -0,0 +1,237 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import Client
+from django.urls import NoReverseMatch, reverse
+from foodgram import traffic
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+from ._bodies import BodyFactory
+from ._stats import latency_summary
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Изменение объекта доступно только владельцу: такие запросы идут к
+# объекту, который пользователь записи сначала создает через список.
+OWNED_ROUTES = {'api:recipes-detail': 'api:recipes-list'}
+
+
+class Command(BaseCommand):
+    help = ('Replay traffic recorded by TrafficCaptureMiddleware against '
+            'the Django test client or a running server and report '
+            'latency percentiles and SQL query counts per route.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+',
+                            help='Capture files or directories.')
+        parser.add_argument('--target', default='client',
+                            help='"client" or a base URL, e.g. '
+                                 'http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--limit', type=int, default=0)
+        parser.add_argument('--writes', action='store_true',
+                            help='Also replay unsafe requests: favorite, '
+                                 'shopping_cart, subscribe, and recipe '
+                                 'create/update with synthetic bodies of '
+                                 'the recorded size. Ids in the bodies '
+                                 'come from the local database.')
+        parser.add_argument('--token',
+                            help='With --target URL: API token used for '
+                                 'all authenticated requests; without it '
+                                 'they are skipped.')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--save', help='Write the report to JSON.')
+        parser.add_argument('--baseline',
+                            help='Report saved with --save to compare to.')
+
+    def tokens(self, records, target, token):
+        '''Синтетический пользователь записи -> токен: локального
+        пользователя replay-<id> при прогоне в процессе или --token'''
+        users = {record['user'] for record in records} - {None}
+        if target != 'client':
+            return {user_id: token for user_id in users} if token else {}
+        tokens = {}
+        for user_id in users:
+            user, _ = User.objects.get_or_create(
+                username=f'replay-{user_id}',
+                defaults={'email': f'replay-{user_id}@example.com'})
+            tokens[user_id], _ = Token.objects.get_or_create(user=user)
+        return {user_id: token.key for user_id, token in tokens.items()}
+
+    def plan(self, records, writes, tokens):
+        '''Запросы (маршрут, метод, url, пользователь, тело); url
+        запросов к OWNED_ROUTES - None до создания объекта'''
+        requests, skipped = [], 0
+        bodies = BodyFactory() if writes else None
+        for record in records:
+            safe = record['method'] in SAFE_METHODS
+            if (not safe and not writes) or (
+                    record['user'] is not None
+                    and record['user'] not in tokens):
+                skipped += 1
+                continue
+            body = None
+            if record['body'] is not None:
+                if safe or record['body'] == 'invalid':
+                    skipped += 1
+                    continue
+                body = bodies.build(record['body'])
+            if (record['view'] in OWNED_ROUTES and not safe
+                    and record['user'] is not None):
+                url = None
+            else:
+                try:
+                    url = reverse(record['view'], kwargs=record['kwargs'])
+                except NoReverseMatch:
+                    skipped += 1
+                    continue
+            if url is not None and record['query']:
+                url += '?' + urlencode(record['query'], doseq=True)
+            requests.append((record['view'], record['method'], url,
+                             record['user'], body))
+        return requests, skipped
+
+    def own(self, requests, send, headers):
+        '''Создает по объекту на пользователя для запросов к
+        OWNED_ROUTES и подставляет его в url; неудачные - пропускаются'''
+        owned, result = {}, []
+        for view, method, url, user, body in requests:
+            if url is None:
+                key = (view, user)
+                if key not in owned:
+                    owned[key] = None
+                    if body is not None:
+                        status, _, content = send(
+                            'POST', reverse(OWNED_ROUTES[view]),
+                            headers(user), body)
+                        if status == 201:
+                            owned[key] = json.loads(content)['id']
+                if owned[key] is None:
+                    continue
+                url = reverse(view, kwargs={'pk': owned[key]})
+            result.append((view, method, url, user, body))
+        return result, len(requests) - len(result)
+
+    def handle(self, *args, **options):
+        records = traffic.read(options['paths'])
+        if options['limit']:
+            records = records[:options['limit']]
+        target = options['target']
+        tokens = self.tokens(records, target, options['token'])
+        requests, skipped = self.plan(records, options['writes'], tokens)
+        local = threading.local()
+
+        def send_client(method, url, headers, body=None):
+            if not hasattr(local, 'client'):
+                local.client = Client(raise_request_exception=False)
+            extra = {f'HTTP_{name.upper()}': value
+                     for name, value in headers.items()}
+            if body is not None:
+                extra.update(data=json.dumps(body),
+                             content_type='application/json')
+            with traffic.count_queries() as counter:
+                response = local.client.generic(method, url, **extra)
+            return response.status_code, counter['queries'], response.content
+
+        def send_http(method, url, headers, body=None):
+            data = None
+            if body is not None:
+                data = json.dumps(body).encode('utf-8')
+                headers = {**headers, 'Content-Type': 'application/json'}
+            request = Request(target.rstrip('/') + url, data=data,
+                              method=method, headers=headers)
+            try:
+                with urlopen(request, timeout=options['timeout']) as response:
+                    return (response.status,
+                            response.headers.get('X-Query-Count'),
+                            response.read())
+            except HTTPError as error:
+                return (error.code, error.headers.get('X-Query-Count'),
+                        error.read())
+            except (URLError, OSError):
+                return None, None, b''
+
+        send = send_client if target == 'client' else send_http
+
+        def headers(user):
+            if user is None:
+                return {}
+            return {'Authorization': f'Token {tokens[user]}'}
+
+        requests, not_owned = self.own(requests, send, headers)
+        skipped += not_owned
+
+        def replay(item):
+            view, method, url, user, body = item
+            started = time.perf_counter()
+            status, queries, _ = send(method, url, headers(user), body)
+            if method not in SAFE_METHODS:
+                view = f'{method} {view}'
+            return view, time.perf_counter() - started, status, queries
+
+        def run(item):
+            try:
+                return replay(item)
+            finally:
+                if target == 'client':
+                    close_old_connections()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(run, requests))
+        elapsed = time.perf_counter() - started
+
+        report = self.report(results)
+        self.stdout.write(
+            f'replayed: {len(results)}, skipped: {skipped}, '
+            f'concurrency: {options["concurrency"]}, '
+            f'throughput: {len(results) / max(elapsed, 1e-9):.1f} req/s')
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as saved:
+                baseline = json.load(saved)
+        for view, row in sorted(report.items(),
+                                key=lambda item: -item[1]['total']):
+            line = (f'{view}: n={row["count"]}, errors={row["errors"]}, '
+                    + ', '.join(f'{name}={row[name]:.1f}'
+                                for name in ('p50', 'p90', 'p99', 'max')))
+            if row['queries'] is not None:
+                line += f', queries={row["queries"]:.1f}'
+            old = baseline.get(view)
+            if old:
+                line += ' | vs baseline: ' + ', '.join(
+                    f'{name} {row[name] - old[name]:+.1f}'
+                    for name in ('p50', 'p99', 'queries')
+                    if row[name] is not None and old[name] is not None)
+            self.stdout.write(line)
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as saved:
+                json.dump(report, saved, ensure_ascii=False, indent=2)
+
+    def report(self, results):
+        '''Перцентили (мс), ошибки и среднее число запросов к БД
+        по маршрутам'''
+        grouped = defaultdict(list)
+        for view, latency, status, queries in results:
+            grouped[view].append((latency, status, queries))
+        report = {}
+        for view, rows in grouped.items():
+            counts = [int(queries) for _, _, queries in rows
+                      if queries is not None]
+            report[view] = dict(
+                latency_summary([latency for latency, _, _ in rows]),
+                count=len(rows),
+                total=sum(latency for latency, _, _ in rows),
+                errors=sum(1 for _, status, _ in rows
+                           if status is None or status >= 500),
+                queries=sum(counts) / len(counts) if counts else None,
+            )
+        return report
@@ -0,0 +1,166 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from statistics import median
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в отдельном процессе: фазы запуска с нуля и время
+# import_models()/ready() каждого приложения, результат - JSON в stdout.
+CHILD = '''
+import json, os, time
+started = time.perf_counter()
+phases, apps = {}, {}
+from foodgram.startup import skip_optional_imports
+skip_optional_imports()
+
+
+def mark(name, since):
+    now = time.perf_counter()
+    phases[name] = (now - since) * 1000
+    return now
+
+
+from django.apps import AppConfig
+from django.conf import settings
+now = mark('django', started)
+settings.INSTALLED_APPS
+now = mark('settings', now)
+create = AppConfig.create.__func__
+
+
+def timed_create(cls, entry):
+    config = create(cls, entry)
+    for method in ('import_models', 'ready'):
+        def timed(original=getattr(config, method), method=method,
+                  label=config.label):
+            begin = time.perf_counter()
+            original()
+            apps.setdefault(label, {})[method] = (
+                time.perf_counter() - begin) * 1000
+        setattr(config, method, timed)
+    return config
+
+
+AppConfig.create = classmethod(timed_create)
+import django
+django.setup(set_prefix=False)
+now = mark('apps', now)
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+now = mark('wsgi', now)
+from django.urls import get_resolver
+get_resolver().url_patterns
+now = mark('urls', now)
+if os.environ.get('STARTUP_PROFILE_WARM_UP'):
+    from foodgram.startup import warm_up
+    warm_up()
+    now = mark('warm_up', now)
+phases['total'] = (now - started) * 1000
+print(json.dumps({'phases': phases, 'apps': apps}))
+'''
+
+PHASES = ('process', 'django', 'settings', 'apps', 'wsgi', 'urls',
+          'warm_up', 'total')
+
+
+class Command(BaseCommand):
+    help = ('Measure cold start in fresh processes: time to import Django, '
+            'load settings, populate apps (import_models and ready per '
+            'app), build the WSGI handler, import the URLConf and views '
+            'and, with --warm-up, run foodgram.startup.warm_up(). '
+            'STARTUP_SKIP_MODULES is applied as in foodgram.wsgi. Also '
+            'reports import time per package from python -X importtime.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--top', type=int, default=15)
+        parser.add_argument('--warm-up', action='store_true')
+        parser.add_argument('--no-skip', action='store_true',
+                            help='Ignore STARTUP_SKIP_MODULES (boot time '
+                                 'without the optimization).')
+        parser.add_argument('--save', help='Write the report to JSON.')
+        parser.add_argument('--baseline',
+                            help='Report saved with --save to compare to.')
+
+    def run(self, env, importtime=False):
+        command = [sys.executable]
+        if importtime:
+            command += ['-X', 'importtime']
+        started = time.perf_counter()
+        result = subprocess.run(command + ['-c', CHILD], env=env,
+                                cwd=settings.BASE_DIR,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE,
+                                universal_newlines=True)
+        elapsed = (time.perf_counter() - started) * 1000
+        if result.returncode:
+            raise CommandError(result.stderr[-3000:])
+        data = json.loads(result.stdout.strip().splitlines()[-1])
+        data['phases']['process'] = elapsed
+        return data, result.stderr
+
+    def imports(self, stderr):
+        '''Собственное время импорта (мс) по пакетам и модулям'''
+        packages, modules = defaultdict(float), {}
+        for line in stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            own, cumulative, name = line[len('import time:'):].split('|')
+            name = name.strip()
+            packages[name.split('.')[0]] += int(own) / 1000
+            modules[name] = (int(own) / 1000, int(cumulative) / 1000)
+        return packages, modules
+
+    def handle(self, *args, **options):
+        env = dict(os.environ,
+                   DJANGO_SETTINGS_MODULE=os.environ.get(
+                       'DJANGO_SETTINGS_MODULE', 'foodgram.settings'))
+        if options['no_skip']:
+            env['STARTUP_SKIP_MODULES'] = ''
+        if options['warm_up']:
+            env['STARTUP_PROFILE_WARM_UP'] = '1'
+        runs = [self.run(env)[0] for _ in range(options['repeat'])]
+        _, stderr = self.run(env, importtime=True)
+        packages, modules = self.imports(stderr)
+
+        phases = {
+            phase: median(run['phases'][phase] for run in runs)
+            for phase in PHASES if phase in runs[0]['phases']}
+        apps = {
+            label: {method: median(run['apps'][label].get(method, 0)
+                                   for run in runs)
+                    for method in ('import_models', 'ready')}
+            for label in runs[0]['apps']}
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as saved:
+                baseline = json.load(saved)['phases']
+
+        self.stdout.write(f'Median of {len(runs)} runs, ms:')
+        for phase, value in phases.items():
+            line = f'  {phase:<10}{value:8.1f}'
+            if phase in baseline:
+                line += f'  ({value - baseline[phase]:+.1f} vs baseline)'
+            self.stdout.write(line)
+        self.stdout.write('Apps (import_models / ready), ms:')
+        for label, row in sorted(apps.items(), key=lambda item: -sum(
+                item[1].values())):
+            self.stdout.write(f'  {label:<16}{row["import_models"]:7.1f} '
+                              f'{row["ready"]:7.1f}')
+        self.stdout.write('Import time by package (-X importtime), ms:')
+        for name, value in sorted(packages.items(),
+                                  key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'  {name:<28}{value:8.1f}')
+        self.stdout.write('Slowest modules (self / cumulative), ms:')
+        slowest = sorted(modules.items(), key=lambda item: -item[1][0])
+        for name, (own, cumulative) in slowest[:options['top']]:
+            self.stdout.write(f'  {name:<40}{own:8.1f}{cumulative:9.1f}')
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as saved:
+                json.dump({'phases': phases, 'apps': apps,
+                           'packages': packages}, saved, indent=2)
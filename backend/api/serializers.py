@@ -5,10 +5,13 @@ from django.contrib.auth.password_validation import validate_password
 from django.core import exceptions
 from django.core.files.base import ContentFile
 from django.core.validators import MinValueValidator
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingСart, Tag)
+from jobs.models import Job
+from recipes import similarity
+from recipes.catalog import get_catalog
+from recipes.models import (Favorite, Ingredient, IngredientRecipe,
+                            MealPlanEntry, Recipe, ShoppingСart, Tag)
 from rest_framework import serializers
 from users.models import Subscribe
 
@@ -48,6 +51,14 @@ class UserReadSerializer(UserSerializer):
         return False
 
 
+class UserStatsSerializer(serializers.ModelSerializer):
+    '''Счетчики автора - из денормализованных полей, без COUNT'''
+    class Meta:
+        model = User
+        fields = ('id', 'username', 'followers_count', 'following_count',
+                  'recipes_count')
+
+
 class UserCreateSerializer(UserCreateSerializer):
     '''Создание нового пользователя - метод POST'''
     class Meta:
@@ -138,7 +149,7 @@ class SubscriptionsSerializer(serializers.ModelSerializer):
                                          author=obj).exists())
 
     def get_recipes_amount(self, obj):
-        return obj.recipe.count()
+        return obj.recipes_count
 
     def get_recipes(self, obj):
         request = self.context.get('request')
@@ -178,7 +189,7 @@ class SubscribeAuthorSerializer(serializers.ModelSerializer):
                                          author=obj).exists())
 
     def get_recipes_amount(self, obj):
-        return obj.recipe.count()
+        return obj.recipes_count
 
 
 # ┌----------------------------------------------------------------------┐
@@ -190,14 +201,14 @@ class IngredientSerializer(serializers.ModelSerializer):
     '''Список ингредиентов - метод GET'''
     class Meta:
         model = Ingredient
-        fields = '__all__'
+        fields = ('id', 'name', 'measurement_unit')
 
 
 class TagSerializer(serializers.ModelSerializer):
     '''Список тегов - метод GET'''
     class Meta:
         model = Tag
-        fields = '__all__'
+        fields = ('id', 'name', 'color', 'slug')
 
 
 class IngredientRecipeSerializer(serializers.ModelSerializer):
@@ -316,6 +327,11 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Ингредиенты в рецепте должны быть уникальными!'
             )
+        missing = get_catalog().missing_ingredients(ids)
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {missing}!'
+            )
         return ingredients
 
     def validate_cooking_time(self, value):
@@ -332,24 +348,63 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         IngredientRecipe.objects.bulk_create(
             [IngredientRecipe(
                 recipe=recipe,
-                ingredient=Ingredient.objects.get(pk=ingredient['id']),
+                ingredient_id=ingredient['id'],
                 amount=ingredient['amount']
             ) for ingredient in ingredients]
         )
+        similarity.update_index(
+            recipe.pk, [ingredient['id'] for ingredient in ingredients])
+
+    @staticmethod
+    def fingerprint(data, ingredients):
+        return Recipe.make_fingerprint(
+            data['name'], data['cooking_time'],
+            [(item['id'], item['amount']) for item in ingredients])
 
-    @transaction.atomic
     def create(self, validated_data):
-        validated_data.pop('author')
+        '''Повторная отправка того же рецепта тем же автором
+        возвращает уже созданный рецепт'''
+        validated_data.pop('author', None)
+        author = self.context['request'].user
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(author=self.context['request'].user,
-                                       **validated_data)
-        self.tags_and_ingredients_set(recipe, tags, ingredients)
+        fingerprint = self.fingerprint(validated_data, ingredients)
+        duplicate = Recipe.objects.filter(
+            author=author, fingerprint=fingerprint).first()
+        if duplicate is not None:
+            return duplicate
+        try:
+            with transaction.atomic():
+                recipe = Recipe.objects.create(
+                    author=author, fingerprint=fingerprint, **validated_data)
+                self.tags_and_ingredients_set(recipe, tags, ingredients)
+        except IntegrityError:
+            # Такой же рецепт только что создан параллельным запросом;
+            # другие нарушения ограничений не маскируются.
+            duplicate = Recipe.objects.filter(
+                author=author, fingerprint=fingerprint).first()
+            if duplicate is None:
+                raise
+            return duplicate
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        instance.image = validated_data.get('image', instance.image)
+        fingerprint = self.fingerprint(
+            {'name': validated_data.get('name', instance.name),
+             'cooking_time': validated_data.get(
+                 'cooking_time', instance.cooking_time)},
+            validated_data['ingredients'])
+        if Recipe.objects.filter(
+                author=instance.author, fingerprint=fingerprint,
+        ).exclude(pk=instance.pk).exists():
+            raise serializers.ValidationError(
+                'У вас уже есть такой же рецепт!')
+        instance.fingerprint = fingerprint
+        image = validated_data.get('image')
+        if image is not None and not instance.image.storage.contains(
+                instance.image.name, image):
+            instance.image = image
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
         instance.cooking_time = validated_data.get(
@@ -366,3 +421,40 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         return RecipeReadSerializer(instance,
                                     context=self.context).data
+
+
+class ShoppingCartSerializer(serializers.ModelSerializer):
+    '''Множитель порций рецепта в списке покупок'''
+    class Meta:
+        model = ShoppingСart
+        fields = ('multiplier',)
+
+
+class MealPlanEntrySerializer(serializers.ModelSerializer):
+    '''Рецепт в плане питания: запись - id рецепта, чтение - краткий
+    рецепт'''
+    recipe = serializers.PrimaryKeyRelatedField(
+        queryset=Recipe.objects.all())
+
+    class Meta:
+        model = MealPlanEntry
+        fields = ('id', 'recipe', 'date', 'multiplier')
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['recipe'] = RecipeSerializer(instance.recipe,
+                                          context=self.context).data
+        return data
+
+
+# ┌----------------------------------------------------------------------┐
+# |                         Приложение Jobs                              |
+# └----------------------------------------------------------------------┘
+
+
+class JobSerializer(serializers.ModelSerializer):
+    '''Статус фоновой задачи - метод GET'''
+    class Meta:
+        model = Job
+        fields = ('id', 'name', 'status', 'attempts', 'result',
+                  'created', 'finished_at')
@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from recipes.models import Recipe
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica'],
+    CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ReplicaRoutingTest(TransactionTestCase):
+    '''GET читает из реплики, кроме клиента, только что выполнившего
+    запись: он читает из основной базы.'''
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        user = User.objects.create_user(
+            username='reader', email='reader@example.com')
+        self.recipe = Recipe.objects.create(
+            author=user, name='Рецепт', image='recipes/x.jpg',
+            text='Текст', cooking_time=10)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}')
+
+    def read(self, url):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(primary), len(replica)
+
+    def test_get_reads_from_replica(self):
+        _, replica = self.read(reverse('api:recipes-list'))
+        self.assertGreater(replica, 0)
+
+    def test_get_after_write_reads_from_primary(self):
+        response = self.client.post(
+            reverse('api:recipes-favorite', args=[self.recipe.pk]))
+        self.assertEqual(response.status_code, 201)
+        primary, replica = self.read(reverse('api:recipes-list'))
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from foodgram import metrics
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+
+class WriteRateThrottle(BaseThrottle):
+    '''Token bucket на пользователя (аноним - на IP) для дорогих
+    изменяющих запросов, подключается через throttle_classes: запас
+    WRITE_THROTTLE_BURST запросов пополняется со скоростью
+    WRITE_THROTTLE_RATE в секунду. При пустом запасе - 429 с
+    Retry-After. Состояние хранится в кэше без блокировок, поэтому
+    одновременные запросы могут изредка пройти сверх лимита; при
+    WRITE_THROTTLE_RATE = 0 (по умолчанию) лимита нет.'''
+
+    def __init__(self):
+        self.delay = None
+
+    def allow_request(self, request, view):
+        rate = settings.WRITE_THROTTLE_RATE
+        if request.method in SAFE_METHODS or not rate:
+            return True
+        burst = settings.WRITE_THROTTLE_BURST
+        if request.user and request.user.is_authenticated:
+            ident = f'user-{request.user.pk}'
+        else:
+            ident = f'ip-{self.get_ident(request)}'
+        key = f'throttle-write:{ident}'
+        now = time.time()
+        tokens, updated = cache.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens < 1:
+            self.delay = (1 - tokens) / rate
+            metrics.increment('throttled_total', scope='write')
+            return False
+        cache.set(key, (tokens - 1, now), int(burst / rate) + 1)
+        return True
+
+    def wait(self):
+        return self.delay
@@ -1,7 +1,10 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from .async_views import offload_urls
+from .views import (IngredientViewSet, JobViewSet, MealPlanViewSet,
+                    RecipeViewSet, TagViewSet, UserViewSet)
 
 app_name = 'api'
 
@@ -10,9 +13,14 @@ router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('tags', TagViewSet, basename='tags')
 router.register('users', UserViewSet, basename='users')
+router.register('jobs', JobViewSet, basename='jobs')
+router.register('meal_plan', MealPlanViewSet, basename='meal_plan')
 
+router_urls = router.urls
+if settings.ASYNC_VIEWS:
+    router_urls = offload_urls(router_urls)
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(router_urls)),
     path(r'auth/', include('djoser.urls.authtoken'))
 ]
@@ -1,25 +1,44 @@
-from datetime import date, datetime
+import os
 
-from django.db import IntegrityError
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseRedirect)
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
-from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+from jobs.models import Job
+from jobs.queue import enqueue
+from recipes.catalog import get_catalog
+from recipes.changes import changes_since
+from recipes.meal_plan import plan_items
+from recipes.models import (Favorite, Ingredient, MealPlanEntry, Recipe,
+                            RecipeActivity, RemovedIngredient, Sequence,
                             ShoppingСart, Tag)
+from recipes.search import search_ingredients
+from recipes.shopping_list import (render_items, shopping_list_document,
+                                   shopping_list_filename)
+from recipes.similarity import similar_recipes
 from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from users.models import Subscribe, User
 
-from .filters import IngredientFilter, RecipeFilter
-from .serializers import (IngredientSerializer, RecipeCreateSerializer,
+from .facets import recipe_facets
+from .filters import RecipeFilter
+from .serializers import (IngredientSerializer, JobSerializer,
+                          MealPlanEntrySerializer, RecipeCreateSerializer,
                           RecipeReadSerializer, RecipeSerializer,
-                          SetPasswordSerializer, SubscribeAuthorSerializer,
-                          SubscriptionsSerializer, TagSerializer,
-                          UserCreateSerializer, UserReadSerializer)
+                          SetPasswordSerializer, ShoppingCartSerializer,
+                          SubscribeAuthorSerializer, SubscriptionsSerializer,
+                          TagSerializer, UserCreateSerializer,
+                          UserReadSerializer, UserStatsSerializer)
+from .throttling import WriteRateThrottle
 from .user_permissions import IsAuthorOrReadOnly
 
 
@@ -27,6 +46,19 @@ class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
 
 
+def is_async(request):
+    '''Клиент просит выполнить тяжелую операцию в фоне (?async=true)'''
+    return request.query_params.get('async') in ('true', '1')
+
+
+def job_accepted(job):
+    '''Ответ 202 на поставленную в очередь задачу'''
+    response = Response(JobSerializer(job).data,
+                        status=status.HTTP_202_ACCEPTED)
+    response['Location'] = reverse('api:jobs-detail', args=[job.pk])
+    return response
+
+
 class UserViewSet(mixins.CreateModelMixin,
                   mixins.ListModelMixin,
                   mixins.RetrieveModelMixin,
@@ -36,11 +68,24 @@ class UserViewSet(mixins.CreateModelMixin,
     permission_classes = (AllowAny,)
     pagination_class = CustomPagination
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if (self.action == 'list'
+                and self.request.query_params.get('ordering') == 'popular'):
+            # Индекс user_popular_idx.
+            queryset = queryset.order_by('-followers_count', 'id')
+        return queryset
+
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return UserReadSerializer
         return UserCreateSerializer
 
+    @action(detail=True)
+    def stats(self, request, **kwargs):
+        '''Подписчики, подписки и рецепты автора'''
+        return Response(UserStatsSerializer(self.get_object()).data)
+
     @action(detail=False, methods=['get'],
             pagination_class=CustomPagination,
             permission_classes=(IsAuthenticated,))
@@ -50,6 +95,21 @@ class UserViewSet(mixins.CreateModelMixin,
         return Response(serializer.data,
                         status=status.HTTP_200_OK)
 
+    @action(detail=False, url_path='me/changes',
+            permission_classes=(IsAuthenticated,))
+    def changes(self, request):
+        '''Добавления и удаления в избранном и списке покупок после
+        курсора since'''
+        since = request.query_params.get('since')
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                return Response(
+                    {'errors': 'Параметр since должен быть числом!'},
+                    status=status.HTTP_400_BAD_REQUEST)
+        return Response(changes_since(request.user, since))
+
     @action(detail=False, methods=['post'],
             permission_classes=(IsAuthenticated,))
     def set_password(self, request):
@@ -72,7 +132,8 @@ class UserViewSet(mixins.CreateModelMixin,
         return self.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post', 'delete'],
-            permission_classes=(IsAuthenticated,))
+            permission_classes=(IsAuthenticated,),
+            throttle_classes=(WriteRateThrottle,))
     def subscribe(self, request, **kwargs):
         '''Подписаться на автора'''
         author = get_object_or_404(User, id=kwargs['pk'])
@@ -82,7 +143,8 @@ class UserViewSet(mixins.CreateModelMixin,
             serializer = SubscribeAuthorSerializer(
                 author, data=request.data, context={'request': request})
             serializer.is_valid(raise_exception=True)
-            Subscribe.objects.create(user=user, author=author)
+            with transaction.atomic():
+                Subscribe.objects.create(user=user, author=author)
             return Response(serializer.data,
                             status=status.HTTP_201_CREATED)
 
@@ -106,7 +168,59 @@ class IngredientViewSet(mixins.ListModelMixin,
     permission_classes = (AllowAny,)
     serializer_class = IngredientSerializer
     pagination_class = None
-    filterset_class = IngredientFilter
+    lookup_value_regex = r'\d+'
+
+    def list(self, request, *args, **kwargs):
+        '''Поиск по началу названия; с fuzzy=true - с опечатками и по
+        любому слову названия'''
+        name = request.query_params.get('name')
+        if name and request.query_params.get('fuzzy') in ('true', '1'):
+            return Response(search_ingredients(name))
+        return Response(get_catalog().ingredients(name))
+
+    def retrieve(self, request, *args, **kwargs):
+        ingredient = get_catalog().ingredient(int(kwargs['pk']))
+        if ingredient is None:
+            raise Http404
+        return Response(ingredient)
+
+    @action(detail=False)
+    def snapshot(self, request):
+        '''Полный справочник, кэшируется бессрочно по версии'''
+        catalog = get_catalog()
+        if request.query_params.get('version') != str(catalog.version):
+            response = HttpResponseRedirect(
+                f'{request.path}?version={catalog.version}')
+            response['Cache-Control'] = 'no-cache'
+            return response
+        compressed = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        response = HttpResponse(catalog.snapshot(compressed),
+                                content_type='application/json')
+        if compressed:
+            response['Content-Encoding'] = 'gzip'
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        response['ETag'] = f'"{catalog.version}"'
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+    @action(detail=False)
+    def changes(self, request):
+        '''Ингредиенты, добавленные, измененные и удаленные после since'''
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            return Response({'errors': 'Параметр since должен быть числом!'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        version = Sequence.current_value(Ingredient.VERSION_SEQUENCE)
+        window = {'version__gt': since, 'version__lte': version}
+        changed = Ingredient.objects.filter(**window).order_by('id')
+        removed = RemovedIngredient.objects.filter(**window).values_list(
+            'ingredient_id', flat=True)
+        return Response({
+            'version': version,
+            'changed': IngredientSerializer(changed, many=True).data,
+            'removed': sorted(set(removed)),
+        })
 
 
 class TagViewSet(mixins.ListModelMixin,
@@ -117,6 +231,16 @@ class TagViewSet(mixins.ListModelMixin,
     permission_classes = (AllowAny,)
     pagination_class = None
     serializer_class = TagSerializer
+    lookup_value_regex = r'\d+'
+
+    def list(self, request, *args, **kwargs):
+        return Response(get_catalog().tags())
+
+    def retrieve(self, request, *args, **kwargs):
+        tag = get_catalog().tag(int(kwargs['pk']))
+        if tag is None:
+            raise Http404
+        return Response(tag)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -136,23 +260,66 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeReadSerializer
         return RecipeCreateSerializer
 
+    def get_throttles(self):
+        '''Лимит записи - только на создание и изменение рецепта'''
+        if self.action in ('create', 'partial_update'):
+            return [WriteRateThrottle()]
+        return super().get_throttles()
+
+    def list(self, request, *args, **kwargs):
+        '''Список рецептов; с facets=true - еще и счетчики для фильтров'''
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets') in ('true', '1'):
+            response.data['facets'] = recipe_facets(
+                self.filter_queryset(self.get_queryset()))
+        return response
+
+    def destroy(self, request, *args, **kwargs):
+        '''Удаление рецепта; с async=true - в фоновой задаче'''
+        if not is_async(request):
+            return super().destroy(request, *args, **kwargs)
+        recipe = self.get_object()
+        return job_accepted(enqueue(
+            'recipes.delete_recipes', {'recipe_ids': [recipe.pk]},
+            user=request.user,
+            idempotency_key=f'recipes.delete_recipes:{recipe.pk}'))
+
     def perform_create(self, serializer):
         '''Получение объекта - автор рецепта'''
         serializer.save(author=self.request.user)
 
+    @action(detail=True)
+    def similar(self, request, **kwargs):
+        '''Рецепты с похожим набором ингредиентов'''
+        recipe = self.get_object()
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+        except ValueError:
+            limit = 10
+        scores = dict(similar_recipes(recipe.pk, limit=limit))
+        recipes = sorted(Recipe.objects.filter(pk__in=scores),
+                         key=lambda item: -scores[item.pk])
+        data = RecipeSerializer(recipes, many=True).data
+        for item in data:
+            item['similarity'] = round(scores[item['id']], 3)
+        return Response(data)
+
     @action(detail=True, methods=['post', 'delete'],
-            permission_classes=(IsAuthenticated,))
+            permission_classes=(IsAuthenticated,),
+            throttle_classes=(WriteRateThrottle,))
     def favorite(self, request, **kwargs):
         '''Добавление или удаление рецепта из избранного'''
         recipe = get_object_or_404(Recipe, id=kwargs['pk'])
         if request.method == 'POST':
             try:
-                Favorite.objects.create(user=request.user, recipe=recipe)
+                with transaction.atomic():
+                    Favorite.objects.create(user=request.user, recipe=recipe)
             except IntegrityError:
                 return Response(
                     {'errors':
                      'Вы уже добавляли этот рецепт в список покупок!'},
                     status=status.HTTP_400_BAD_REQUEST)
+            RecipeActivity.record(recipe)
             serializer = RecipeSerializer(recipe)
             return Response(
                 serializer.data,
@@ -160,37 +327,56 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
 
         if request.method == 'DELETE':
-            get_object_or_404(Favorite, user=request.user,
-                              recipe=recipe).delete()
+            with transaction.atomic():
+                get_object_or_404(Favorite, user=request.user,
+                                  recipe=recipe).delete()
             return Response(
                 {'detail': 'Вы успешно удалили рецепт из избранного!'},
                 status=status.HTTP_204_NO_CONTENT)
         return Response({'detail': 'Проверьте метод'},
                         status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=True, methods=['post', 'delete'],
+    @action(detail=True, methods=['post', 'patch', 'delete'],
             permission_classes=(IsAuthenticated,),
-            pagination_class=CustomPagination)
+            pagination_class=CustomPagination,
+            throttle_classes=(WriteRateThrottle,))
     def shopping_cart(self, request, **kwargs):
-        '''Добавление или удаление рецепта из списока покупок'''
+        '''Добавление или удаление рецепта из списока покупок, изменение
+        множителя порций (multiplier)'''
         recipe = get_object_or_404(Recipe, id=kwargs['pk'])
 
         if request.method == 'POST':
             serializer = RecipeSerializer(recipe, data=request.data,
                                           context={"request": request})
             serializer.is_valid(raise_exception=True)
+            entry = ShoppingCartSerializer(data=request.data)
+            entry.is_valid(raise_exception=True)
             if not ShoppingСart.objects.filter(user=request.user,
                                                recipe=recipe).exists():
-                ShoppingСart.objects.create(user=request.user, recipe=recipe)
-                return Response(serializer.data,
+                with transaction.atomic():
+                    entry.save(user=request.user, recipe=recipe)
+                RecipeActivity.record(recipe)
+                return Response(dict(serializer.data, **entry.data),
                                 status=status.HTTP_201_CREATED)
             return Response(
                 {'errors': 'Вы уже добавляли этот рецепт в список покупок!'},
                 status=status.HTTP_400_BAD_REQUEST)
 
+        if request.method == 'PATCH':
+            entry = ShoppingCartSerializer(
+                get_object_or_404(ShoppingСart, user=request.user,
+                                  recipe=recipe),
+                data=request.data)
+            entry.is_valid(raise_exception=True)
+            entry.save()
+            serializer = RecipeSerializer(recipe,
+                                          context={'request': request})
+            return Response(dict(serializer.data, **entry.data))
+
         if request.method == 'DELETE':
-            get_object_or_404(ShoppingСart, user=request.user,
-                              recipe=recipe).delete()
+            with transaction.atomic():
+                get_object_or_404(ShoppingСart, user=request.user,
+                                  recipe=recipe).delete()
             return Response(
                 {'detail': 'Вы успешно удалили рецепт из списка покупок!'},
                 status=status.HTTP_204_NO_CONTENT)
@@ -202,34 +388,102 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def download_shopping_cart(self, request):
         '''Формирование и скачивание файла с ингредиентами'''
         user = request.user
-        current_date = date.today()
-        current_date_time = datetime.now().time()
         if not user.shopping_cart.exists():
             return Response(
                 {'detail': 'Ваш список покупок пуст!'},
                 status=status.HTTP_400_BAD_REQUEST)
-
-        ingredients = (
-            IngredientRecipe.objects
-            .filter(recipe__shopping_recipe__user=user)
-            .values('ingredient')
-            .annotate(total=Sum('amount'))
-            .values_list('ingredient__name', 'total',
-                         'ingredient__measurement_unit')
-        )
-        items_to_buy = (
-            f'Дата: {current_date.strftime("%d/%m/%Y")}\n'
-            f'Время: {current_date_time.strftime("%H:%M:%S")}\n\n'
-            f'{str(user)}, купи эти продукты:\n'
-        )
-        i = 1
-        for ingredient in ingredients:
-            items_to_buy += ''.join(
-                '{}. {} - {} {}.\n'.format(i, *ingredient))
-            i += 1
-
-        filename = f'{user.username}_items_to_buy.txt'
-        response = HttpResponse(items_to_buy, content_type='text/plain')
+        if is_async(request):
+            return job_accepted(enqueue(
+                'recipes.export_shopping_cart', {'user_id': user.pk},
+                user=user, priority=10))
+
+        filename = shopping_list_filename(user)
+        document = shopping_list_document(user)
+        if settings.SHOPPING_LIST_X_ACCEL:
+            # Файл отдает nginx, доступ уже проверен.
+            response = HttpResponse(
+                content_type='text/plain; charset=utf-8')
+            response['X-Accel-Redirect'] = (
+                settings.SHOPPING_LIST_ACCEL_PREFIX + document)
+        else:
+            path = os.path.join(settings.SHOPPING_LIST_ROOT, document)
+            response = FileResponse(
+                open(path, 'rb'), content_type='text/plain; charset=utf-8')
+            # nginx выставляет его сам.
+            response['Last-Modified'] = http_date(os.path.getmtime(path))
         response['Content-Disposition'] = f'attachment; filename={filename}'
 
         return response
+
+
+class MealPlanViewSet(viewsets.ModelViewSet):
+    '''План питания пользователя (рецепты по дням) и список покупок
+    на период'''
+    serializer_class = MealPlanEntrySerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = None
+    http_method_names = ['get', 'post', 'patch', 'delete']
+
+    def period(self, required):
+        '''Период из параметров start и end (ГГГГ-ММ-ДД)'''
+        params = self.request.query_params
+        if not required and 'start' not in params and 'end' not in params:
+            return None
+        try:
+            start = parse_date(params.get('start', ''))
+            end = parse_date(params.get('end', ''))
+        except ValueError:
+            start = end = None
+        if start is None or end is None or start > end:
+            raise ValidationError(
+                {'errors': 'Укажите период: start и end в формате '
+                           'ГГГГ-ММ-ДД, start не позже end!'})
+        if (end - start).days >= settings.MEAL_PLAN_MAX_DAYS:
+            raise ValidationError(
+                {'errors': f'Период не длиннее '
+                           f'{settings.MEAL_PLAN_MAX_DAYS} дней!'})
+        return start, end
+
+    def get_queryset(self):
+        queryset = MealPlanEntry.objects.filter(
+            user=self.request.user).select_related('recipe')
+        if self.action == 'list':
+            period = self.period(required=False)
+            if period is not None:
+                queryset = queryset.filter(date__range=period)
+        return queryset
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+
+    @action(detail=False)
+    def download_shopping_list(self, request):
+        '''Список покупок по плану за период из итогов по дням'''
+        start, end = self.period(required=True)
+        user = request.user
+        response = HttpResponse(
+            render_items(user, plan_items(user, start, end), (start, end)),
+            content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = (
+            f'attachment; filename={user.username}_meal_plan_'
+            f'{start:%Y%m%d}_{end:%Y%m%d}.txt')
+        return response
+
+
+class JobViewSet(mixins.RetrieveModelMixin,
+                 viewsets.GenericViewSet):
+    '''Статус фоновой задачи, поставленной пользователем'''
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
@@ -0,0 +1,10 @@
+def pytest_configure(config):
+    '''Реплика для тестов маршрутизации чтения - зеркало основной базы.
+
+    В DATABASE_REPLICAS она не попадает: тесты, которым нужна реплика,
+    включают ее через override_settings.
+    '''
+    from django.conf import settings
+
+    settings.DATABASES.setdefault('replica', dict(
+        settings.DATABASES['default'], TEST={'MIRROR': 'default'}))
@@ -0,0 +1,107 @@
+'''Ограничение числа одновременных запросов к дорогим маршрутам.
+
+Маршрут - метод и имя представления ("GET api:recipes-list"); для
+страниц списка дальше ADMISSION_DEEP_PAGE к имени добавляется " deep".
+Лимиты задает ADMISSION_ROUTES и действуют они на весь хост: слот - это
+файл в ADMISSION_DIR, занятый через flock, поэтому их делят все воркеры
+gunicorn и потоки, а слот упавшего процесса освобождает ядро.
+
+Запрос, не получивший слот, ждет в очереди из ADMISSION_QUEUE_SIZE мест
+(места - такие же файлы) не дольше ADMISSION_MAX_WAIT секунд, проверяя
+слоты каждые POLL_INTERVAL секунд. Если мест в очереди нет или время
+вышло, клиент сразу получает 503 с Retry-After: перегруженный маршрут не
+занимает всех воркеров, и дешевые запросы (теги, ингредиенты)
+продолжают обслуживаться.
+'''
+import os
+import random
+import re
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from . import metrics
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+POLL_INTERVAL = 0.01
+
+_unsafe = re.compile(r'[^\w.-]+')
+
+
+def available():
+    return fcntl is not None
+
+
+def route(request):
+    '''Маршрут запроса для ADMISSION_ROUTES или None'''
+    match = request.resolver_match
+    if match is None or not match.view_name:
+        return None
+    name = f'{request.method} {match.view_name}'
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+    if page > settings.ADMISSION_DEEP_PAGE:
+        name += ' deep'
+    return name
+
+
+def _lock_any(prefix, count):
+    '''Занимает любой свободный из count файлов prefix.N; возвращает
+    дескриптор или None'''
+    os.makedirs(settings.ADMISSION_DIR, exist_ok=True)
+    start = random.randrange(count) if count else 0
+    for index in range(count):
+        path = f'{prefix}.{(start + index) % count}'
+        descriptor = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(descriptor)
+            continue
+        return descriptor
+    return None
+
+
+def acquire(name, limit):
+    '''Слот маршрута: (дескриптор, None) или (None, причина отказа)'''
+    prefix = os.path.join(settings.ADMISSION_DIR, _unsafe.sub('_', name))
+    slot = _lock_any(prefix + '.run', limit)
+    if slot is not None:
+        return slot, None
+    place = _lock_any(prefix + '.queue', settings.ADMISSION_QUEUE_SIZE)
+    if place is None:
+        return None, 'queue_full'
+    metrics.add_gauge('admission_queued', 1, route=name)
+    started = time.monotonic()
+    try:
+        while time.monotonic() - started < settings.ADMISSION_MAX_WAIT:
+            time.sleep(POLL_INTERVAL)
+            slot = _lock_any(prefix + '.run', limit)
+            if slot is not None:
+                return slot, None
+        return None, 'timeout'
+    finally:
+        os.close(place)
+        metrics.add_gauge('admission_queued', -1, route=name)
+        metrics.observe('admission_wait_seconds',
+                        time.monotonic() - started, route=name)
+
+
+def release(slot):
+    os.close(slot)
+
+
+def rejected(name, reason):
+    metrics.increment('admission_rejected_total', route=name, reason=reason)
+    response = JsonResponse(
+        {'detail': 'Сервер перегружен, повторите запрос позже.'},
+        status=503, json_dumps_params={'ensure_ascii': False})
+    response['Retry-After'] = str(settings.ADMISSION_RETRY_AFTER)
+    return response
@@ -0,0 +1,11 @@
+import os
+
+from django.core.asgi import get_asgi_application
+
+from .startup import skip_optional_imports
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+skip_optional_imports()
+
+application = get_asgi_application()
@@ -0,0 +1,44 @@
+'''Действия после фиксации транзакции, собранные в пачку.
+
+transaction.on_commit() на каждую измененную строку повторил бы одну и
+ту же работу много раз (замена состава рецепта меняет десятки строк).
+on_commit_batch() регистрирует на транзакцию один обработчик на имя и
+копит в нем ключи, а обработчик получает их все разом. Соединение
+ссылается на ожидающую пачку только слабой ссылкой: при откате
+транзакции Django выбрасывает ее обработчик, и следующая транзакция
+начинает новую пачку.
+'''
+import weakref
+
+from django.db import transaction
+
+
+class _Batch:
+    def __init__(self, function):
+        self.function = function
+        self.keys = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        self.function(self.keys)
+
+
+def on_commit_batch(name, function, keys, using='default'):
+    '''Вызывает function(keys) после фиксации транзакции - один раз на
+    name со всеми накопленными ключами; вне транзакции - сразу'''
+    keys = set(keys)
+    if not keys:
+        return
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        function(keys)
+        return
+    batches = connection.__dict__.setdefault('commit_batches', {})
+    reference = batches.get(name)
+    batch = reference() if reference is not None else None
+    if batch is None or batch.done:
+        batch = _Batch(function)
+        batches[name] = weakref.ref(batch)
+        transaction.on_commit(batch, using=using)
+    batch.keys.update(keys)
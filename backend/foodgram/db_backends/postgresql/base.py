@@ -0,0 +1,45 @@
+'''PostgreSQL с проверкой постоянных соединений и метриками.
+
+Соединение, пережившее запрос (CONN_MAX_AGE > 0), перед первым
+использованием в следующем запросе проверяется запросом SELECT 1, если
+включен CONN_HEALTH_CHECKS; мертвое соединение закрывается и
+открывается заново. Открытия, переиспользования, неудачные проверки и
+время установки соединения попадают в foodgram.metrics.
+'''
+import time
+
+from django.db.backends.postgresql import base
+from foodgram import metrics
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reuse_pending = False
+
+    def get_new_connection(self, conn_params):
+        started = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        metrics.increment('db_connections_opened_total', alias=self.alias)
+        metrics.observe('db_connection_wait_seconds',
+                        time.perf_counter() - started, alias=self.alias)
+        return connection
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # Соединение пережило запрос и будет переиспользовано.
+        self.reuse_pending = self.connection is not None
+
+    def ensure_connection(self):
+        if self.connection is not None and self.reuse_pending:
+            self.reuse_pending = False
+            if (self.settings_dict.get('CONN_HEALTH_CHECKS')
+                    and not self.in_atomic_block
+                    and not self.is_usable()):
+                metrics.increment('db_health_check_failures_total',
+                                  alias=self.alias)
+                self.close()
+            else:
+                metrics.increment('db_connections_reused_total',
+                                  alias=self.alias)
+        super().ensure_connection()
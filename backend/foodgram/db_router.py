@@ -0,0 +1,33 @@
+'''Маршрутизация запросов к базе между основной базой и репликами.
+
+Чтение идет в реплику только внутри безопасного HTTP-запроса, который
+разрешил ReplicaRoutingMiddleware; команды, миграции, транзакции и запросы
+пользователя, недавно что-то изменившего, читают из основной базы.
+'''
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+# Токены и сессии читаются только из основной базы: иначе только что
+# выданный токен может не найтись в отстающей реплике.
+PRIMARY_ONLY_APPS = ('authtoken', 'sessions')
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (not settings.DATABASE_REPLICAS
+                or not read_from_replica.get()
+                or model._meta.app_label in PRIMARY_ONLY_APPS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
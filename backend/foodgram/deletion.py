@@ -0,0 +1,178 @@
+'''Быстрое каскадное удаление без загрузки объектов в Python.
+
+Стандартный delete() собирает все зависимые строки (рецепты автора, их
+ингредиенты, избранное, подписки...) в память и только потом удаляет их.
+bulk_delete() обходит схему связей моделей и удаляет зависимые строки
+запросами DELETE ... WHERE fk IN (пачка id), начиная с листьев, пачками
+по BULK_DELETE_BATCH_SIZE строк. Каждая пачка - короткая транзакция,
+поэтому блокировки держатся недолго; при сбое повторный запуск доудалит
+оставшееся.
+
+Сигналы pre_delete/post_delete не отправляются. Побочные эффекты
+удаления регистрируются через @bulk_delete_hook и получают сразу всю
+пачку в виде queryset; deleting(model) подскажет хуку, какие строки
+модели удаляются выше по цепочке (их зависимые строки удаляются раньше
+самих строк). Для моделей с обработчиками сигналов, но без хука, и для
+связей с on_delete, отличным от CASCADE, SET_NULL и DO_NOTHING,
+используется обычный delete().
+'''
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import CASCADE, DO_NOTHING, SET_NULL, QuerySet, signals
+
+SUMMARY_DEPTH = 4
+
+_hooks = {}
+_local = threading.local()
+
+
+def bulk_delete_hook(model):
+    '''Регистрирует обработчик пачки удаляемых строк модели'''
+    def decorator(function):
+        _hooks.setdefault(model, []).append(function)
+        return function
+    return decorator
+
+
+def deleting(model):
+    '''pk строк модели, зависимые строки которых сейчас удаляются'''
+    return _local.__dict__.get('deleting', {}).get(model, set())
+
+
+@contextmanager
+def _deleting(model, pks):
+    current = _local.__dict__.setdefault('deleting', {}).setdefault(
+        model, set())
+    added = set(pks) - current
+    current |= added
+    try:
+        yield
+    finally:
+        current -= added
+
+
+def _relations(model):
+    '''Обратные связи на модель, включая скрытые (таблицы M2M)'''
+    return [
+        field for field in model._meta.get_fields(include_hidden=True)
+        if field.auto_created and not field.concrete
+        and (field.one_to_many or field.one_to_one)
+    ]
+
+
+def _needs_collector(model, relations):
+    if model not in _hooks and any(
+            signal.has_listeners(model)
+            for signal in (signals.pre_delete, signals.post_delete)):
+        return True
+    return any(
+        relation.on_delete not in (CASCADE, SET_NULL, DO_NOTHING)
+        or not relation.field.target_field.primary_key
+        for relation in relations)
+
+
+def _delete(model, pks, using, counter):
+    '''Удаляет строки модели с данными pk и все зависимые от них'''
+    queryset = model._base_manager.using(using).filter(pk__in=pks)
+    relations = _relations(model)
+    if _needs_collector(model, relations):
+        _, deleted = queryset.delete()
+        counter.update(deleted)
+        return
+
+    def children(relation):
+        return relation.related_model._base_manager.using(using).filter(
+            **{f'{relation.field.name}__in': pks})
+
+    cascades = [relation for relation in relations
+                if relation.on_delete is CASCADE]
+    with _deleting(model, pks):
+        for relation in cascades:
+            _delete_batched(children(relation), using, counter)
+        with transaction.atomic(using=using):
+            # Зависимые строки, появившиеся после удаления пачками.
+            for relation in cascades:
+                _delete_batched(children(relation), using, counter)
+            for relation in relations:
+                if relation.on_delete is SET_NULL:
+                    children(relation).update(**{relation.field.name: None})
+            for hook in _hooks.get(model, ()):
+                hook(queryset)
+            deleted = queryset._raw_delete(using)
+    if deleted:
+        counter[model._meta.label] += deleted
+
+
+def _delete_batched(queryset, using, counter):
+    size = settings.BULK_DELETE_BATCH_SIZE
+    while True:
+        pks = list(queryset.values_list('pk', flat=True)[:size])
+        if not pks:
+            return
+        _delete(queryset.model, pks, using, counter)
+
+
+def bulk_delete(queryset):
+    '''Удаляет объекты queryset вместе со всеми зависимыми записями.
+
+    Возвращает то же, что QuerySet.delete(): общее число удаленных строк
+    и словарь с числом строк по моделям.
+    '''
+    using = queryset._db or router.db_for_write(queryset.model)
+    counter = Counter()
+    _delete_batched(queryset.order_by(), using, counter)
+    return sum(counter.values()), dict(counter)
+
+
+def deletion_summary(queryset):
+    '''Сколько строк каких моделей затронет удаление queryset'''
+    using = queryset._db or router.db_for_write(queryset.model)
+    summary = Counter()
+
+    def visit(current, depth):
+        model = current.model
+        summary[model] += current.count()
+        if depth >= SUMMARY_DEPTH:
+            return
+        for relation in _relations(model):
+            if relation.on_delete is not CASCADE:
+                continue
+            visit(relation.related_model._base_manager.using(using).filter(
+                **{f'{relation.field.name}__in': current.values('pk')}),
+                depth + 1)
+
+    visit(queryset.order_by(), 0)
+    return {model: count for model, count in summary.items() if count}
+
+
+class BulkDeleteAdminMixin:
+    '''Удаление из админки через bulk_delete(); на странице
+    подтверждения - число затронутых строк вместо списка объектов'''
+
+    def delete_model(self, request, obj):
+        bulk_delete(type(obj)._base_manager.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        bulk_delete(queryset)
+
+    def get_deleted_objects(self, objs, request):
+        if not isinstance(objs, QuerySet):
+            objs = self.model._base_manager.filter(
+                pk__in=[obj.pk for obj in objs])
+        summary = deletion_summary(objs)
+        # Как в стандартной админке: на каждую затронутую модель, у
+        # которой есть админка, нужно право на удаление.
+        perms_needed = set()
+        for model in summary:
+            model_admin = self.admin_site._registry.get(model)
+            if (model_admin is not None
+                    and not model_admin.has_delete_permission(request)):
+                perms_needed.add(model._meta.verbose_name)
+        counts = {model._meta.verbose_name_plural: count
+                  for model, count in summary.items()}
+        deleted = [f'{name}: {count}' for name, count in counts.items()]
+        return deleted, counts, perms_needed, []
@@ -0,0 +1,127 @@
+'''Счетчики и метрики процесса в формате Prometheus.
+
+Каждый процесс копит значения в памяти и не чаще раза в
+METRICS_FLUSH_INTERVAL секунд сбрасывает их в METRICS_DIR/<pid>.json.
+Эндпоинт /metrics/ суммирует файлы всех процессов, поэтому не важно,
+какой из воркеров gunicorn ответил на запрос. Для завершившихся процессов
+учитываются только счетчики, но не текущие значения (gauge).
+'''
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+
+_lock = threading.Lock()
+_values = {}
+_flushed_at = [0.0]
+
+
+def _key(kind, name, labels):
+    return (kind, name, tuple(sorted(labels.items())))
+
+
+def _update(key, value, replace=False):
+    with _lock:
+        _values[key] = value if replace else _values.get(key, 0) + value
+    if time.monotonic() - _flushed_at[0] >= settings.METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def increment(name, value=1, **labels):
+    _update(_key(COUNTER, name, labels), value)
+
+
+def observe(name, value, **labels):
+    '''Наблюдение для суммарной метрики: <name>_sum и <name>_count'''
+    _update(_key(COUNTER, f'{name}_sum', labels), value)
+    _update(_key(COUNTER, f'{name}_count', labels), 1)
+
+
+def set_gauge(name, value, **labels):
+    _update(_key(GAUGE, name, labels), value, replace=True)
+
+
+def add_gauge(name, value, **labels):
+    _update(_key(GAUGE, name, labels), value)
+
+
+def reset():
+    '''Забывает значения, унаследованные от родительского процесса при
+    fork (preload_app в gunicorn)'''
+    with _lock:
+        _values.clear()
+        _flushed_at[0] = 0.0
+
+
+def flush():
+    directory = settings.METRICS_DIR
+    with _lock:
+        _flushed_at[0] = time.monotonic()
+        rows = [[kind, name, list(labels), value]
+                for (kind, name, labels), value in _values.items()]
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.')
+    with os.fdopen(handle, 'w') as output:
+        json.dump(rows, output)
+    os.replace(temp_path, os.path.join(directory, f'{os.getpid()}.json'))
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect():
+    '''Сумма значений всех процессов'''
+    flush()
+    totals = {}
+    directory = settings.METRICS_DIR
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json'):
+            continue
+        alive = _alive(int(filename[:-len('.json')]))
+        try:
+            with open(os.path.join(directory, filename)) as source:
+                rows = json.load(source)
+        except (OSError, ValueError):
+            continue
+        for kind, name, labels, value in rows:
+            if kind == GAUGE and not alive:
+                continue
+            key = (kind, name, tuple(tuple(label) for label in labels))
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def render():
+    lines = []
+    for (kind, name, labels), value in sorted(collect().items()):
+        label_text = ','.join(f'{label}="{label_value}"'
+                              for label, label_value in labels)
+        if label_text:
+            label_text = f'{{{label_text}}}'
+        lines.append(f'foodgram_{name}{label_text} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    '''Метрики для Prometheus: для персонала или по METRICS_TOKEN'''
+    token = settings.METRICS_TOKEN
+    authorized = (
+        (token and request.META.get('HTTP_AUTHORIZATION') == f'Bearer {token}')
+        or request.user.is_staff)
+    if not authorized:
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4')
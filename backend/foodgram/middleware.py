@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import admission, metrics, traffic
+from .db_router import read_from_replica
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def client_key(request):
+    '''Идентификатор клиента: токен, сессия или None для анонима'''
+    credentials = (request.META.get('HTTP_AUTHORIZATION')
+                   or request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    if not credentials:
+        return None
+    return hashlib.sha1(credentials.encode('utf-8')).hexdigest()
+
+
+class ReplicaRoutingMiddleware:
+    '''Безопасные запросы читают из реплик, а после записи клиент
+    на DB_REPLICA_PIN_SECONDS закрепляется за основной базой, чтобы
+    видеть собственные изменения.'''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def _route(self, request):
+        key = client_key(request)
+        safe = request.method in SAFE_METHODS
+        pinned = key is not None and cache.get(f'db-pin:{key}')
+        return key, safe, read_from_replica.set(safe and not pinned)
+
+    def _pin(self, key, safe):
+        if not safe and key is not None:
+            cache.set(f'db-pin:{key}', True, settings.DB_REPLICA_PIN_SECONDS)
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        key, safe, token = self._route(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        self._pin(key, safe)
+        return response
+
+    async def __acall__(self, request):
+        key, safe, token = self._route(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        self._pin(key, safe)
+        return response
+
+
+class AdmissionControlMiddleware:
+    '''Лимиты одновременных запросов к маршрутам из ADMISSION_ROUTES с
+    короткой очередью и быстрым отказом 503 (см. foodgram.admission).
+    Маршрут известен только после разбора URL, поэтому слот занимается в
+    process_view, а освобождается после ответа.'''
+
+    def __init__(self, get_response):
+        if not (settings.ADMISSION_ROUTES and admission.available()):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            admitted = getattr(request, '_admission', None)
+            if admitted is not None:
+                name, slot = admitted
+                admission.release(slot)
+                metrics.add_gauge('admission_in_flight', -1, route=name)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = admission.route(request)
+        limit = settings.ADMISSION_ROUTES.get(name)
+        if limit is None:
+            return None
+        slot, reason = admission.acquire(name, limit)
+        if slot is None:
+            return admission.rejected(name, reason)
+        request._admission = (name, slot)
+        metrics.add_gauge('admission_in_flight', 1, route=name)
+        return None
+
+
+class TrafficCaptureMiddleware:
+    '''Записывает выборку запросов к API для replay_traffic (см.
+    foodgram.traffic). С TRAFFIC_QUERY_COUNT_HEADER=True добавляет к
+    ответам заголовок X-Query-Count - его читает replay_traffic при
+    прогоне через HTTP. Если обе настройки выключены, middleware не
+    участвует в обработке запросов.'''
+
+    def __init__(self, get_response):
+        if not (settings.TRAFFIC_CAPTURE_RATE
+                or settings.TRAFFIC_QUERY_COUNT_HEADER):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        capture = (request.path.startswith('/api/')
+                   and random.random() < settings.TRAFFIC_CAPTURE_RATE)
+        if not capture and not settings.TRAFFIC_QUERY_COUNT_HEADER:
+            return self.get_response(request)
+        body = traffic.read_body_schema(request) if capture else None
+        started = time.perf_counter()
+        with traffic.count_queries() as counter:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        if settings.TRAFFIC_QUERY_COUNT_HEADER:
+            response['X-Query-Count'] = str(counter['queries'])
+        match = request.resolver_match
+        if capture and match is not None and match.view_name:
+            traffic.write({
+                'ts': round(time.time(), 3),
+                'method': request.method,
+                'view': match.view_name,
+                'kwargs': match.kwargs,
+                'query': traffic.query_params(request),
+                'body': body,
+                'user': traffic.synthetic_user(client_key(request)),
+                'status': response.status_code,
+                'ms': round(elapsed * 1000, 2),
+                'queries': counter['queries'],
+            })
+        return response
+
+
+class ProfilingMiddleware:
+    '''Профиль запроса по флагу X-Profile / ?profile=1 для сотрудников
+    (см. profiling.profiler); без флага запрос проходит как есть'''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (request.META.get('HTTP_X_PROFILE')
+                or 'profile' in request.META.get('QUERY_STRING', '')):
+            return self.get_response(request)
+        from profiling import profiler
+
+        if not profiler.requested(request):
+            return self.get_response(request)
+        user = profiler.staff_user(request)
+        if user is None or not profiler.acquire_slot():
+            return self.get_response(request)
+        return profiler.profile(request, self.get_response, user)
@@ -0,0 +1,26 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    '''Пагинатор админки для больших таблиц: без фильтров число строк
+    берется из статистики PostgreSQL (pg_class.reltuples) вместо COUNT(*)'''
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT reltuples::bigint FROM pg_class '
+                        'WHERE oid = %s::regclass',
+                        [queryset.model._meta.db_table])
+                    row = cursor.fetchone()
+                if row and row[0] > self.estimate_threshold:
+                    return row[0]
+        return super().count
@@ -8,7 +8,8 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 SECRET_KEY = '4nrwqgzi2)5h+#z$vm0s7(=#xie6czth+qq@aqhi84*99p#fxs'
 
-DEBUG = False
+# True - локальная разработка на SQLite (db.sqlite3) без настроек базы.
+DEBUG = os.getenv('DEBUG', default='False') == 'True'
 
 ALLOWED_HOSTS = ['*']
 
@@ -29,6 +30,8 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
+    'jobs.apps.JobsConfig',
+    'profiling.apps.ProfilingConfig',
 ]
 
 MIDDLEWARE = [
@@ -36,10 +39,14 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'foodgram.middleware.AdmissionControlMiddleware',
+    'foodgram.middleware.ReplicaRoutingMiddleware',
+    'foodgram.middleware.TrafficCaptureMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'foodgram.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -61,6 +68,11 @@ TEMPLATES = [
     },
 ]
 WSGI_APPLICATION = 'foodgram.wsgi.application'
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
+# Асинхронные представления для чтения (api.async_views), включаются
+# в foodgram.asgi.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', default='False') == 'True'
 
 if DEBUG:
     DATABASES = {
@@ -70,19 +82,144 @@ if DEBUG:
         }
     }
 else:
+    # Стандартный драйвер PostgreSQL заменяется инструментированным
+    # (проверка постоянных соединений и метрики).
+    DB_ENGINE = os.getenv('DB_ENGINE',
+                          default='foodgram.db_backends.postgresql')
+    if DB_ENGINE == 'django.db.backends.postgresql':
+        DB_ENGINE = 'foodgram.db_backends.postgresql'
     DATABASES = {
         'default': {
-            'ENGINE': os.getenv('DB_ENGINE',
-                                default='django.db.backends.   postgresql'),
+            'ENGINE': DB_ENGINE,
             'NAME': os.getenv('DB_NAME', default='postgres'),
             'USER': os.getenv('POSTGRES_USER', default='postgres'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD',
                                   default='StelsDelta200'),
             'HOST': os.getenv('DB_HOST', default='db'),
-            'PORT': os.getenv('DB_PORT', default='5432')
+            'PORT': os.getenv('DB_PORT', default='5432'),
+            # Постоянные соединения: сколько секунд держать соединение
+            # открытым между запросами (0 - закрывать после каждого).
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+            'CONN_HEALTH_CHECKS': os.getenv(
+                'DB_CONN_HEALTH_CHECKS', default='True') == 'True',
+            # За pgbouncer в режиме transaction курсоры на стороне
+            # сервера не переживают транзакцию - отключаем их.
+            'DISABLE_SERVER_SIDE_CURSORS': os.getenv(
+                'DB_PGBOUNCER', default='False') == 'True',
         }
     }
 
+# Реплики для чтения: список хостов через запятую (для SQLite - пути
+# к файлам). Реплика наследует остальные параметры основной базы.
+DATABASE_REPLICAS = []
+for number, location in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', default='').split(',')), 1):
+    replica = dict(DATABASES['default'])
+    if replica['ENGINE'].endswith('sqlite3'):
+        replica['NAME'] = location.strip()
+    else:
+        replica['HOST'] = location.strip()
+    replica['TEST'] = {'MIRROR': 'default'}
+    DATABASES[f'replica_{number}'] = replica
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['foodgram.db_router.PrimaryReplicaRouter']
+
+# Сколько секунд после записи клиент читает только из основной базы.
+DB_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', default=5))
+
+# Поиск похожих рецептов (recipes.similarity): число полос и строк в
+# полосе MinHash-сигнатуры, минимальная оценка сходства и сколько
+# кандидатов из LSH-корзин проверять. Порог LSH (1/32) ** (1/3) ~ 0.31
+# соответствует SIMILARITY_THRESHOLD; после смены формы сигнатуры
+# индекс пересобирается командой build_similarity_index (до этого
+# сигнатуры прежней формы в поиске не участвуют).
+SIMILARITY_BANDS = int(os.getenv('SIMILARITY_BANDS', default=32))
+SIMILARITY_ROWS = int(os.getenv('SIMILARITY_ROWS', default=3))
+SIMILARITY_THRESHOLD = float(os.getenv('SIMILARITY_THRESHOLD', default=0.3))
+SIMILARITY_CANDIDATES = int(os.getenv('SIMILARITY_CANDIDATES', default=200))
+
+# Популярность сейчас (recipes update_trending): период полураспада
+# веса события и сколько часов хранить почасовые счетчики.
+TRENDING_HALF_LIFE_HOURS = float(
+    os.getenv('TRENDING_HALF_LIFE_HOURS', default=24))
+TRENDING_RETENTION_HOURS = int(
+    os.getenv('TRENDING_RETENTION_HOURS', default=168))
+
+# Фоновые задачи (jobs): число попыток, задержка перед повтором
+# (удваивается с каждой попыткой, не больше максимума), как часто воркер
+# отмечается во время выполнения задачи и через сколько секунд без
+# отметок задача считается брошенной и возвращается в очередь.
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', default=5))
+JOBS_RETRY_DELAY = int(os.getenv('JOBS_RETRY_DELAY', default=10))
+JOBS_RETRY_MAX_DELAY = int(os.getenv('JOBS_RETRY_MAX_DELAY', default=3600))
+JOBS_HEARTBEAT_INTERVAL = int(
+    os.getenv('JOBS_HEARTBEAT_INTERVAL', default=30))
+JOBS_TIMEOUT = int(os.getenv('JOBS_TIMEOUT', default=600))
+
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', default=os.path.join(BASE_DIR, 'var', 'metrics'))
+METRICS_FLUSH_INTERVAL = float(
+    os.getenv('METRICS_FLUSH_INTERVAL', default=1))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+
+# Запись трафика для replay_traffic: доля записываемых запросов к API
+# (0 - выключено) и каталог для файлов <pid>.jsonl.
+TRAFFIC_CAPTURE_RATE = float(os.getenv('TRAFFIC_CAPTURE_RATE', default=0))
+TRAFFIC_CAPTURE_DIR = os.getenv(
+    'TRAFFIC_CAPTURE_DIR', default=os.path.join(BASE_DIR, 'var', 'traffic'))
+TRAFFIC_QUERY_COUNT_HEADER = os.getenv(
+    'TRAFFIC_QUERY_COUNT_HEADER', default='False') == 'True'
+
+# Профилирование запросов по требованию: не чаще одного профиля в
+# PROFILING_MIN_INTERVAL секунд, период сэмплирования стека и сколько
+# SQL-запросов сохранять в профиле.
+PROFILING_MIN_INTERVAL = int(os.getenv('PROFILING_MIN_INTERVAL', default=10))
+PROFILING_SAMPLE_INTERVAL = float(
+    os.getenv('PROFILING_SAMPLE_INTERVAL', default=0.002))
+PROFILING_MAX_QUERIES = int(os.getenv('PROFILING_MAX_QUERIES', default=2000))
+
+# Поиск ингредиентов с опечатками (?fuzzy=true): сколько результатов
+# отдавать и порог word_similarity для индекса pg_trgm в PostgreSQL.
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', default=20))
+INGREDIENT_SEARCH_THRESHOLD = float(
+    os.getenv('INGREDIENT_SEARCH_THRESHOLD', default=0.25))
+
+# Лимиты одновременных запросов к дорогим маршрутам на хост (см.
+# foodgram.admission): очередь ожидающих, сколько ждать слот, Retry-After
+# в ответе 503 и с какой страницы список рецептов считается глубоким.
+# ADMISSION_CONTROL=False отключает лимиты.
+ADMISSION_ROUTES = {
+    'GET api:recipes-download-shopping-cart': 2,
+    'POST api:recipes-list': 4,
+    'PATCH api:recipes-detail': 4,
+    'GET api:recipes-list deep': 2,
+} if os.getenv('ADMISSION_CONTROL', default='True') == 'True' else {}
+ADMISSION_DIR = os.getenv(
+    'ADMISSION_DIR', default=os.path.join(BASE_DIR, 'var', 'admission'))
+ADMISSION_QUEUE_SIZE = int(os.getenv('ADMISSION_QUEUE_SIZE', default=8))
+ADMISSION_MAX_WAIT = float(os.getenv('ADMISSION_MAX_WAIT', default=2))
+ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', default=5))
+ADMISSION_DEEP_PAGE = int(os.getenv('ADMISSION_DEEP_PAGE', default=50))
+
+# Token bucket для дорогих изменяющих запросов (создание и изменение
+# рецепта, избранное, список покупок, подписки) на пользователя: запас
+# запросов и скорость его пополнения (запросов в секунду). По умолчанию
+# выключен (0): состояние обновляется в кэше без блокировок, и включать
+# его стоит только с общим для всех воркеров кэшем (memcached, redis).
+WRITE_THROTTLE_BURST = int(os.getenv('WRITE_THROTTLE_BURST', default=30))
+WRITE_THROTTLE_RATE = float(os.getenv('WRITE_THROTTLE_RATE', default=0))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', default=os.path.join(BASE_DIR, 'var', 'cache')),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.' +
@@ -112,6 +249,9 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    # Сколько прокси перед приложением дописывают X-Forwarded-For: по
+    # нему DRF определяет IP анонимного клиента (в infra - один nginx).
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', default=1)) or None,
     'PAGE_SIZE': 6
 }
 
@@ -135,6 +275,35 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Загруженные файлы хранятся по хешу содержимого, без дублей.
+DEFAULT_FILE_STORAGE = 'foodgram.storage.ContentAddressedStorage'
+
+# Сформированные списки покупок - вне MEDIA_ROOT, чтобы nginx не отдавал
+# их напрямую. С SHOPPING_LIST_X_ACCEL=True файл отдает nginx по
+# X-Accel-Redirect из internal-location SHOPPING_LIST_ACCEL_PREFIX (в
+# infra/docker-compose.yml включено; без nginx ответ был бы пустым).
+SHOPPING_LIST_ROOT = os.getenv(
+    'SHOPPING_LIST_ROOT',
+    default=os.path.join(BASE_DIR, 'private', 'shopping_lists'))
+SHOPPING_LIST_X_ACCEL = os.getenv(
+    'SHOPPING_LIST_X_ACCEL', default='False') == 'True'
+SHOPPING_LIST_ACCEL_PREFIX = '/protected/shopping_lists/'
+
+# Размер пачки при каскадном удалении (foodgram.deletion).
+BULK_DELETE_BATCH_SIZE = int(os.getenv('BULK_DELETE_BATCH_SIZE', 1000))
+
+# Журнал изменений избранного и списка покупок (/api/users/me/changes/):
+# сколько записей отдавать за раз и сколько дней хранить.
+CHANGE_FEED_PAGE_SIZE = int(os.getenv('CHANGE_FEED_PAGE_SIZE', 500))
+CHANGE_FEED_RETENTION_DAYS = int(
+    os.getenv('CHANGE_FEED_RETENTION_DAYS', 30))
+
+# Самый длинный период списка покупок по плану питания, дней.
+MEAL_PLAN_MAX_DAYS = int(os.getenv('MEAL_PLAN_MAX_DAYS', 366))
+
+CATALOG_SNAPSHOT_PATH = os.getenv(
+    'CATALOG_SNAPSHOT_PATH',
+    default=os.path.join(BASE_DIR, 'var', 'catalog.bin'))
 
 CORS_ALLOWED_ORIGINS = ['http://localhost:3000', ]
 CORS_URLS_REGEX = r'^/api/.*$'
@@ -0,0 +1,55 @@
+'''Быстрый запуск процессов backend.
+
+skip_optional_imports() вызывается только из точек входа сервера
+(foodgram.wsgi, foodgram.asgi) до загрузки приложений и по умолчанию
+ничего не делает. Часть зависимостей импортирует пакеты "если они
+установлены" (coreapi и coreschema - django-filter и DRF для устаревших
+схем API, requests - DRF для RequestsClient в тестах, jinja2 - coreschema
+и django.test). Они приходят в образ вместе с djoser, серверу не нужны, а
+их импорт занимает заметную долю времени запуска. Пакеты из
+STARTUP_SKIP_MODULES записываются в sys.modules как None и для таких
+импортов выглядят неустановленными. Список задается в Dockerfile;
+manage.py, тесты и инструменты разработки его не применяют.
+
+warm_up() готовит процесс к запросам до того, как он начнет их
+принимать: импортирует все представления через URLConf, собирает
+снимок справочников, если его еще нет, и открывает его вместе с индексом
+поиска ингредиентов. Под gunicorn
+с preload_app это делается один раз в главном процессе, и воркеры
+получают все готовым при fork (см. gunicorn.conf.py).
+'''
+import logging
+import os
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def skip_optional_imports():
+    '''Помечает пакеты из STARTUP_SKIP_MODULES неустановленными'''
+    names = os.getenv('STARTUP_SKIP_MODULES', default='').split(',')
+    for name in filter(None, names):
+        if name not in sys.modules:
+            sys.modules[name] = None
+
+
+def warm_up():
+    '''Прогрев процесса; возвращает время в секундах'''
+    from django.db import connections
+    from django.urls import get_resolver
+    from recipes.catalog import ensure_catalog, get_catalog
+
+    started = time.perf_counter()
+    get_resolver().url_patterns
+    try:
+        ensure_catalog()
+        get_catalog().search('прогрев', 1)
+    except Exception:
+        # Без базы снимок не собрать - до его сборки воркеры читают
+        # справочники из базы.
+        logger.exception('Не удалось прогреть снимок справочников')
+    finally:
+        # Соединения нельзя передавать воркерам через fork.
+        connections.close_all()
+    return time.perf_counter() - started
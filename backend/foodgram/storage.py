@@ -0,0 +1,72 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    '''Хранилище, в котором имя файла - хеш его содержимого.
+
+    Файл с тем же содержимым хранится один раз: повторная загрузка
+    возвращает уже сохраненное имя без записи на диск и лишь обновляет
+    время изменения файла, чтобы gc_media не счел его старым. Файлы не
+    удаляются вместе с объектами (на них могут ссылаться другие записи),
+    ненужные убирает команда gc_media.
+    '''
+    hash_algorithm = 'sha256'
+
+    def digest(self, content):
+        '''Хеш содержимого файла, читаемого по частям'''
+        hasher = hashlib.new(self.hash_algorithm)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            hasher.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        return hasher.hexdigest()
+
+    def hashed_name(self, name, content):
+        '''Имя файла: верхний каталог upload_to, два уровня по хешу'''
+        digest = self.digest(content)
+        root = name.split('/', 1)[0] if '/' in name else ''
+        extension = os.path.splitext(name)[1].lower()
+        return '/'.join(
+            part for part in (root, digest[:2], digest[2:4],
+                              digest + extension) if part)
+
+    def contains(self, name, content):
+        '''Совпадает ли содержимое content с уже сохраненным файлом name'''
+        if not name:
+            return False
+        return os.path.basename(name).split('.')[0] == self.digest(content)
+
+    def get_available_name(self, name, max_length=None):
+        # Одинаковое имя означает одинаковое содержимое, суффиксы не нужны.
+        return name
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        path = self.path(name)
+        if os.path.exists(path):
+            try:
+                os.utime(path)
+                return name
+            except FileNotFoundError:
+                # Файл только что удалил gc_media - записываем заново.
+                pass
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.')
+        try:
+            with os.fdopen(handle, 'wb') as stored:
+                for chunk in content.chunks():
+                    stored.write(chunk)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return name
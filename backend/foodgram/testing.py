@@ -0,0 +1,44 @@
+'''Общие части тестов приложений.'''
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+# Сессия, пользователь, COUNT, строки страницы и значения фильтров;
+# в PostgreSQL - еще оценка числа строк из pg_class.
+MAX_CHANGELIST_QUERIES = 8
+
+
+class ChangelistQueriesMixin:
+    '''Число запросов страницы списка в админке не зависит от числа строк.
+
+    Тест приложения добавляет add_rows(count) - создание count строк для
+    всех проверяемых списков.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        raise NotImplementedError
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assert_constant_queries(self, model):
+        url = reverse(f'admin:{model._meta.app_label}_'
+                      f'{model._meta.model_name}_changelist')
+        self.add_rows(2)
+        few = self.count_queries(url)
+        self.add_rows(10)
+        many = self.count_queries(url)
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, MAX_CHANGELIST_QUERIES)
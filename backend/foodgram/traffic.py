@@ -0,0 +1,112 @@
+'''Запись реального трафика для нагрузочных тестов (replay_traffic).
+
+TrafficCaptureMiddleware сохраняет долю TRAFFIC_CAPTURE_RATE запросов в
+TRAFFIC_CAPTURE_DIR/<pid>.jsonl, по строке JSON на запрос: метод, имя
+маршрута и его аргументы, параметры строки запроса, схема JSON-тела
+(типы, длины строк и списков, без значений), синтетический
+идентификатор пользователя (HMAC от токена или сессии), статус, время
+ответа и число SQL-запросов. Токены, пароли и содержимое тел не
+записываются; по схеме replay_traffic собирает тело того же размера.
+'''
+import hashlib
+import hmac
+import json
+import os
+import threading
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.db import connections
+
+MAX_VALUE_LENGTH = 100
+
+_lock = threading.Lock()
+
+
+def body_schema(value):
+    '''Структура значения без самих данных'''
+    if isinstance(value, dict):
+        return {key: body_schema(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return {'list': body_schema(value[0]) if value else None,
+                'len': len(value)}
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, (int, float)):
+        return 'number'
+    if isinstance(value, str):
+        kind = 'image' if value.startswith('data:image') else 'str'
+        return f'{kind}:{len(value)}'
+    return 'null'
+
+
+def synthetic_user(key):
+    '''Необратимый идентификатор клиента для записи'''
+    if key is None:
+        return None
+    return hmac.new(settings.SECRET_KEY.encode('utf-8'),
+                    key.encode('utf-8'), hashlib.sha256).hexdigest()[:12]
+
+
+@contextmanager
+def count_queries():
+    '''Считает SQL-запросы во всех базах текущего потока'''
+    counter = {'queries': 0}
+
+    def wrapper(execute, sql, params, many, context):
+        counter['queries'] += 1
+        return execute(sql, params, many, context)
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield counter
+
+
+def query_params(request):
+    return {key: [value[:MAX_VALUE_LENGTH] for value in values]
+            for key, values in request.GET.lists()}
+
+
+def read_body_schema(request):
+    '''Схема JSON-тела; вызывается до view, пока тело не прочитано'''
+    if request.content_type != 'application/json':
+        return None
+    try:
+        # Тело кэшируется в request и потом читается view без повторного
+        # чтения из сокета; размер ограничен DATA_UPLOAD_MAX_MEMORY_SIZE.
+        return body_schema(json.loads(request.body or b'null'))
+    except RequestDataTooBig:
+        return None
+    except ValueError:
+        return 'invalid'
+
+
+def write(record):
+    directory = settings.TRAFFIC_CAPTURE_DIR
+    line = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+    with _lock:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.jsonl')
+        with open(path, 'a', encoding='utf-8') as capture:
+            capture.write(line + '\n')
+
+
+def read(paths):
+    '''Записи из файлов или каталогов с *.jsonl, в порядке времени'''
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name)
+                         for name in sorted(os.listdir(path))
+                         if name.endswith('.jsonl'))
+        else:
+            files.append(path)
+    records = []
+    for path in files:
+        with open(path, encoding='utf-8') as capture:
+            records.extend(
+                json.loads(line) for line in capture if line.strip())
+    records.sort(key=lambda record: record['ts'])
+    return records
@@ -2,6 +2,9 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from .startup import skip_optional_imports
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+skip_optional_imports()
 
 application = get_wsgi_application()
@@ -0,0 +1,35 @@
+'''Настройки gunicorn: gunicorn foodgram.wsgi:application -c gunicorn.conf.py
+
+С GUNICORN_PRELOAD=True (по умолчанию) приложение загружается в главном
+процессе до запуска воркеров: Django, приложения и представления
+импортируются один раз, снимок справочников и индекс поиска
+ингредиентов прогреваются (foodgram.startup.warm_up), а воркеры получают
+все это готовым при fork и сразу принимают запросы. Без preload прогрев
+выполняет каждый воркер до приема запросов.
+'''
+import os
+
+bind = os.getenv('GUNICORN_BIND', default='0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', default=1))
+preload_app = os.getenv('GUNICORN_PRELOAD', default='True') == 'True'
+
+
+def when_ready(server):
+    if preload_app:
+        from foodgram.startup import warm_up
+
+        server.log.info('Warm-up in master: %.3f s', warm_up())
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from foodgram import metrics
+
+        metrics.reset()
+
+
+def post_worker_init(worker):
+    if not preload_app:
+        from foodgram.startup import warm_up
+
+        worker.log.info('Warm-up: %.3f s', warm_up())
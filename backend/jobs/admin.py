@@ -0,0 +1,24 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'status', 'priority', 'attempts',
+                    'run_at', 'created', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('=idempotency_key', 'name')
+    list_select_related = ('user',)
+    readonly_fields = ('attempts', 'result', 'last_error', 'locked_by',
+                       'created', 'started_at', 'heartbeat_at',
+                       'finished_at')
+    raw_id_fields = ('user',)
+    actions = ('requeue',)
+
+    @admin.action(description='Перезапустить выбранные задачи')
+    def requeue(self, request, queryset):
+        queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, run_at=timezone.now(), attempts=0,
+            last_error='')
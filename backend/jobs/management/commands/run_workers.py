@@ -0,0 +1,61 @@
+import multiprocessing
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from jobs import queue
+
+
+def run_threads(threads, poll_interval, once):
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stop.set())
+    workers = [
+        threading.Thread(target=queue.work, args=(stop, poll_interval, once),
+                         daemon=True)
+        for _ in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    last_check = 0
+    while any(worker.is_alive() for worker in workers):
+        if time.monotonic() - last_check > settings.JOBS_TIMEOUT / 2:
+            queue.requeue_stale()
+            connections.close_all()
+            last_check = time.monotonic()
+        for worker in workers:
+            worker.join(timeout=poll_interval)
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers on a thread and/or process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when the queue is empty.')
+
+    def handle(self, *args, **options):
+        arguments = (options['threads'], options['poll_interval'],
+                     options['once'])
+        if options['processes'] <= 1:
+            run_threads(*arguments)
+            return
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=run_threads, args=arguments)
+                     for _ in range(options['processes'])]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+                process.join()
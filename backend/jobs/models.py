@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    '''Фоновая задача в очереди на базе данных'''
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(
+        max_length=100,
+        verbose_name='Задача')
+    payload = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Аргументы')
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+        verbose_name='Статус')
+    priority = models.SmallIntegerField(
+        default=0,
+        verbose_name='Приоритет',
+        help_text='Задачи с большим приоритетом выполняются раньше')
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток')
+    max_attempts = models.PositiveSmallIntegerField(
+        default=5,
+        verbose_name='Максимум попыток')
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Запустить не раньше')
+    idempotency_key = models.CharField(
+        max_length=255,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name='Ключ идемпотентности')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name='Пользователь')
+    result = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name='Результат')
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка')
+    locked_by = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Воркер')
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создана')
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Начата')
+    heartbeat_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Последний сигнал воркера')
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Завершена')
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'],
+                         name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.get_status_display()})'
@@ -0,0 +1,173 @@
+'''Очередь фоновых задач поверх основной базы данных.
+
+Задача - функция, зарегистрированная декоратором @task в модуле
+tasks.py приложения; аргументы передаются как JSON. Представление ставит
+задачу в очередь через enqueue() и отвечает 202, воркеры
+(manage.py run_workers) забирают задачи по приоритету и времени запуска.
+Забор задачи - условный UPDATE по статусу, поэтому одну задачу не
+возьмут два воркера ни в PostgreSQL, ни в SQLite.
+
+Пока задача выполняется, воркер раз в JOBS_HEARTBEAT_INTERVAL секунд
+обновляет heartbeat_at; в очередь возвращаются только задачи без отметок
+дольше JOBS_TIMEOUT, то есть задачи пропавших воркеров, а не долгие
+(кроме исчерпавших max_attempts - они завершаются ошибкой).
+Итог записывается условно, только если задача все еще за этим воркером.
+'''
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (IntegrityError, close_old_connections, connection,
+                       transaction)
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name):
+    '''Регистрирует функцию как фоновую задачу с указанным именем'''
+    def decorator(function):
+        _registry[name] = function
+        function.job_name = name
+        return function
+    return decorator
+
+
+def enqueue(name, payload=None, *, priority=0, idempotency_key=None,
+            delay=0, user=None, max_attempts=None):
+    '''Ставит задачу в очередь.
+
+    Повторный вызов с тем же idempotency_key возвращает уже созданную
+    задачу, а не ставит новую.
+    '''
+    if name not in _registry:
+        raise KeyError(f'Неизвестная задача: {name}')
+    fields = {
+        'name': name,
+        'payload': payload or {},
+        'priority': priority,
+        'run_at': timezone.now() + timedelta(seconds=delay),
+        'user': user,
+        'max_attempts': max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    }
+    if idempotency_key is None:
+        return Job.objects.create(**fields)
+    try:
+        with transaction.atomic():
+            return Job.objects.create(idempotency_key=idempotency_key,
+                                      **fields)
+    except IntegrityError:
+        return Job.objects.get(idempotency_key=idempotency_key)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def claim(worker):
+    '''Забирает следующую готовую к запуску задачу или возвращает None'''
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=now,
+    ).order_by('-priority', 'run_at', 'pk').values_list('pk', flat=True)
+    for pk in candidates[:10]:
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker, started_at=now,
+            heartbeat_at=now, attempts=F('attempts') + 1)
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def backoff(attempts):
+    '''Задержка перед повтором: экспоненциальная, с ограничением сверху'''
+    return min(settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1),
+               settings.JOBS_RETRY_MAX_DELAY)
+
+
+def heartbeat(job, stop):
+    '''Отмечает, что воркер жив, пока задача за ним и не выставлен stop'''
+    try:
+        while not stop.wait(settings.JOBS_HEARTBEAT_INTERVAL):
+            if not Job.objects.filter(
+                    pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by,
+            ).update(heartbeat_at=timezone.now()):
+                return
+    finally:
+        connection.close()
+
+
+def finish(job, **fields):
+    '''Записывает итог, если задача все еще за этим воркером'''
+    saved = Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by,
+    ).update(**fields)
+    if not saved:
+        logger.warning('Задача %s уже передана другому воркеру, итог '
+                       'не сохранен', job)
+    for name, value in fields.items():
+        setattr(job, name, value)
+    return job
+
+
+def execute(job):
+    '''Выполняет задачу и сохраняет результат или планирует повтор'''
+    stop = threading.Event()
+    beat = threading.Thread(target=heartbeat, args=(job, stop), daemon=True)
+    beat.start()
+    try:
+        function = _registry[job.name]
+        result = function(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Задача %s завершилась ошибкой', job)
+        if job.attempts < job.max_attempts:
+            return finish(job, status=Job.QUEUED, last_error=error,
+                          run_at=timezone.now() + timedelta(
+                              seconds=backoff(job.attempts)))
+        return finish(job, status=Job.FAILED, last_error=error,
+                      finished_at=timezone.now())
+    finally:
+        stop.set()
+        beat.join()
+    return finish(job, status=Job.DONE, result=result,
+                  finished_at=timezone.now())
+
+
+def requeue_stale():
+    '''Возвращает в очередь задачи воркеров, которые пропали; задачи,
+    исчерпавшие попытки, помечаются ошибкой. Возвращает число
+    возвращенных задач.'''
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        heartbeat_at__lt=now - timedelta(seconds=settings.JOBS_TIMEOUT))
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, locked_by='', finished_at=now,
+        last_error='Воркер пропал во время последней попытки.')
+    return stale.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.QUEUED, run_at=now, locked_by='')
+
+
+def work(stop, poll_interval, once=False):
+    '''Цикл воркера: выполняет задачи, пока не выставлен stop'''
+    worker = worker_name()
+    while not stop.is_set():
+        close_old_connections()
+        job = claim(worker)
+        if job is not None:
+            execute(job)
+            continue
+        if once:
+            break
+        stop.wait(poll_interval)
+    close_old_connections()
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+from jobs import queue
+from jobs.models import Job
+
+
+class RequeueStaleTest(TestCase):
+    '''Задачи пропавших воркеров возвращаются в очередь, пока есть
+    попытки'''
+
+    def running(self, attempts, heartbeat_age, max_attempts=3):
+        heartbeat_at = timezone.now() - timedelta(seconds=heartbeat_age)
+        return Job.objects.create(
+            name='recipes.delete_recipes', status=Job.RUNNING,
+            attempts=attempts, max_attempts=max_attempts,
+            locked_by='host:1:1', started_at=heartbeat_at,
+            heartbeat_at=heartbeat_at)
+
+    def test_requeue_stale(self):
+        stale = settings.JOBS_TIMEOUT + 60
+        retried = self.running(attempts=1, heartbeat_age=stale)
+        exhausted = self.running(attempts=3, heartbeat_age=stale)
+        alive = self.running(attempts=3, heartbeat_age=0)
+        self.assertEqual(queue.requeue_stale(), 1)
+        for job in (retried, exhausted, alive):
+            job.refresh_from_db()
+        self.assertEqual((retried.status, retried.locked_by),
+                         (Job.QUEUED, ''))
+        self.assertEqual((exhausted.status, exhausted.locked_by),
+                         (Job.FAILED, ''))
+        self.assertIsNotNone(exhausted.finished_at)
+        self.assertTrue(exhausted.last_error)
+        self.assertEqual(alive.status, Job.RUNNING)
@@ -0,0 +1,71 @@
+from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+
+from . import profiler
+from .models import RequestProfile
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created', 'method', 'path', 'status', 'duration_ms',
+                    'query_count', 'query_time_ms', 'user')
+    list_filter = ('method', 'status', 'view')
+    search_fields = ('path', 'view')
+    list_select_related = ('user',)
+    exclude = ('folded', 'queries')
+    readonly_fields = ('created', 'user', 'method', 'path', 'view',
+                       'status', 'duration_ms', 'query_count',
+                       'query_time_ms', 'samples', 'flame_graph',
+                       'sql_by_source', 'repeated_sql')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/folded/',
+                 self.admin_site.admin_view(self.folded_view),
+                 name='profiling_requestprofile_folded'),
+        ] + super().get_urls()
+
+    def folded_view(self, request, pk):
+        '''Стеки в формате folded для flamegraph.pl или speedscope'''
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        response = HttpResponse(profile.folded,
+                                content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = (
+            f'attachment; filename=profile-{pk}.folded')
+        return response
+
+    @admin.display(description='Flame graph')
+    def flame_graph(self, obj):
+        return format_html(
+            '<a href="{}">Скачать стеки</a> (speedscope.app, flamegraph.pl)',
+            reverse('admin:profiling_requestprofile_folded', args=[obj.pk]))
+
+    @admin.display(description='SQL по месту вызова')
+    def sql_by_source(self, obj):
+        rows = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td><td>{:.1f}</td></tr>',
+            ((source or '-', count, total) for source, (count, total)
+             in profiler.summary_by_source(obj.queries)))
+        return format_html(
+            '<table><tr><th>Код</th><th>Запросов</th><th>мс</th></tr>'
+            '{}</table>', rows)
+
+    @admin.display(description='Повторяющиеся запросы')
+    def repeated_sql(self, obj):
+        rows = format_html_join(
+            '', '<tr><td>{}</td><td><code>{}</code></td></tr>',
+            ((count, sql) for sql, count
+             in profiler.repeated_queries(obj.queries)))
+        return format_html(
+            '<table><tr><th>Раз</th><th>SQL</th></tr>{}</table>', rows)
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.18 on 2026-10-19 09:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Снят')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.CharField(max_length=500, verbose_name='Адрес')),
+                ('view', models.CharField(blank=True, max_length=200, verbose_name='Маршрут')),
+                ('status', models.PositiveSmallIntegerField(verbose_name='Статус ответа')),
+                ('duration_ms', models.FloatField(verbose_name='Время ответа, мс')),
+                ('query_count', models.PositiveIntegerField(verbose_name='SQL-запросов')),
+                ('query_time_ms', models.FloatField(verbose_name='Время SQL, мс')),
+                ('samples', models.PositiveIntegerField(verbose_name='Сэмплов стека')),
+                ('folded', models.TextField(blank=True, help_text='Формат flamegraph.pl / speedscope: "a;b;c число"', verbose_name='Стеки (folded)')),
+                ('queries', models.JSONField(default=list, verbose_name='SQL-запросы')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='request_profiles', to=settings.AUTH_USER_MODEL, verbose_name='Кто запросил')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ('-created',),
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    '''Профиль одного запроса, снятый по запросу сотрудника'''
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Снят')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='request_profiles',
+        verbose_name='Кто запросил')
+    method = models.CharField(
+        max_length=10,
+        verbose_name='Метод')
+    path = models.CharField(
+        max_length=500,
+        verbose_name='Адрес')
+    view = models.CharField(
+        max_length=200,
+        blank=True,
+        verbose_name='Маршрут')
+    status = models.PositiveSmallIntegerField(
+        verbose_name='Статус ответа')
+    duration_ms = models.FloatField(
+        verbose_name='Время ответа, мс')
+    query_count = models.PositiveIntegerField(
+        verbose_name='SQL-запросов')
+    query_time_ms = models.FloatField(
+        verbose_name='Время SQL, мс')
+    samples = models.PositiveIntegerField(
+        verbose_name='Сэмплов стека')
+    folded = models.TextField(
+        blank=True,
+        verbose_name='Стеки (folded)',
+        help_text='Формат flamegraph.pl / speedscope: "a;b;c число"')
+    queries = models.JSONField(
+        default=list,
+        verbose_name='SQL-запросы')
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} мс)'
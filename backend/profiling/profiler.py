@@ -0,0 +1,192 @@
+'''Профилирование отдельного запроса по требованию сотрудника.
+
+Запрос сотрудника (is_staff) с заголовком X-Profile: 1 или параметром
+?profile=1 выполняется под сэмплирующим профилировщиком: отдельный поток
+каждые PROFILING_SAMPLE_INTERVAL секунд снимает стек потока запроса и
+копит стеки в формате folded (flamegraph.pl, speedscope). Каждый
+SQL-запрос записывается с временем и местом в коде проекта, откуда он
+выполнен (например, get_is_favorited в api/serializers.py). Результат
+сохраняется в RequestProfile и смотрится в админке.
+
+На весь сервис снимается не больше одного профиля в
+PROFILING_MIN_INTERVAL секунд. Запросы без флага middleware только
+проверяет на наличие заголовка и параметра.
+'''
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import RequestProfile
+
+PROJECT_ROOT = os.path.join(str(settings.BASE_DIR), '')
+SLOT_KEY = 'profiling-slot'
+SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def requested(request):
+    '''Клиент просит профиль запроса'''
+    return (request.META.get('HTTP_X_PROFILE') in ('1', 'true')
+            or request.GET.get('profile') in ('1', 'true'))
+
+
+def staff_user(request):
+    '''Сотрудник, отправивший запрос (сессия или токен), или None'''
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            authenticated = TokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        user = authenticated[0] if authenticated else None
+    return user if user is not None and user.is_staff else None
+
+
+def acquire_slot():
+    return cache.add(SLOT_KEY, True, settings.PROFILING_MIN_INTERVAL)
+
+
+def _location(filename):
+    if filename.startswith(PROJECT_ROOT) and 'site-packages' not in filename:
+        return filename[len(PROJECT_ROOT):]
+    if 'site-packages' in filename:
+        return filename.split('site-packages' + os.sep, 1)[1]
+    return os.path.basename(filename)
+
+
+def _is_project(filename):
+    return (filename.startswith(PROJECT_ROOT)
+            and 'site-packages' not in filename
+            and filename != __file__)
+
+
+def folded_stack(frame):
+    '''Стек в формате folded: от корня к листу через ";"'''
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({_location(code.co_filename)})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler(threading.Thread):
+    '''Периодически снимает стек указанного потока'''
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='request-profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.finished = threading.Event()
+
+    def run(self):
+        while not self.finished.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[folded_stack(frame)] += 1
+
+    def stop(self):
+        self.finished.set()
+        self.join()
+
+
+class QueryRecorder:
+    '''execute_wrapper: время и источник каждого SQL-запроса'''
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.count = 0
+        self.total = 0.0
+        self.queries = []
+
+    def source(self):
+        stack = []
+        frame = sys._getframe(2)
+        while frame is not None and len(stack) < 6:
+            code = frame.f_code
+            if _is_project(code.co_filename):
+                stack.append(f'{_location(code.co_filename)}:'
+                             f'{frame.f_lineno} {code.co_name}')
+            frame = frame.f_back
+        return stack
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.count += 1
+            self.total += elapsed
+            if len(self.queries) < self.limit:
+                stack = self.source()
+                self.queries.append({
+                    'sql': sql,
+                    'ms': round(elapsed, 3),
+                    'source': stack[0] if stack else '',
+                    'stack': stack,
+                })
+
+
+def profile(request, get_response, user):
+    '''Выполняет запрос под профилировщиком и сохраняет профиль'''
+    recorder = QueryRecorder(settings.PROFILING_MAX_QUERIES)
+    sampler = Sampler(threading.get_ident(),
+                      settings.PROFILING_SAMPLE_INTERVAL)
+    wrapped = []
+    for connection in connections.all():
+        connection.execute_wrappers.append(recorder)
+        wrapped.append(connection)
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        response = get_response(request)
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        sampler.stop()
+        for connection in wrapped:
+            connection.execute_wrappers.remove(recorder)
+    match = request.resolver_match
+    saved = RequestProfile.objects.create(
+        user=user,
+        method=request.method,
+        path=request.get_full_path()[:500],
+        view=(match.view_name or '') if match else '',
+        status=response.status_code,
+        duration_ms=round(elapsed, 3),
+        query_count=recorder.count,
+        query_time_ms=round(recorder.total, 3),
+        samples=sum(sampler.stacks.values()),
+        folded='\n'.join(f'{stack} {count}'
+                         for stack, count in sampler.stacks.items()),
+        queries=recorder.queries,
+    )
+    response['X-Profile-Id'] = str(saved.pk)
+    return response
+
+
+def summary_by_source(queries):
+    '''Число и время SQL-запросов по месту вызова в коде'''
+    summary = {}
+    for query in queries:
+        row = summary.setdefault(query['source'], [0, 0.0])
+        row[0] += 1
+        row[1] += query['ms']
+    return sorted(summary.items(), key=lambda item: -item[1][1])
+
+
+def repeated_queries(queries):
+    '''Одинаковые с точностью до литералов запросы (признак N+1)'''
+    counter = Counter(SQL_LITERALS.sub('?', query['sql'])
+                      for query in queries)
+    return [(sql, count) for sql, count in counter.most_common()
+            if count > 1]
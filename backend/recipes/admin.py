@@ -1,22 +1,33 @@
 from django.contrib import admin
+from django.db.models import Count
+from foodgram.deletion import BulkDeleteAdminMixin
+from foodgram.paginator import EstimatedCountPaginator
 
-from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                     ShoppingСart, Tag)
+from .models import (Favorite, Ingredient, IngredientRecipe, MealPlanEntry,
+                     Recipe, ShoppingСart, Tag, UnitConversion)
 
 
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit',)
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
     search_fields = ('^name',)
 
 
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe',)
-    search_fields = ('user', 'recipe',)
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name',)
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class IngredientRecipeAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 if not hasattr(admin, 'display'):
@@ -28,29 +39,60 @@ if not hasattr(admin, 'display'):
     setattr(admin, 'display', display)
 
 
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(BulkDeleteAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'author', 'favorite_amount',)
+    list_select_related = ('author',)
     search_fields = ('^name',)
-    list_filter = ('author', 'name', 'tags',)
+    list_filter = ('tags',)
+    autocomplete_fields = ('author',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            favorite_total=Count('favorite', distinct=True))
 
     @admin.display(empty_value='Не добавляли')
     def favorite_amount(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorite_total
 
     favorite_amount.short_description = 'Сколько раз добавили в избранное'
+    favorite_amount.admin_order_field = 'favorite_total'
 
 
 class ShoppingСartAdmin(admin.ModelAdmin):
-    list_display = ('user', 'recipe',)
+    list_display = ('user', 'recipe', 'multiplier')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name',)
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class MealPlanEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'date', 'recipe', 'multiplier')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name',)
+    autocomplete_fields = ('user', 'recipe')
+    date_hierarchy = 'date'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class TagAdmin(admin.ModelAdmin):
     list_display = ('name', 'color', 'slug',)
 
 
+class UnitConversionAdmin(admin.ModelAdmin):
+    list_display = ('unit', 'base_unit', 'factor')
+    search_fields = ('unit', 'base_unit')
+
+
 admin.site.register(Favorite, FavoriteAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(IngredientRecipe, IngredientRecipeAdmin)
+admin.site.register(MealPlanEntry, MealPlanEntryAdmin)
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(ShoppingСart, ShoppingСartAdmin)
 admin.site.register(Tag, TagAdmin)
+admin.site.register(UnitConversion, UnitConversionAdmin)
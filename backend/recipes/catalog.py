@@ -0,0 +1,345 @@
+'''Общий для всех воркеров снимок справочников (ингредиенты и теги).
+
+Снимок хранится в бинарном файле, который каждый процесс gunicorn
+отображает в память (mmap) только для чтения, поэтому данные лежат в
+page cache один раз на весь хост. Файл пересобирается атомарно
+(запись во временный файл + os.replace) при изменении Ingredient или Tag,
+а воркеры замечают новую версию по смене inode. В заголовке снимка
+хранится версия справочника ингредиентов (Sequence 'ingredients').
+
+Формат файла (little-endian, каждая секция выровнена по 8 байт):
+    заголовок HEADER;
+    ингредиенты: id (q * n), смещения name и measurement_unit
+    (I * (n + 1) каждое), позиции в порядке возрастания id (I * n);
+    теги: id и бит в маске тегов рецепта (q * m каждое), смещения name,
+    color и slug (I * (m + 1) каждое);
+    строки в UTF-8, на которые указывают смещения.
+Ингредиенты отсортированы по name.lower(), что дает поиск по префиксу
+бинарным поиском.
+
+Снимок собирается при запуске (foodgram.startup.warm_up, команда
+build_catalog). Пока файла нет, get_catalog() отдает DatabaseCatalog с
+тем же интерфейсом, который читает справочники прямо из базы.
+'''
+import gzip
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from array import array
+
+from django.conf import settings
+from django.db.models.functions import Lower
+from foodgram.commit_hooks import on_commit_batch
+
+MAGIC = b'FGCATLG2'
+HEADER = struct.Struct('<8sQII')
+INT_SIZE = array('q').itemsize
+OFFSET_SIZE = array('I').itemsize
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_current = {'key': None, 'catalog': None}
+
+
+def _align(size):
+    return (size + 7) & ~7
+
+
+class Catalog:
+    '''Доступ к отображенному в память снимку справочников'''
+
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        magic, self.version, ingredients, tags = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError('Неизвестный формат снимка справочников.')
+        self._cursor = HEADER.size
+        self._view = view
+        self._ingredient_ids = self._ints(view, ingredients)
+        self._ingredient_names = self._offsets(view, ingredients + 1)
+        self._ingredient_units = self._offsets(view, ingredients + 1)
+        self._ingredient_by_id = self._offsets(view, ingredients)
+        self._tag_ids = self._ints(view, tags)
+        self._tag_bits = self._ints(view, tags)
+        self._tag_names = self._offsets(view, tags + 1)
+        self._tag_colors = self._offsets(view, tags + 1)
+        self._tag_slugs = self._offsets(view, tags + 1)
+        self._strings = view[self._cursor:]
+        self._snapshot = None
+        self._slug_bits = None
+        self._search_index = None
+
+    def _section(self, view, size):
+        section = view[self._cursor:self._cursor + size]
+        self._cursor += _align(size)
+        return section
+
+    def _ints(self, view, count):
+        return self._section(view, count * INT_SIZE).cast('q')
+
+    def _offsets(self, view, count):
+        return self._section(view, count * OFFSET_SIZE).cast('I')
+
+    def _string(self, offsets, index):
+        start, end = offsets[index], offsets[index + 1]
+        return str(self._strings[start:end], 'utf-8')
+
+    def _ingredient(self, index):
+        return {
+            'id': self._ingredient_ids[index],
+            'name': self._string(self._ingredient_names, index),
+            'measurement_unit': self._string(self._ingredient_units, index),
+        }
+
+    def _tag(self, index):
+        return {
+            'id': self._tag_ids[index],
+            'name': self._string(self._tag_names, index),
+            'color': self._string(self._tag_colors, index),
+            'slug': self._string(self._tag_slugs, index),
+        }
+
+    def _ingredient_position(self, pk):
+        '''Бинарный поиск позиции ингредиента по id'''
+        low, high = 0, len(self._ingredient_by_id)
+        while low < high:
+            middle = (low + high) // 2
+            position = self._ingredient_by_id[middle]
+            current = self._ingredient_ids[position]
+            if current == pk:
+                return position
+            if current < pk:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def ingredients(self, prefix=None):
+        '''Список ингредиентов, при необходимости - по началу названия'''
+        total = len(self._ingredient_ids)
+        if not prefix:
+            return [self._ingredient(index) for index in range(total)]
+        prefix = prefix.lower()
+        low, high = 0, total
+        while low < high:
+            middle = (low + high) // 2
+            name = self._string(self._ingredient_names, middle).lower()
+            if name < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        result = []
+        for index in range(low, total):
+            ingredient = self._ingredient(index)
+            if not ingredient['name'].lower().startswith(prefix):
+                break
+            result.append(ingredient)
+        return result
+
+    def search(self, query, limit):
+        '''Ингредиенты, похожие на query, с учетом опечаток'''
+        if self._search_index is None:
+            from .search import NgramIndex
+
+            self._search_index = NgramIndex(
+                self._string(self._ingredient_names, index)
+                for index in range(len(self._ingredient_ids)))
+        return [self._ingredient(position) for position, _
+                in self._search_index.search(query, limit)]
+
+    def ingredient(self, pk):
+        position = self._ingredient_position(pk)
+        if position is None:
+            return None
+        return self._ingredient(position)
+
+    def missing_ingredients(self, ids):
+        '''Идентификаторы, которых нет в справочнике ингредиентов'''
+        return [pk for pk in ids if self._ingredient_position(pk) is None]
+
+    def snapshot(self, compressed=False):
+        '''Полный справочник ингредиентов в JSON (или gzip) для клиентов'''
+        if self._snapshot is None:
+            raw = json.dumps(
+                {'version': self.version, 'ingredients': self.ingredients()},
+                ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            self._snapshot = (raw, gzip.compress(raw))
+        return self._snapshot[1] if compressed else self._snapshot[0]
+
+    def tags(self):
+        return [self._tag(index) for index in range(len(self._tag_ids))]
+
+    def tag_bits(self):
+        '''Соответствие slug тега и его бита в Recipe.tags_mask'''
+        if self._slug_bits is None:
+            self._slug_bits = {
+                self._string(self._tag_slugs, index): self._tag_bits[index]
+                for index in range(len(self._tag_ids))
+            }
+        return self._slug_bits
+
+    def tag(self, pk):
+        for index, current in enumerate(self._tag_ids):
+            if current == pk:
+                return self._tag(index)
+        return None
+
+
+class DatabaseCatalog:
+    '''Те же справочники запросами к базе - пока снимок не собран'''
+
+    INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit')
+    TAG_FIELDS = ('id', 'name', 'color', 'slug')
+
+    def __init__(self):
+        from .models import Ingredient, Sequence, Tag
+
+        self._ingredients = Ingredient.objects.order_by(Lower('name'), 'id')
+        self._tags = Tag.objects.order_by('name')
+        self.version = Sequence.current_value(Ingredient.VERSION_SEQUENCE)
+
+    def ingredients(self, prefix=None):
+        ingredients = self._ingredients
+        if prefix:
+            ingredients = ingredients.filter(name__istartswith=prefix)
+        return list(ingredients.values(*self.INGREDIENT_FIELDS))
+
+    def search(self, query, limit):
+        return list(self._ingredients.filter(name__icontains=query).values(
+            *self.INGREDIENT_FIELDS)[:limit])
+
+    def ingredient(self, pk):
+        return self._ingredients.filter(pk=pk).values(
+            *self.INGREDIENT_FIELDS).first()
+
+    def missing_ingredients(self, ids):
+        found = set(self._ingredients.filter(pk__in=ids).values_list(
+            'pk', flat=True))
+        return [pk for pk in ids if pk not in found]
+
+    def snapshot(self, compressed=False):
+        raw = json.dumps(
+            {'version': self.version, 'ingredients': self.ingredients()},
+            ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return gzip.compress(raw) if compressed else raw
+
+    def tags(self):
+        return list(self._tags.values(*self.TAG_FIELDS))
+
+    def tag_bits(self):
+        return dict(self._tags.values_list('slug', 'bit'))
+
+    def tag(self, pk):
+        return self._tags.filter(pk=pk).values(*self.TAG_FIELDS).first()
+
+
+def _pack_strings(values, blob):
+    offsets = array('I', [len(blob)])
+    for value in values:
+        blob.extend(value.encode('utf-8'))
+        offsets.append(len(blob))
+    return offsets
+
+
+def _serialize(ingredients, tags, version):
+    ingredients = sorted(ingredients,
+                         key=lambda row: (row[1].lower(), row[0]))
+    blob = bytearray()
+    sections = [
+        array('q', [row[0] for row in ingredients]),
+        _pack_strings([row[1] for row in ingredients], blob),
+        _pack_strings([row[2] for row in ingredients], blob),
+        array('I', sorted(range(len(ingredients)),
+                          key=lambda index: ingredients[index][0])),
+        array('q', [row[0] for row in tags]),
+        array('q', [row[4] for row in tags]),
+        _pack_strings([row[1] for row in tags], blob),
+        _pack_strings([row[2] for row in tags], blob),
+        _pack_strings([row[3] for row in tags], blob),
+    ]
+    data = bytearray(
+        HEADER.pack(MAGIC, version, len(ingredients), len(tags)))
+    for section in sections:
+        raw = section.tobytes()
+        data.extend(raw)
+        data.extend(b'\0' * (_align(len(raw)) - len(raw)))
+    data.extend(blob)
+    return bytes(data)
+
+
+def build_catalog(using='default'):
+    '''Собирает снимок из базы и атомарно подменяет файл'''
+    from .models import Ingredient, Sequence, Tag
+
+    version = Sequence.current_value(Ingredient.VERSION_SEQUENCE, using)
+    ingredients = Ingredient.objects.using(using).values_list(
+        'id', 'name', 'measurement_unit')
+    tags = Tag.objects.using(using).order_by('name').values_list(
+        'id', 'name', 'color', 'slug', 'bit')
+    data = _serialize(list(ingredients), list(tags), version)
+
+    path = settings.CATALOG_SNAPSHOT_PATH
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.catalog-')
+    try:
+        with os.fdopen(handle, 'wb') as snapshot:
+            snapshot.write(data)
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return path
+
+
+def _map(path):
+    with open(path, 'rb') as snapshot:
+        buffer = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+    return Catalog(buffer)
+
+
+def ensure_catalog(using='default'):
+    '''Собирает снимок, если файла нет или он старого формата'''
+    try:
+        _map(settings.CATALOG_SNAPSHOT_PATH)
+    except (FileNotFoundError, ValueError):
+        build_catalog(using)
+
+
+def get_catalog():
+    '''Текущий снимок; перечитывается, если файл был подменен'''
+    path = settings.CATALOG_SNAPSHOT_PATH
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        logger.warning('Снимок справочников %s не найден', path)
+        return DatabaseCatalog()
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    if _current['key'] == key:
+        return _current['catalog']
+    with _lock:
+        if _current['key'] != key:
+            try:
+                catalog = _map(path)
+            except ValueError:
+                logger.warning('Снимок справочников %s старого формата',
+                               path)
+                return DatabaseCatalog()
+            _current['catalog'] = catalog
+            _current['key'] = key
+    return _current['catalog']
+
+
+def schedule_rebuild(using='default'):
+    '''Пересборка снимка после фиксации транзакции, одна на транзакцию'''
+    on_commit_batch('catalog', lambda aliases: build_catalog(using),
+                    [using], using)
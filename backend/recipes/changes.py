@@ -0,0 +1,121 @@
+'''Журнал изменений избранного и списка покупок для синхронизации клиентов.
+
+Каждое добавление и удаление рецепта записывается в CollectionChange с
+версией из счетчика пользователя (User.changes_version). Счетчик
+увеличивается в той же транзакции, что и запись, а строка пользователя
+остается заблокированной до ее конца, поэтому версии одного пользователя
+фиксируются по возрастанию и клиент, запомнивший курсор, ничего не
+пропустит.
+
+Клиент без курсора получает resync_required и текущий курсор, загружает
+списки целиком (is_favorited=1, is_in_shopping_cart=1) и дальше
+запрашивает только изменения после курсора. Команда compact_changes
+удаляет записи, перекрытые более новыми по тому же рецепту (без потери
+информации), и записи старше CHANGE_FEED_RETENTION_DAYS - после этого
+курсоры старше User.changes_floor требуют полной синхронизации.
+'''
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, F, Max, OuterRef
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import CollectionChange
+
+User = get_user_model()
+
+
+def record(user_id, collection, recipe_ids, added, using='default'):
+    '''Записывает добавление или удаление рецептов recipe_ids'''
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    with transaction.atomic(using=using):
+        users = User.objects.using(using).filter(pk=user_id)
+        if not users.update(
+                changes_version=F('changes_version') + len(recipe_ids)):
+            # Пользователь удаляется вместе со своим журналом.
+            return
+        last = users.values_list('changes_version', flat=True).get()
+        first = last - len(recipe_ids) + 1
+        CollectionChange.objects.using(using).bulk_create(
+            CollectionChange(user_id=user_id, recipe_id=recipe_id,
+                             collection=collection, added=added,
+                             version=version)
+            for version, recipe_id in enumerate(recipe_ids, first))
+
+
+def record_deleted(queryset, collection):
+    '''Удаление строк избранного или корзины пачкой'''
+    grouped = {}
+    for user_id, recipe_id in queryset.values_list('user_id', 'recipe_id'):
+        grouped.setdefault(user_id, []).append(recipe_id)
+    for user_id, recipe_ids in grouped.items():
+        record(user_id, collection, recipe_ids, False, queryset.db)
+
+
+def changes_since(user, since, limit=None):
+    '''Изменения списков пользователя после курсора since.
+
+    По каждому рецепту возвращается только последнее изменение; при
+    limit записей за раз курсор указывает на последнюю отданную запись,
+    а has_more - что есть еще.
+    '''
+    limit = limit or settings.CHANGE_FEED_PAGE_SIZE
+    version, floor = User.objects.filter(pk=user.pk).values_list(
+        'changes_version', 'changes_floor').get()
+    result = {
+        'cursor': version,
+        'resync_required': False,
+        'has_more': False,
+    }
+    for collection, _ in CollectionChange.COLLECTIONS:
+        result[collection] = {'added': [], 'removed': []}
+    if since is None or since < floor or since > version:
+        result['resync_required'] = True
+        return result
+    entries = list(
+        CollectionChange.objects.filter(user=user, version__gt=since)
+        .order_by('version')
+        .values_list('version', 'collection', 'recipe_id', 'added')
+        [:limit + 1])
+    if len(entries) > limit:
+        entries = entries[:limit]
+        result['has_more'] = True
+        result['cursor'] = entries[-1][0]
+    latest = {}
+    for _, collection, recipe_id, added in entries:
+        latest[(collection, recipe_id)] = added
+    for (collection, recipe_id), added in latest.items():
+        result[collection]['added' if added else 'removed'].append(
+            recipe_id)
+    return result
+
+
+def compact(retention_days=None):
+    '''Сжимает журнал; возвращает число удаленных перекрытых и
+    устаревших записей'''
+    if retention_days is None:
+        retention_days = settings.CHANGE_FEED_RETENTION_DAYS
+    newer = CollectionChange.objects.filter(
+        user_id=OuterRef('user_id'),
+        collection=OuterRef('collection'),
+        recipe_id=OuterRef('recipe_id'),
+        version__gt=OuterRef('version'))
+    superseded, _ = CollectionChange.objects.filter(Exists(newer)).delete()
+
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    expired = 0
+    floors = (CollectionChange.objects.filter(created__lt=cutoff)
+              .values('user_id').annotate(top=Max('version')).order_by())
+    for row in floors:
+        with transaction.atomic():
+            User.objects.filter(pk=row['user_id']).update(
+                changes_floor=Greatest(F('changes_floor'), row['top']))
+            deleted, _ = CollectionChange.objects.filter(
+                user_id=row['user_id'], version__lte=row['top']).delete()
+        expired += deleted
+    return superseded, expired
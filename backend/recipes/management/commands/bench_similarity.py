@@ -0,0 +1,94 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from recipes import similarity
+
+
+class Command(BaseCommand):
+    help = ('Benchmark MinHash/LSH lookups against exact Jaccard search '
+            'on a generated in-memory recipe dataset.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--ingredients', type=int, default=2200)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--bands', type=int,
+                            default=settings.SIMILARITY_BANDS)
+        parser.add_argument('--rows', type=int,
+                            default=settings.SIMILARITY_ROWS)
+        parser.add_argument('--threshold', type=float,
+                            default=settings.SIMILARITY_THRESHOLD)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def generate(self, options):
+        '''Наборы ингредиентов: популярные ингредиенты встречаются чаще,
+        каждый пятый рецепт - вариация одного из предыдущих'''
+        generator = random.Random(options['seed'])
+        population = range(1, options['ingredients'] + 1)
+        weights = [1 / rank for rank in population]
+        recipes = []
+        for number in range(options['recipes']):
+            if recipes and number % 5 == 0:
+                base = set(generator.choice(recipes))
+                base.discard(generator.choice(sorted(base)))
+                base.add(generator.choice(population))
+                recipes.append(frozenset(base))
+                continue
+            size = generator.randint(4, 15)
+            recipes.append(frozenset(
+                generator.choices(population, weights, k=size)))
+        return recipes
+
+    def handle(self, *args, **options):
+        shape = (options['bands'], options['rows'])
+        threshold, limit = options['threshold'], options['limit']
+        recipes = self.generate(options)
+
+        started = time.perf_counter()
+        signatures, buckets = [], {}
+        for number, ingredients in enumerate(recipes):
+            values = similarity.signature(sorted(ingredients), shape)
+            signatures.append(values)
+            for key in similarity.bucket_keys(values, shape):
+                buckets.setdefault(key, []).append(number)
+        build_time = time.perf_counter() - started
+
+        queries = random.Random(options['seed']).sample(
+            range(len(recipes)), options['queries'])
+        lsh_time = exact_time = 0.0
+        found = relevant = candidates_total = 0
+        for query in queries:
+            started = time.perf_counter()
+            candidates = set()
+            for key in similarity.bucket_keys(signatures[query], shape):
+                candidates.update(buckets[key])
+            candidates.discard(query)
+            scored = sorted(
+                ((similarity.estimate(signatures[query], signatures[pk]), pk)
+                 for pk in candidates), reverse=True)
+            lsh = {pk for score, pk in scored[:limit] if score >= threshold}
+            lsh_time += time.perf_counter() - started
+            candidates_total += len(candidates)
+
+            started = time.perf_counter()
+            own = recipes[query]
+            exact = sorted(
+                ((len(own & other) / len(own | other), pk)
+                 for pk, other in enumerate(recipes) if pk != query),
+                reverse=True)
+            exact = {pk for score, pk in exact[:limit] if score >= threshold}
+            exact_time += time.perf_counter() - started
+            found += len(lsh & exact)
+            relevant += len(exact)
+
+        count = len(queries)
+        self.stdout.write(
+            f'recipes: {len(recipes)}, bands x rows: {shape[0]}x{shape[1]}, '
+            f'index build: {build_time:.1f} s\n'
+            f'LSH lookup: {lsh_time / count * 1000:.2f} ms/query, '
+            f'{candidates_total / count:.0f} candidates/query\n'
+            f'exact scan: {exact_time / count * 1000:.2f} ms/query\n'
+            f'recall@{limit}: {found / relevant if relevant else 1:.3f}')
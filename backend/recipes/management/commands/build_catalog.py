@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from recipes.catalog import build_catalog
+
+
+class Command(BaseCommand):
+    help = 'Build shared memory-mapped snapshot of ingredients and tags.'
+
+    def handle(self, *args, **kwargs):
+        path = build_catalog()
+        self.stdout.write(self.style.SUCCESS(f'Catalog snapshot: {path}'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes import similarity
+from recipes.models import IngredientRecipe, Recipe
+
+
+class Command(BaseCommand):
+    help = 'Build MinHash/LSH index of recipe ingredient sets.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(Recipe.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            ingredients = {pk: [] for pk in batch}
+            for recipe_id, ingredient_id in IngredientRecipe.objects.filter(
+                    recipe_id__in=batch).values_list(
+                        'recipe_id', 'ingredient_id'):
+                ingredients[recipe_id].append(ingredient_id)
+            with transaction.atomic():
+                for recipe_id, ingredient_ids in ingredients.items():
+                    similarity.update_index(recipe_id, ingredient_ids)
+            self.stdout.write(f'{start + len(batch)}/{len(ids)}')
+        self.stdout.write(self.style.SUCCESS('Similarity index is built.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from jobs.queue import enqueue
+from recipes.tasks import delete_recipes
+from users.tasks import delete_users
+
+TASKS = {
+    'recipes': (delete_recipes, 'recipe_ids'),
+    'users': (delete_users, 'user_ids'),
+}
+
+
+class Command(BaseCommand):
+    help = ('Delete users or recipes with all dependent rows using batched '
+            'set-based DELETEs. With --async the deletion is queued for '
+            'the run_workers command.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(TASKS))
+        parser.add_argument('ids', nargs='+', type=int)
+        parser.add_argument('--async', action='store_true',
+                            dest='in_background')
+
+    def handle(self, *args, **options):
+        function, argument = TASKS[options['kind']]
+        payload = {argument: options['ids']}
+        if options['in_background']:
+            job = enqueue(function.job_name, payload)
+            self.stdout.write(f'Queued job {job.pk}.')
+            return
+        result = function(**payload)
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted rows: {result["deleted"]}.'))
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from recipes.changes import compact
+
+
+class Command(BaseCommand):
+    help = ('Compact the favorites and shopping cart change feed: drop '
+            'entries superseded by a newer change of the same recipe and '
+            'entries older than CHANGE_FEED_RETENTION_DAYS. Clients with '
+            'a cursor older than the dropped entries are asked to resync. '
+            'Run it on a schedule, e.g. daily.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int,
+                            default=settings.CHANGE_FEED_RETENTION_DAYS)
+
+    def handle(self, *args, **options):
+        superseded, expired = compact(options['retention_days'])
+        self.stdout.write(
+            f'Superseded entries removed: {superseded}, '
+            f'expired entries removed: {expired}.')
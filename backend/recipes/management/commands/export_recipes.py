@@ -0,0 +1,82 @@
+import json
+import sys
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from recipes.models import IngredientRecipe, Recipe
+
+
+class Command(BaseCommand):
+    help = ('Stream recipes with ingredients, tags, author and image '
+            'reference to a JSON Lines file (one recipe per line) for '
+            'import_recipes. Memory use does not depend on table size.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-',
+                            help='File name, "-" for stdout.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def batches(self, size):
+        last_pk = 0
+        while True:
+            batch = list(
+                Recipe.objects.filter(pk__gt=last_pk).order_by('pk')
+                .select_related('author')[:size])
+            if not batch:
+                return
+            last_pk = batch[-1].pk
+            yield batch
+
+    def records(self, batch):
+        pks = [recipe.pk for recipe in batch]
+        ingredients = defaultdict(list)
+        for recipe_id, name, unit, amount in (
+                IngredientRecipe.objects.filter(recipe_id__in=pks)
+                .order_by('recipe_id', 'ingredient__name')
+                .values_list('recipe_id', 'ingredient__name',
+                             'ingredient__measurement_unit', 'amount')):
+            ingredients[recipe_id].append([name, unit, amount])
+        tags = defaultdict(list)
+        for recipe_id, slug in (
+                Recipe.tags.through.objects.filter(recipe_id__in=pks)
+                .order_by('recipe_id', 'tag__slug')
+                .values_list('recipe_id', 'tag__slug')):
+            tags[recipe_id].append(slug)
+        for recipe in batch:
+            author = recipe.author
+            yield {
+                'author': {
+                    'username': author.username,
+                    'email': author.email,
+                    'first_name': author.first_name,
+                    'last_name': author.last_name,
+                },
+                'name': recipe.name,
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+                'pub_date': recipe.pub_date.isoformat(),
+                'image': recipe.image.name,
+                'tags': tags[recipe.pk],
+                'ingredients': ingredients[recipe.pk],
+            }
+
+    def handle(self, *args, **options):
+        output = (sys.stdout if options['output'] == '-'
+                  else open(options['output'], 'w', encoding='utf-8'))
+        started = time.perf_counter()
+        exported = 0
+        try:
+            for batch in self.batches(options['batch_size']):
+                for record in self.records(batch):
+                    output.write(json.dumps(
+                        record, ensure_ascii=False, separators=(',', ':')))
+                    output.write('\n')
+                    exported += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        elapsed = time.perf_counter() - started
+        self.stderr.write(
+            f'Exported {exported} recipes in {elapsed:.1f} s '
+            f'({exported / max(elapsed, 1e-9):.0f} recipes/s).')
@@ -0,0 +1,63 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from foodgram.deletion import bulk_delete
+from recipes.models import IngredientRecipe, Recipe
+
+
+class Command(BaseCommand):
+    help = ('Fill Recipe.fingerprint for existing recipes in batches. '
+            'Later copies of the same recipe by the same author are left '
+            'without a fingerprint and reported, or deleted with '
+            '--delete-duplicates.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--delete-duplicates', action='store_true')
+
+    def handle(self, *args, **options):
+        size = options['batch_size']
+        last_pk = 0
+        updated = 0
+        duplicates = []
+        while True:
+            batch = list(
+                Recipe.objects.filter(fingerprint='', pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', 'author_id', 'name', 'cooking_time')[:size])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            ingredients = defaultdict(list)
+            for recipe_id, ingredient_id, amount in (
+                    IngredientRecipe.objects
+                    .filter(recipe_id__in=[row[0] for row in batch])
+                    .values_list('recipe_id', 'ingredient_id', 'amount')):
+                ingredients[recipe_id].append((ingredient_id, amount))
+            fingerprints = {
+                pk: (author_id, Recipe.make_fingerprint(
+                    name, cooking_time, ingredients[pk]))
+                for pk, author_id, name, cooking_time in batch
+            }
+            taken = set(Recipe.objects.filter(
+                author_id__in={author for author, _ in fingerprints.values()},
+                fingerprint__in={value for _, value in fingerprints.values()},
+            ).values_list('author_id', 'fingerprint'))
+            recipes = []
+            for pk, key in fingerprints.items():
+                if key in taken:
+                    duplicates.append(pk)
+                    continue
+                taken.add(key)
+                recipes.append(Recipe(pk=pk, fingerprint=key[1]))
+            Recipe.objects.bulk_update(recipes, ['fingerprint'])
+            updated += len(recipes)
+
+        self.stdout.write(f'Fingerprinted: {updated}, '
+                          f'duplicates: {len(duplicates)}.')
+        if duplicates and options['delete_duplicates']:
+            deleted, _ = bulk_delete(Recipe.objects.filter(pk__in=duplicates))
+            self.stdout.write(f'Deleted rows: {deleted}.')
+        elif duplicates:
+            self.stdout.write('Duplicate recipe ids: ' + ', '.join(
+                map(str, duplicates[:100])))
@@ -0,0 +1,72 @@
+import os
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import models
+
+
+class Command(BaseCommand):
+    help = ('Delete media files that are not referenced by any file field. '
+            'Files younger than --min-age seconds are kept, so uploads of '
+            'unfinished transactions survive.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=3600)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def file_fields(self):
+        for model in apps.get_models():
+            for field in model._meta.concrete_fields:
+                if isinstance(field, models.FileField):
+                    yield model, field
+
+    def references(self):
+        '''Число ссылок на каждый файл из всех FileField проекта'''
+        counter = Counter()
+        for model, field in self.file_fields():
+            names = model._default_manager.exclude(
+                **{field.name: ''}).values_list(field.name, flat=True)
+            counter.update(name for name in names.iterator() if name)
+        return counter
+
+    def referenced(self, name):
+        '''Ссылается ли на файл хоть одна запись прямо сейчас'''
+        return any(
+            model._default_manager.filter(**{field.name: name}).exists()
+            for model, field in self.file_fields())
+
+    def handle(self, *args, **options):
+        references = self.references()
+        deadline = time.time() - options['min_age']
+        root = settings.MEDIA_ROOT
+        removed = freed = kept = 0
+        for directory, _, files in os.walk(root, topdown=False):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                if references[name]:
+                    kept += 1
+                    continue
+                stat = os.stat(path)
+                if stat.st_mtime > deadline:
+                    continue
+                # Пока шел обход, файл мог снова понадобиться: повторная
+                # загрузка обновляет его mtime, сохранение - ссылку.
+                if self.referenced(name) or (
+                        os.stat(path).st_mtime > deadline):
+                    kept += 1
+                    continue
+                removed += 1
+                freed += stat.st_size
+                if not options['dry_run']:
+                    os.unlink(path)
+            if (directory != root and not options['dry_run']
+                    and not os.listdir(directory)):
+                os.rmdir(directory)
+        action = 'To remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action}: {removed} files ({freed} bytes), '
+            f'referenced: {kept}.'))
@@ -0,0 +1,193 @@
+import json
+import sys
+import time
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from recipes import similarity
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from users import counters
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Import recipes from a JSON Lines file made by export_recipes. '
+            'Each chunk is inserted with bulk_create in its own '
+            'transaction; recipes already present (same author and '
+            'fingerprint) are skipped, so an interrupted import can be '
+            'restarted with the same file.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='File name, "-" for stdin.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--author',
+                            help='Assign all recipes to this username.')
+        parser.add_argument('--create-authors', action='store_true',
+                            help='Create missing authors (without '
+                                 'password). Records whose author email '
+                                 'belongs to another user are skipped.')
+
+    def authors(self, records, options):
+        '''username автора в файле -> id пользователя и username авторов,
+        чей email уже занят другим пользователем'''
+        if options['author']:
+            return {record['author']['username']: self.fixed_author
+                    for record in records}, set()
+        usernames = {record['author']['username'] for record in records}
+        found = dict(User.objects.filter(username__in=usernames)
+                     .values_list('username', 'pk'))
+        conflicts = set()
+        if options['create_authors']:
+            missing = [record['author'] for record in records
+                       if record['author']['username'] not in found]
+            taken = set(User.objects.filter(email__in={
+                author['email'] for author in missing
+            }).values_list('email', flat=True))
+            for author in missing:
+                username = author['username']
+                if username in found or username in conflicts:
+                    continue
+                if author['email'] in taken:
+                    conflicts.add(username)
+                    continue
+                user = User(**author)
+                user.set_unusable_password()
+                user.save()
+                found[user.username] = user.pk
+                taken.add(user.email)
+        return found, conflicts
+
+    def import_chunk(self, records, options, skipped):
+        authors, conflicts = self.authors(records, options)
+        ingredients = {
+            (name, unit): pk for name, unit, pk in
+            Ingredient.objects.filter(name__in={
+                item[0] for record in records
+                for item in record['ingredients']
+            }).values_list('name', 'measurement_unit', 'pk')
+        }
+        tags = {slug: (pk, bit) for slug, pk, bit in Tag.objects.filter(
+            slug__in={slug for record in records for slug in record['tags']}
+        ).values_list('slug', 'pk', 'bit')}
+
+        prepared = {}
+        for record in records:
+            username = record['author']['username']
+            author_id = authors.get(username)
+            if author_id is None:
+                skipped['author conflict' if username in conflicts
+                        else 'unknown author'] += 1
+                continue
+            try:
+                amounts = [(ingredients[(name, unit)], amount)
+                           for name, unit, amount in record['ingredients']]
+            except KeyError:
+                skipped['unknown ingredient'] += 1
+                continue
+            fingerprint = Recipe.make_fingerprint(
+                record['name'], record['cooking_time'], amounts)
+            if (author_id, fingerprint) in prepared:
+                skipped['duplicate'] += 1
+                continue
+            prepared[(author_id, fingerprint)] = (record, amounts)
+
+        existing = set(Recipe.objects.filter(
+            author_id__in={author for author, _ in prepared},
+            fingerprint__in={value for _, value in prepared},
+        ).values_list('author_id', 'fingerprint'))
+        for key in existing & set(prepared):
+            del prepared[key]
+            skipped['already imported'] += 1
+        if not prepared:
+            return 0
+
+        recipes = []
+        for (author_id, fingerprint), (record, _) in prepared.items():
+            record_tags = [tags[slug] for slug in record['tags']
+                           if slug in tags]
+            mask = 0
+            for _, bit in record_tags:
+                mask |= 1 << bit
+            recipes.append(Recipe(
+                author_id=author_id, fingerprint=fingerprint,
+                name=record['name'], text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record['image'], tags_mask=mask))
+            if not default_storage.exists(record['image']):
+                skipped['missing image file (imported)'] += 1
+
+        with transaction.atomic():
+            Recipe.objects.bulk_create(recipes)
+            # id нужны и на базах, где bulk_create их не возвращает.
+            created = {
+                (author_id, fingerprint): pk
+                for author_id, fingerprint, pk in Recipe.objects.filter(
+                    author_id__in={author for author, _ in prepared},
+                    fingerprint__in={value for _, value in prepared},
+                ).values_list('author_id', 'fingerprint', 'pk')
+            }
+            dated, links, tag_links = [], [], []
+            for key, (record, amounts) in prepared.items():
+                pk = created[key]
+                dated.append(Recipe(
+                    pk=pk, pub_date=parse_datetime(record['pub_date'])))
+                links.extend(
+                    IngredientRecipe(recipe_id=pk, ingredient_id=ingredient,
+                                     amount=amount)
+                    for ingredient, amount in amounts)
+                tag_links.extend(
+                    Recipe.tags.through(recipe_id=pk, tag_id=tags[slug][0])
+                    for slug in record['tags'] if slug in tags)
+            # auto_now_add перезаписывает дату при вставке.
+            Recipe.objects.bulk_update(dated, ['pub_date'])
+            IngredientRecipe.objects.bulk_create(links)
+            Recipe.tags.through.objects.bulk_create(tag_links)
+            counters.change(User, 'recipes_count', Counter(
+                author_id for author_id, _ in prepared))
+            for key, (_, amounts) in prepared.items():
+                similarity.update_index(
+                    created[key], [ingredient for ingredient, _ in amounts])
+        return len(prepared)
+
+    def handle(self, *args, **options):
+        if options['author']:
+            try:
+                self.fixed_author = User.objects.get(
+                    username=options['author']).pk
+            except User.DoesNotExist:
+                raise CommandError(f'No user {options["author"]}.')
+        source = (sys.stdin if options['input'] == '-'
+                  else open(options['input'], encoding='utf-8'))
+        started = time.perf_counter()
+        imported = read = 0
+        skipped = Counter()
+        try:
+            lines = (line for line in source if line.strip())
+            while True:
+                records = [json.loads(line) for line in
+                           islice(lines, options['batch_size'])]
+                if not records:
+                    break
+                read += len(records)
+                imported += self.import_chunk(records, options, skipped)
+                if options['verbosity'] > 1:
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f'{read} read, {imported} imported, '
+                        f'{read / max(elapsed, 1e-9):.0f} lines/s')
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Read {read}, imported {imported} recipes in {elapsed:.1f} s '
+            f'({read / max(elapsed, 1e-9):.0f} lines/s, '
+            f'{imported / max(elapsed, 1e-9):.0f} recipes/s).'))
+        for reason, count in sorted(skipped.items()):
+            self.stdout.write(f'{reason}: {count}')
@@ -1,22 +1,35 @@
 from csv import reader
 
 from django.core.management.base import BaseCommand
-from recipes.models import Ingredient
+from django.db import transaction
+from recipes import catalog
+from recipes.models import Ingredient, Sequence
 
 
 class Command(BaseCommand):
     help = 'Load ingredients data from csv-file to DB.'
 
+    @transaction.atomic
     def handle(self, *args, **kwargs):
+        existing = set(
+            Ingredient.objects.values_list('name', 'measurement_unit'))
         with open(
                 'recipes/data/ingredients.csv', 'r',
                 encoding='UTF-8'
         ) as ingredients:
-            for row in reader(ingredients):
-                if len(row) == 2:
-                    if not Ingredient.objects.filter(
-                        name=row[0], measurement_unit=row[1],
-                    ).exists():
-                        Ingredient.objects.get_or_create(
-                            name=row[0], measurement_unit=row[1],
-                        )
+            rows = {
+                (row[0], row[1]) for row in reader(ingredients)
+                if len(row) == 2
+            } - existing
+        if not rows:
+            return
+        # Вся загрузка - одно изменение справочника с одной версией.
+        version = Sequence.next_value(Ingredient.VERSION_SEQUENCE)
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=measurement_unit,
+                        version=version)
+             for name, measurement_unit in sorted(rows)],
+            batch_size=1000,
+        )
+        catalog.schedule_rebuild()
+        self.stdout.write(f'Loaded {len(rows)} ingredients.')
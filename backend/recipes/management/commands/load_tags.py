@@ -1,12 +1,14 @@
 from csv import reader
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from recipes.models import Tag
 
 
 class Command(BaseCommand):
     help = 'Load tags data from csv-file to DB.'
 
+    @transaction.atomic
     def handle(self, *args, **kwargs):
         with open(
                 'recipes/data/recipes_tag.csv', 'r',
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from recipes.meal_plan import rebuild
+from recipes.models import MealPlanDayTotal, MealPlanEntry
+
+
+class Command(BaseCommand):
+    help = ('Recalculate per-day ingredient totals of meal plans from '
+            'plan entries, e.g. after editing recipe ingredients '
+            'directly in the database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Days per transaction.')
+
+    def handle(self, *args, **options):
+        days = (set(MealPlanEntry.objects.values_list('user_id', 'date'))
+                | set(MealPlanDayTotal.objects.values_list(
+                    'user_id', 'date')))
+        days = sorted(days)
+        size = options['batch_size']
+        for start in range(0, len(days), size):
+            rebuild(days[start:start + size])
+        self.stdout.write(f'Days recalculated: {len(days)}.')
@@ -0,0 +1,85 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from recipes.models import Recipe, RecipeActivity
+
+
+class Command(BaseCommand):
+    help = ('Recalculate time-decayed trending scores of recipes from '
+            'hourly activity buckets and compact old buckets. '
+            'Run it on a schedule, e.g. every 10 minutes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def merged_hour(self, buckets, decay):
+        '''Время для слитой корзины: общее число событий с весом на этот
+        момент равно сумме весов почасовых корзин при любом "сейчас"'''
+        latest = max(hour for hour, _ in buckets)
+        total = sum(count for _, count in buckets)
+        weight = sum(
+            count * math.exp(-decay * (latest - hour).total_seconds() / 3600)
+            for hour, count in buckets)
+        if not total:
+            return latest
+        return latest - timedelta(hours=math.log(total / weight) / decay)
+
+    def compact(self, now, decay):
+        '''Удаляет устаревшие корзины, а старше суток сливает по дням'''
+        retention = now - timedelta(hours=settings.TRENDING_RETENTION_HOURS)
+        removed, _ = RecipeActivity.objects.filter(
+            hour__lt=retention).delete()
+        cutoff = timezone.localtime(now - timedelta(days=1)).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        with transaction.atomic():
+            days = defaultdict(list)
+            for pk, recipe_id, hour, count in (
+                    RecipeActivity.objects.select_for_update()
+                    .filter(hour__lt=cutoff)
+                    .values_list('pk', 'recipe_id', 'hour', 'count')):
+                days[(recipe_id, timezone.localtime(hour).date())].append(
+                    (pk, hour, count))
+            days = {key: rows for key, rows in days.items() if len(rows) > 1}
+            merged = [
+                RecipeActivity(
+                    recipe_id=recipe_id,
+                    hour=self.merged_hour(
+                        [(hour, count) for _, hour, count in rows], decay),
+                    count=sum(count for _, _, count in rows))
+                for (recipe_id, _), rows in days.items()
+            ]
+            pks = [pk for rows in days.values() for pk, _, _ in rows]
+            for start in range(0, len(pks), 1000):
+                RecipeActivity.objects.filter(
+                    pk__in=pks[start:start + 1000]).delete()
+            RecipeActivity.objects.bulk_create(merged, batch_size=1000)
+        return removed, len(merged)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        # Вес события убывает вдвое каждые TRENDING_HALF_LIFE_HOURS часов.
+        decay = math.log(2) / settings.TRENDING_HALF_LIFE_HOURS
+        removed, merged = self.compact(now, decay)
+
+        scores = {}
+        for recipe_id, hour, count in RecipeActivity.objects.values_list(
+                'recipe_id', 'hour', 'count').iterator():
+            age = max((now - hour).total_seconds() / 3600, 0)
+            scores[recipe_id] = (scores.get(recipe_id, 0)
+                                 + count * math.exp(-decay * age))
+
+        stale = set(Recipe.objects.filter(trending_score__gt=0).values_list(
+            'pk', flat=True)) - set(scores)
+        scores.update(dict.fromkeys(stale, 0))
+        recipes = [Recipe(pk=pk, trending_score=score)
+                   for pk, score in scores.items()]
+        Recipe.objects.bulk_update(recipes, ['trending_score'],
+                                   batch_size=options['batch_size'])
+        self.stdout.write(
+            f'Scores updated: {len(recipes)}, buckets removed: {removed}, '
+            f'buckets after merge: {merged}.')
@@ -0,0 +1,99 @@
+'''План питания и список покупок за период.
+
+Для каждого дня плана хранятся частичные итоги MealPlanDayTotal:
+количество каждого ингредиента по всем рецептам дня с учетом множителей.
+Добавление и изменение записи плана прибавляет к итогам ее дня только ее
+вклад. Удаление записи и изменение ингредиентов рецепта пересчитывают
+затронутые дни целиком: при каскадном удалении ингредиенты рецепта могут
+быть удалены раньше записи плана, и вклад уже не вычислить.
+
+Список покупок за период складывает итоги дней одним запросом, без
+соединения с рецептами и их ингредиентами; единицы приводятся к базовым,
+как в списке покупок корзины.
+'''
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+from .models import IngredientRecipe, MealPlanDayTotal, MealPlanEntry
+from .shopping_list import converted, unit_conversions
+
+
+def contribution(recipe_id, multiplier, using='default'):
+    '''Вклад рецепта с множителем: {id ингредиента: количество}'''
+    return {
+        ingredient_id: amount * Decimal(multiplier)
+        for ingredient_id, amount in IngredientRecipe.objects.using(using)
+        .filter(recipe_id=recipe_id).values_list('ingredient_id', 'amount')
+    }
+
+
+def add(user_id, day, deltas, using='default'):
+    '''Прибавляет deltas ({id ингредиента: количество}) к итогам дня'''
+    with transaction.atomic(using=using):
+        totals = MealPlanDayTotal.objects.using(using).filter(
+            user_id=user_id, date=day)
+        for ingredient_id, delta in deltas.items():
+            row = totals.filter(ingredient_id=ingredient_id)
+            if row.update(amount=F('amount') + delta) or delta <= 0:
+                continue
+            try:
+                with transaction.atomic(using=using):
+                    MealPlanDayTotal.objects.using(using).create(
+                        user_id=user_id, date=day,
+                        ingredient_id=ingredient_id, amount=delta)
+            except IntegrityError:
+                row.update(amount=F('amount') + delta)
+        totals.filter(ingredient_id__in=deltas, amount__lte=0).delete()
+
+
+def rebuild(days, using='default'):
+    '''Пересчитывает итоги дней days ({(id пользователя, день)}) по
+    записям плана'''
+    by_user = defaultdict(set)
+    for user_id, day in days:
+        by_user[user_id].add(day)
+    amount = ExpressionWrapper(
+        F('recipe__recipe_ingredient__amount') * F('multiplier'),
+        output_field=DecimalField())
+    with transaction.atomic(using=using):
+        for user_id, dates in by_user.items():
+            MealPlanDayTotal.objects.using(using).filter(
+                user_id=user_id, date__in=dates).delete()
+            rows = (
+                MealPlanEntry.objects.using(using)
+                .filter(user_id=user_id, date__in=dates,
+                        recipe__recipe_ingredient__isnull=False)
+                .values('date',
+                        ingredient=F('recipe__recipe_ingredient__ingredient'))
+                .annotate(total=Sum(amount))
+                .order_by())
+            MealPlanDayTotal.objects.using(using).bulk_create(
+                [MealPlanDayTotal(user_id=user_id, date=row['date'],
+                                  ingredient_id=row['ingredient'],
+                                  amount=row['total'])
+                 for row in rows],
+                batch_size=1000)
+
+
+def recipes_changed(recipe_ids, using='default'):
+    '''Ингредиенты рецептов изменились: пересчет дней, где они в плане'''
+    rebuild(set(MealPlanEntry.objects.using(using).filter(
+        recipe_id__in=recipe_ids).values_list('user_id', 'date')), using)
+
+
+def plan_items(user, start, end):
+    '''Ингредиенты плана за период: (название, количество, единица)'''
+    base_unit, factor = converted(
+        'ingredient__measurement_unit', unit_conversions())
+    amount = ExpressionWrapper(F('amount') * factor,
+                               output_field=DecimalField())
+    return list(
+        MealPlanDayTotal.objects
+        .filter(user=user, date__range=(start, end))
+        .values(name=F('ingredient__name'), unit=base_unit)
+        .annotate(total=Sum(amount))
+        .order_by('name', 'unit')
+        .values_list('name', 'total', 'unit'))
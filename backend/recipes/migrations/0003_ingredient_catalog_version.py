@@ -0,0 +1,47 @@
+# Generated by Django 3.2.18 on 2026-10-19 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RemovedIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ingredient_id', models.BigIntegerField(verbose_name='ID ингредиента')),
+                ('version', models.BigIntegerField(db_index=True, verbose_name='Версия справочника')),
+            ],
+            options={
+                'verbose_name': 'Удаленный ингредиент',
+                'verbose_name_plural': 'Удаленные ингредиенты',
+            },
+        ),
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Значение')),
+            ],
+            options={
+                'verbose_name': 'Счетчик',
+                'verbose_name_plural': 'Счетчики',
+            },
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='version',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='Версия справочника'),
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='name',
+            field=models.CharField(max_length=150, verbose_name='Название'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+CREATE = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_trgm '
+    'ON recipes_ingredient USING gin (name gin_trgm_ops)',
+)
+DROP = ('DROP INDEX IF EXISTS recipes_ingredient_name_trgm',)
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # Индекс pg_trgm есть только в PostgreSQL, на других базах
+        # поиск с опечатками работает по индексу в памяти.
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_trending'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE), run(DROP)),
+    ]
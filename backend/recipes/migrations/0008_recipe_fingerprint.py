@@ -0,0 +1,22 @@
+# Generated by Django 3.2.18 on 2026-10-19 09:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_ingredient_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, help_text='Название, время приготовления и ингредиенты; по нему находятся повторно отправленные рецепты', max_length=32, verbose_name='Отпечаток содержимого'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipe',
+            constraint=models.UniqueConstraint(condition=models.Q(('fingerprint', ''), _negated=True), fields=('author', 'fingerprint'), name='unique_recipe_fingerprint'),
+        ),
+    ]
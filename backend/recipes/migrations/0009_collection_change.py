@@ -0,0 +1,36 @@
+# Generated by Django 3.2.18 on 2026-10-19 09:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0008_recipe_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.BigIntegerField(verbose_name='ID рецепта')),
+                ('collection', models.CharField(choices=[('favorite', 'Избранное'), ('shopping_cart', 'Список покупок')], max_length=20, verbose_name='Список')),
+                ('added', models.BooleanField(verbose_name='Добавлен')),
+                ('version', models.BigIntegerField(verbose_name='Версия')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Время')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='collection_changes', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Изменение списков',
+                'verbose_name_plural': 'Изменения списков',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='collectionchange',
+            index=models.Index(fields=['user', 'version'], name='collection_change_feed_idx'),
+        ),
+    ]
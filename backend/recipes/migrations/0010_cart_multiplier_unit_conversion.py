@@ -0,0 +1,47 @@
+# Generated by Django 3.2.18 on 2026-10-19 09:43
+
+from decimal import Decimal
+import django.core.validators
+from django.db import migrations, models
+
+METRIC = (
+    ('кг', 'г', Decimal(1000)),
+    ('л', 'мл', Decimal(1000)),
+)
+
+
+def add_metric(apps, schema_editor):
+    UnitConversion = apps.get_model('recipes', 'UnitConversion')
+    UnitConversion.objects.bulk_create(
+        UnitConversion(unit=unit, base_unit=base_unit, factor=factor)
+        for unit, base_unit, factor in METRIC)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_collection_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnitConversion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unit', models.CharField(max_length=15, unique=True, verbose_name='Единица измерения')),
+                ('base_unit', models.CharField(max_length=15, verbose_name='Базовая единица')),
+                ('factor', models.DecimalField(decimal_places=6, max_digits=12, validators=[django.core.validators.MinValueValidator(Decimal('0.000001'))], verbose_name='Множитель')),
+            ],
+            options={
+                'verbose_name': 'Пересчет единиц',
+                'verbose_name_plural': 'Пересчет единиц',
+                'ordering': ('unit',),
+            },
+        ),
+        migrations.AddField(
+            model_name='shoppingсart',
+            name='multiplier',
+            field=models.DecimalField(decimal_places=2, default=1, max_digits=5, validators=[django.core.validators.MinValueValidator(Decimal('0.01'), message='Множитель должен быть больше 0!'), django.core.validators.MaxValueValidator(100, message='Множитель не больше 100!')], verbose_name='Множитель порций'),
+        ),
+        migrations.RunPython(add_metric, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.18 on 2026-10-19 09:44
+
+from decimal import Decimal
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0010_cart_multiplier_unit_conversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MealPlanEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='День')),
+                ('multiplier', models.DecimalField(decimal_places=2, default=1, max_digits=5, validators=[django.core.validators.MinValueValidator(Decimal('0.01'), message='Множитель должен быть больше 0!'), django.core.validators.MaxValueValidator(100, message='Множитель не больше 100!')], verbose_name='Множитель порций')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meal_plan_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meal_plan', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'План питания',
+                'verbose_name_plural': 'План питания',
+                'ordering': ('date', 'id'),
+            },
+        ),
+        migrations.CreateModel(
+            name='MealPlanDayTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='День')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meal_plan_totals', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meal_plan_totals', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Итог плана питания за день',
+                'verbose_name_plural': 'Итоги плана питания по дням',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='mealplanentry',
+            index=models.Index(fields=['user', 'date'], name='meal_plan_user_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='mealplandaytotal',
+            constraint=models.UniqueConstraint(fields=('user', 'date', 'ingredient'), name='unique_meal_plan_day_ingredient'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def reindex(apps, schema_editor):
+    '''Сигнатуры прежних версий могли быть посчитаны с другой формой
+    (bands x rows) - индекс пересчитывается с текущей'''
+    from recipes.similarity import bucket_keys, pack, shape_label, signature
+
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    RecipeBucket = apps.get_model('recipes', 'RecipeBucket')
+    RecipeSignature = apps.get_model('recipes', 'RecipeSignature')
+    ids = list(RecipeSignature.objects.order_by('recipe_id').values_list(
+        'recipe_id', flat=True))
+    shape = shape_label()
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = ids[start:start + BATCH_SIZE]
+        ingredients = {pk: [] for pk in batch}
+        for recipe_id, ingredient_id in IngredientRecipe.objects.filter(
+                recipe_id__in=batch).values_list(
+                    'recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].append(ingredient_id)
+        RecipeBucket.objects.filter(recipe_id__in=batch).delete()
+        buckets = []
+        for recipe_id, ingredient_ids in ingredients.items():
+            values = signature(sorted(ingredient_ids))
+            RecipeSignature.objects.filter(recipe_id=recipe_id).update(
+                signature=pack(values), shape=shape)
+            buckets.extend(RecipeBucket(recipe_id=recipe_id, bucket=key)
+                           for key in set(bucket_keys(values)))
+        RecipeBucket.objects.bulk_create(buckets)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_meal_plan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipesignature',
+            name='shape',
+            field=models.CharField(blank=True, help_text='SIMILARITY_BANDS x SIMILARITY_ROWS, с которыми посчитаны сигнатура и корзины', max_length=20, verbose_name='Полосы x строки'),
+        ),
+        migrations.RunPython(reindex, migrations.RunPython.noop),
+    ]
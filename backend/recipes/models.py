@@ -1,11 +1,60 @@
+import hashlib
+import re
+from decimal import Decimal
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
 
 from . import validators
 
 User = get_user_model()
 
 
+class Sequence(models.Model):
+    '''Именованный монотонный счетчик'''
+    name = models.CharField(
+        max_length=50,
+        unique=True,
+        verbose_name='Название')
+    value = models.BigIntegerField(
+        default=0,
+        verbose_name='Значение')
+
+    class Meta:
+        verbose_name = 'Счетчик'
+        verbose_name_plural = 'Счетчики'
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+    @classmethod
+    def next_value(cls, name, using='default'):
+        '''Увеличивает счетчик и возвращает новое значение.
+
+        Строка счетчика остается заблокированной до конца транзакции,
+        поэтому значения фиксируются в порядке возрастания.
+        '''
+        with transaction.atomic(using=using):
+            updated = cls.objects.using(using).filter(name=name).update(
+                value=models.F('value') + 1)
+            if not updated:
+                try:
+                    with transaction.atomic(using=using):
+                        cls.objects.using(using).create(name=name, value=1)
+                    return 1
+                except IntegrityError:
+                    cls.objects.using(using).filter(name=name).update(
+                        value=models.F('value') + 1)
+            return cls.current_value(name, using)
+
+    @classmethod
+    def current_value(cls, name, using='default'):
+        return cls.objects.using(using).filter(name=name).values_list(
+            'value', flat=True).first() or 0
+
+
 class Ingredient(models.Model):
     '''Модель Ингредиент'''
     name = models.CharField(
@@ -15,6 +64,13 @@ class Ingredient(models.Model):
     measurement_unit = models.CharField(
         max_length=15,
         verbose_name='Единица измерения')
+    version = models.BigIntegerField(
+        default=0,
+        editable=False,
+        db_index=True,
+        verbose_name='Версия справочника')
+
+    VERSION_SEQUENCE = 'ingredients'
 
     class Meta:
         ordering = ('name',)
@@ -29,6 +85,22 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RemovedIngredient(models.Model):
+    '''Удаленный ингредиент - для синхронизации справочника у клиентов'''
+    ingredient_id = models.BigIntegerField(
+        verbose_name='ID ингредиента')
+    version = models.BigIntegerField(
+        db_index=True,
+        verbose_name='Версия справочника')
+
+    class Meta:
+        verbose_name = 'Удаленный ингредиент'
+        verbose_name_plural = 'Удаленные ингредиенты'
+
+    def __str__(self):
+        return f'Ингредиент {self.ingredient_id} (версия {self.version})'
+
+
 class Tag(models.Model):
     '''Модель Тег'''
     name = models.CharField(
@@ -45,6 +117,14 @@ class Tag(models.Model):
         unique=True,
         verbose_name='Слаг')
 
+    bit = models.PositiveSmallIntegerField(
+        unique=True,
+        editable=False,
+        verbose_name='Бит в маске тегов рецепта')
+
+    # Маска тегов рецепта хранится в знаковом BigIntegerField.
+    MAX_TAGS = 63
+
     class Meta:
         verbose_name = 'Тег'
         verbose_name_plural = 'Теги'
@@ -53,6 +133,16 @@ class Tag(models.Model):
     def __str__(self):
         return f'Тег {self.name}'
 
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            used = set(Tag.objects.values_list('bit', flat=True))
+            free = [bit for bit in range(self.MAX_TAGS) if bit not in used]
+            if not free:
+                raise ValidationError(
+                    f'Нельзя создать больше {self.MAX_TAGS} тегов!')
+            self.bit = free[0]
+        super().save(*args, **kwargs)
+
 
 class Recipe(models.Model):
     '''Модель Рецепт'''
@@ -89,6 +179,17 @@ class Recipe(models.Model):
         blank=False,
         verbose_name='Тег')
 
+    tags_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Маска тегов')
+
+    trending_score = models.FloatField(
+        default=0,
+        editable=False,
+        db_index=True,
+        verbose_name='Популярность сейчас')
+
     cooking_time = models.IntegerField(
         blank=False,
         validators=[
@@ -105,14 +206,41 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации',)
 
+    fingerprint = models.CharField(
+        max_length=32,
+        blank=True,
+        editable=False,
+        verbose_name='Отпечаток содержимого',
+        help_text='Название, время приготовления и ингредиенты; '
+                  'по нему находятся повторно отправленные рецепты')
+
     class Meta:
         ordering = ('name',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['author', 'fingerprint'],
+                condition=~models.Q(fingerprint=''),
+                name='unique_recipe_fingerprint')]
 
     def __str__(self):
         return f'Рецепт "{self.name}"'
 
+    @staticmethod
+    def make_fingerprint(name, cooking_time, ingredients):
+        '''Отпечаток рецепта; ingredients - пары (id ингредиента, кол-во).
+        Регистр, ё/е, пробелы и знаки препинания в названии не важны.'''
+        words = re.findall(r'\w+', name.lower().replace('ё', 'е'))
+        content = '\n'.join([
+            ' '.join(words),
+            str(int(cooking_time)),
+            ';'.join(f'{pk}:{int(amount)}'
+                     for pk, amount in sorted(ingredients)),
+        ])
+        return hashlib.blake2b(content.encode('utf-8'),
+                               digest_size=16).hexdigest()
+
 
 class IngredientRecipe(models.Model):
     '''Промежуточная модель ингредиентов в рецептах'''
@@ -186,6 +314,17 @@ class ShoppingСart(models.Model):
         on_delete=models.CASCADE,
         related_name='shopping_recipe',
         verbose_name='Рецепт для покупки')
+    multiplier = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        default=1,
+        validators=[
+            validators.MinValueValidator(
+                Decimal('0.01'), message='Множитель должен быть больше 0!'),
+            validators.MaxValueValidator(
+                100, message='Множитель не больше 100!'),
+        ],
+        verbose_name='Множитель порций')
 
     class Meta:
         verbose_name = 'Список покупок'
@@ -198,3 +337,227 @@ class ShoppingСart(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил {self.recipe} в список покупок.'
+
+
+class UnitConversion(models.Model):
+    '''Пересчет единицы измерения в базовую для списка покупок:
+    количество в unit * factor = количество в base_unit'''
+    unit = models.CharField(
+        max_length=15,
+        unique=True,
+        verbose_name='Единица измерения')
+    base_unit = models.CharField(
+        max_length=15,
+        verbose_name='Базовая единица')
+    factor = models.DecimalField(
+        max_digits=12,
+        decimal_places=6,
+        validators=[validators.MinValueValidator(Decimal('0.000001'))],
+        verbose_name='Множитель')
+
+    class Meta:
+        ordering = ('unit',)
+        verbose_name = 'Пересчет единиц'
+        verbose_name_plural = 'Пересчет единиц'
+
+    def __str__(self):
+        return f'1 {self.unit} = {self.factor.normalize():f} {self.base_unit}'
+
+
+class MealPlanEntry(models.Model):
+    '''Рецепт, запланированный пользователем на день'''
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='meal_plan',
+        verbose_name='Пользователь')
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='meal_plan_entries',
+        verbose_name='Рецепт')
+    date = models.DateField(
+        verbose_name='День')
+    multiplier = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        default=1,
+        validators=[
+            validators.MinValueValidator(
+                Decimal('0.01'), message='Множитель должен быть больше 0!'),
+            validators.MaxValueValidator(
+                100, message='Множитель не больше 100!'),
+        ],
+        verbose_name='Множитель порций')
+
+    class Meta:
+        ordering = ('date', 'id')
+        verbose_name = 'План питания'
+        verbose_name_plural = 'План питания'
+        indexes = [
+            models.Index(fields=['user', 'date'],
+                         name='meal_plan_user_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.recipe} на {self.date:%d.%m.%Y}'
+
+
+class MealPlanDayTotal(models.Model):
+    '''Сколько ингредиента нужно пользователю на день по плану питания
+    (сумма по рецептам дня с учетом множителей)'''
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='meal_plan_totals',
+        verbose_name='Пользователь')
+    date = models.DateField(
+        verbose_name='День')
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='meal_plan_totals',
+        verbose_name='Ингредиент')
+    amount = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        verbose_name='Количество')
+
+    class Meta:
+        verbose_name = 'Итог плана питания за день'
+        verbose_name_plural = 'Итоги плана питания по дням'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'date', 'ingredient'],
+                name='unique_meal_plan_day_ingredient')]
+
+    def __str__(self):
+        return (f'{self.user_id} {self.date:%d.%m.%Y}: '
+                f'{self.ingredient_id} {self.amount}')
+
+
+class CollectionChange(models.Model):
+    '''Добавление или удаление рецепта в избранном или списке покупок -
+    журнал для синхронизации клиентов'''
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    COLLECTIONS = (
+        (FAVORITE, 'Избранное'),
+        (SHOPPING_CART, 'Список покупок'),
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='collection_changes',
+        verbose_name='Пользователь')
+    recipe_id = models.BigIntegerField(
+        verbose_name='ID рецепта')
+    collection = models.CharField(
+        max_length=20,
+        choices=COLLECTIONS,
+        verbose_name='Список')
+    added = models.BooleanField(
+        verbose_name='Добавлен')
+    version = models.BigIntegerField(
+        verbose_name='Версия')
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Время')
+
+    class Meta:
+        verbose_name = 'Изменение списков'
+        verbose_name_plural = 'Изменения списков'
+        indexes = [
+            models.Index(fields=['user', 'version'],
+                         name='collection_change_feed_idx'),
+        ]
+
+    def __str__(self):
+        action = 'добавил' if self.added else 'удалил'
+        return (f'{self.user_id} {action} {self.recipe_id} '
+                f'({self.collection}, версия {self.version})')
+
+
+class RecipeSignature(models.Model):
+    '''MinHash-сигнатура набора ингредиентов рецепта'''
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature',
+        verbose_name='Рецепт')
+    signature = models.BinaryField(
+        verbose_name='Сигнатура')
+    shape = models.CharField(
+        max_length=20,
+        blank=True,
+        verbose_name='Полосы x строки',
+        help_text='SIMILARITY_BANDS x SIMILARITY_ROWS, с которыми '
+                  'посчитаны сигнатура и корзины')
+
+    class Meta:
+        verbose_name = 'Сигнатура рецепта'
+        verbose_name_plural = 'Сигнатуры рецептов'
+
+    def __str__(self):
+        return f'Сигнатура рецепта {self.recipe_id}'
+
+
+class RecipeBucket(models.Model):
+    '''LSH-корзина, в которую попал рецепт'''
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='buckets',
+        verbose_name='Рецепт')
+    bucket = models.BigIntegerField(
+        db_index=True,
+        verbose_name='Ключ корзины')
+
+    class Meta:
+        verbose_name = 'LSH-корзина рецепта'
+        verbose_name_plural = 'LSH-корзины рецептов'
+
+    def __str__(self):
+        return f'Рецепт {self.recipe_id} в корзине {self.bucket}'
+
+
+class RecipeActivity(models.Model):
+    '''Почасовой счетчик добавлений рецепта в избранное и покупки'''
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='activity',
+        verbose_name='Рецепт')
+    hour = models.DateTimeField(
+        verbose_name='Час')
+    count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество событий')
+
+    class Meta:
+        verbose_name = 'Активность по рецепту'
+        verbose_name_plural = 'Активность по рецептам'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'hour'],
+                name='unique_recipe_activity_hour')]
+
+    def __str__(self):
+        return f'{self.recipe_id} {self.hour:%d.%m.%Y %H}:00 - {self.count}'
+
+    @classmethod
+    def record(cls, recipe, using='default'):
+        '''Учитывает событие в счетчике текущего часа'''
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+        bucket = cls.objects.using(using).filter(recipe=recipe, hour=hour)
+        if bucket.update(count=models.F('count') + 1):
+            return
+        try:
+            with transaction.atomic(using=using):
+                cls.objects.using(using).create(
+                    recipe=recipe, hour=hour, count=1)
+        except IntegrityError:
+            bucket.update(count=models.F('count') + 1)
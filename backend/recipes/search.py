@@ -0,0 +1,191 @@
+'''Поиск ингредиентов с опечатками по n-граммам.
+
+В PostgreSQL кандидаты ищет GIN-индекс gin_trgm_ops по name (оператор
+<% - word_similarity из pg_trgm), результаты сортируются по сходству. На
+других базах поиск выполняет NgramIndex в памяти процесса, построенный по
+снимку справочника: списки слов словаря для каждой биграммы, отбор
+кандидатов по числу общих биграмм и проверка расстоянием Левенштейна с
+ограничением на число правок. Каждое слово запроса должно совпасть с
+каким-нибудь словом названия, последнее - хотя бы началом.
+'''
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, models, router, transaction
+
+from .catalog import get_catalog
+from .models import Ingredient
+
+
+def normalize(text):
+    return text.lower().replace('ё', 'е')
+
+
+def words(text):
+    return ''.join(
+        char if char.isalnum() else ' ' for char in normalize(text)).split()
+
+
+def bigrams(word, prefix=False):
+    '''Биграммы слова с границами; для префикса (слово еще набирается)
+    - без правой границы'''
+    padded = ' ' + word + ('' if prefix else ' ')
+    return {padded[index:index + 2] for index in range(len(padded) - 1)}
+
+
+def max_edits(length):
+    if length <= 3:
+        return 0
+    if length <= 5:
+        return 1
+    return 2
+
+
+def bounded_distance(first, second, limit):
+    '''Расстояние Левенштейна или limit + 1, если оно больше limit'''
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous = list(range(len(second) + 1))
+    for row, char in enumerate(first, 1):
+        current = [row]
+        for column, other in enumerate(second, 1):
+            current.append(min(previous[column] + 1,
+                               current[column - 1] + 1,
+                               previous[column - 1] + (char != other)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class NgramIndex:
+    '''Индекс слов названий: биграмма -> номера слов словаря.
+
+    Одна правка меняет не больше двух биграмм, поэтому слово на
+    расстоянии k от запроса делит с ним не меньше len(bigrams) - 2k
+    биграмм: этот порог отсекает кандидатов до проверки расстоянием
+    Левенштейна.
+    '''
+
+    def __init__(self, names):
+        occurrences = {}
+        self.lengths = []
+        for position, name in enumerate(names):
+            name_words = words(name)
+            self.lengths.append(len(name_words))
+            for index, word in enumerate(name_words):
+                occurrences.setdefault(word, []).append((position, index))
+        self.words = sorted(occurrences)
+        self.occurrences = [occurrences[word] for word in self.words]
+        postings = {}
+        for number, word in enumerate(self.words):
+            for bigram in bigrams(word):
+                postings.setdefault(bigram, array('I')).append(number)
+        self.postings = postings
+
+    def _word_scores(self, token, prefix):
+        '''Номера подходящих слов словаря и их оценки'''
+        scores = {}
+        if prefix:
+            start = bisect_left(self.words, token)
+            for number in range(start, len(self.words)):
+                if not self.words[number].startswith(token):
+                    break
+                scores[number] = 1.0
+        else:
+            number = bisect_left(self.words, token)
+            if number < len(self.words) and self.words[number] == token:
+                scores[number] = 1.0
+        limit = max_edits(len(token))
+        if not limit:
+            return scores
+        grams = bigrams(token, prefix)
+        hits = Counter()
+        for bigram in grams:
+            hits.update(self.postings.get(bigram, ()))
+        threshold = max(1, len(grams) - 2 * limit)
+        for number, count in hits.items():
+            if count < threshold or number in scores:
+                continue
+            word = self.words[number]
+            distance = bounded_distance(token, word, limit)
+            penalty = 0.0
+            if prefix and distance > limit and len(word) > len(token):
+                # Слово еще набирается: сравниваем с началом слова.
+                distance = bounded_distance(token, word[:len(token)], limit)
+                penalty = 0.05
+            if distance <= limit:
+                scores[number] = (
+                    0.75 * (1 - distance / (len(token) + 1)) - penalty)
+        return scores
+
+    def search(self, query, limit):
+        '''Позиции подходящих названий с оценкой, лучшие первыми'''
+        tokens = words(query)
+        if not tokens:
+            return []
+        total = None
+        for number, token in enumerate(tokens):
+            best = {}
+            word_scores = self._word_scores(token, number == len(tokens) - 1)
+            for word, score in word_scores.items():
+                for position, index in self.occurrences[word]:
+                    # Совпадение в начале названия важнее.
+                    value = score - 0.02 * index
+                    if value > best.get(position, 0):
+                        best[position] = value
+            if total is None:
+                total = best
+            else:
+                total = {position: total[position] + value
+                         for position, value in best.items()
+                         if position in total}
+            if not total:
+                return []
+        ranked = sorted(total.items(), key=lambda item: (
+            -item[1], self.lengths[item[0]], item[0]))
+        return [(position, score / len(tokens))
+                for position, score in ranked[:limit]]
+
+
+class TrigramWordSimilar(models.Lookup):
+    '''name__trigram_word_similar=query: query <% name (pg_trgm)'''
+    lookup_name = 'trigram_word_similar'
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{rhs} <%% {lhs}', rhs_params + lhs_params
+
+
+models.CharField.register_lookup(TrigramWordSimilar)
+
+
+class WordSimilarity(models.Func):
+    function = 'WORD_SIMILARITY'
+    output_field = models.FloatField()
+
+
+def _search_database(query, limit, using):
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', "
+                "%s, true)", [str(settings.INGREDIENT_SEARCH_THRESHOLD)])
+        return list(
+            Ingredient.objects.using(using)
+            .filter(name__trigram_word_similar=query)
+            .annotate(score=WordSimilarity(models.Value(query), 'name'))
+            .order_by('-score', 'name')
+            .values('id', 'name', 'measurement_unit')[:limit])
+
+
+def search_ingredients(query, limit=None):
+    '''Ингредиенты, похожие на query, в порядке убывания сходства'''
+    limit = limit or settings.INGREDIENT_SEARCH_LIMIT
+    using = router.db_for_read(Ingredient)
+    if connections[using].vendor == 'postgresql':
+        return _search_database(query, limit, using)
+    return get_catalog().search(query, limit)
@@ -0,0 +1,132 @@
+import os
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import (Case, CharField, DecimalField, ExpressionWrapper,
+                              F, Sum, Value, When)
+
+from .models import ShoppingСart, UnitConversion
+
+User = get_user_model()
+
+
+def unit_conversions():
+    return list(UnitConversion.objects.values_list(
+        'unit', 'base_unit', 'factor'))
+
+
+def converted(unit_field, conversions):
+    '''Выражения базовой единицы и множителя пересчета для unit_field:
+    CASE по таблице UnitConversion'''
+    if not conversions:
+        return F(unit_field), Value(Decimal(1))
+    base_unit = Case(
+        *[When(**{unit_field: unit}, then=Value(base))
+          for unit, base, _ in conversions],
+        default=F(unit_field), output_field=CharField())
+    factor = Case(
+        *[When(**{unit_field: unit}, then=Value(value))
+          for unit, _, value in conversions],
+        default=Value(Decimal(1)), output_field=DecimalField())
+    return base_unit, factor
+
+
+def shopping_list_items(user):
+    '''Ингредиенты корзины: (название, количество, единица).
+
+    Один сгруппированный запрос от записей корзины: количество в рецепте
+    умножается на множитель порций записи и пересчитывается в базовую
+    единицу (кг -> г), строки одного продукта в разных единицах
+    складываются.
+    '''
+    ingredient = 'recipe__recipe_ingredient__'
+    base_unit, factor = converted(
+        ingredient + 'ingredient__measurement_unit', unit_conversions())
+    amount = ExpressionWrapper(
+        F(ingredient + 'amount') * F('multiplier') * factor,
+        output_field=DecimalField())
+    return list(
+        ShoppingСart.objects
+        .filter(user=user, recipe__recipe_ingredient__isnull=False)
+        .values(name=F(ingredient + 'ingredient__name'), unit=base_unit)
+        .annotate(total=Sum(amount))
+        .order_by('name', 'unit')
+        .values_list('name', 'total', 'unit'))
+
+
+def format_amount(value):
+    '''Количество без лишних нулей: 1500, 0.5, 2.25'''
+    return f'{Decimal(value).quantize(Decimal("0.01")).normalize():f}'
+
+
+def render_items(user, items, period=None, dated=True):
+    '''Текст списка покупок из строк (название, количество, единица);
+    dated=False - без даты и времени формирования'''
+    items_to_buy = ''
+    if dated:
+        current_date = date.today()
+        current_date_time = datetime.now().time()
+        items_to_buy += (
+            f'Дата: {current_date.strftime("%d/%m/%Y")}\n'
+            f'Время: {current_date_time.strftime("%H:%M:%S")}\n'
+        )
+    if period is not None:
+        items_to_buy += (f'План питания: {period[0].strftime("%d/%m/%Y")} - '
+                         f'{period[1].strftime("%d/%m/%Y")}\n')
+    if items_to_buy:
+        items_to_buy += '\n'
+    items_to_buy += f'{str(user)}, купи эти продукты:\n'
+    for number, (name, total, unit) in enumerate(items, 1):
+        items_to_buy += f'{number}. {name} - {format_amount(total)} {unit}.\n'
+    return items_to_buy
+
+
+def render_shopping_list(user):
+    '''Текст списка покупок пользователя: ингредиенты всех рецептов
+    из корзины с учетом множителей, просуммированные по продукту.
+
+    Текст хранится, пока не изменится корзина, поэтому даты в нем нет:
+    время формирования отдается в заголовке Last-Modified.
+    '''
+    return render_items(user, shopping_list_items(user), dated=False)
+
+
+def shopping_list_filename(user):
+    return f'{user.username}_items_to_buy.txt'
+
+
+def bump_cart_version(**filters):
+    '''Новая версия корзины у пользователей, подходящих под фильтр'''
+    User.objects.filter(**filters).update(
+        shopping_cart_version=F('shopping_cart_version') + 1)
+
+
+def shopping_list_document(user):
+    '''Путь к файлу списка покупок (относительно SHOPPING_LIST_ROOT).
+
+    Файл формируется один раз на версию корзины; при появлении новой
+    версии удаляются только более старые: файл более новой версии мог
+    уже записать и отдать параллельный запрос.
+    '''
+    version = User.objects.filter(pk=user.pk).values_list(
+        'shopping_cart_version', flat=True).get()
+    directory = os.path.join(settings.SHOPPING_LIST_ROOT, str(user.pk))
+    filename = f'{version}.txt'
+    path = os.path.join(directory, filename)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.')
+        with os.fdopen(handle, 'w', encoding='utf-8') as document:
+            document.write(render_shopping_list(user))
+        os.replace(temp_path, path)
+        for name in os.listdir(directory):
+            stem, _ = os.path.splitext(name)
+            if stem.isdigit() and int(stem) < version:
+                try:
+                    os.unlink(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+    return f'{user.pk}/{filename}'
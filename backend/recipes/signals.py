@@ -0,0 +1,218 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from foodgram.commit_hooks import on_commit_batch
+from foodgram.deletion import bulk_delete_hook, deleting
+from users import counters
+
+from . import catalog, changes, meal_plan
+from .models import (CollectionChange, Favorite, Ingredient, IngredientRecipe,
+                     MealPlanEntry, Recipe, RemovedIngredient, Sequence,
+                     ShoppingСart, Tag, UnitConversion)
+from .shopping_list import bump_cart_version
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def rebuild_catalog(sender, using, **kwargs):
+    '''Пересборка снимка справочников при изменении ингредиентов и тегов'''
+    catalog.schedule_rebuild(using)
+
+
+@receiver(pre_save, sender=Ingredient)
+def bump_ingredient_version(sender, instance, using, raw=False, **kwargs):
+    '''Каждое изменение ингредиента получает новую версию справочника'''
+    if not raw:
+        instance.version = Sequence.next_value(
+            Ingredient.VERSION_SEQUENCE, using)
+
+
+@receiver(post_delete, sender=Ingredient)
+def remember_removed_ingredient(sender, instance, using, **kwargs):
+    RemovedIngredient.objects.using(using).create(
+        ingredient_id=instance.pk,
+        version=Sequence.next_value(Ingredient.VERSION_SEQUENCE, using))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def sync_tags_mask(sender, instance, action, reverse, pk_set, using,
+                   **kwargs):
+    '''Пересчет Recipe.tags_mask при любом изменении тегов рецепта'''
+    if action == 'pre_clear' and reverse:
+        # В post_clear pk_set пуст: рецепты тега запоминаются заранее.
+        instance._cleared_recipe_ids = list(
+            instance.recipe_set.using(using).values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action == 'post_clear' and reverse:
+        recipe_ids = instance.__dict__.pop('_cleared_recipe_ids', ())
+    elif reverse:
+        recipe_ids = pk_set or ()
+    else:
+        recipe_ids = (instance.pk,)
+    for recipe_id in recipe_ids:
+        mask = 0
+        for bit in Tag.objects.using(using).filter(
+                recipe=recipe_id).values_list('bit', flat=True):
+            mask |= 1 << bit
+        Recipe.objects.using(using).filter(pk=recipe_id).update(
+            tags_mask=mask)
+        if not reverse:
+            instance.tags_mask = mask
+
+
+@receiver(pre_delete, sender=Tag)
+def clear_tag_bit(sender, instance, using, **kwargs):
+    '''Освобождаемый бит тега убирается из масок рецептов'''
+    Recipe.objects.using(using).filter(tags=instance).update(
+        tags_mask=F('tags_mask').bitand(~(1 << instance.bit)))
+
+
+@receiver(post_save, sender=ShoppingСart)
+@receiver(post_delete, sender=ShoppingСart)
+def change_cart_version(sender, instance, **kwargs):
+    '''Любое изменение корзины делает сохраненный список покупок старым'''
+    bump_cart_version(pk=instance.user_id)
+
+
+@bulk_delete_hook(ShoppingСart)
+def change_cart_versions(queryset):
+    '''То же для удаления записей корзины пачкой'''
+    bump_cart_version(pk__in=queryset.values('user_id'))
+
+
+@receiver(post_save, sender=UnitConversion)
+@receiver(post_delete, sender=UnitConversion)
+def change_all_cart_versions(sender, **kwargs):
+    '''Новые правила пересчета единиц меняют все списки покупок'''
+    bump_cart_version(pk__in=ShoppingСart.objects.values('user_id'))
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def ingredients_changed(sender, instance, using, raw=False, **kwargs):
+    '''Изменение ингредиентов рецепта (API, админка) делает старыми
+    списки покупок корзин с этим рецептом и итоги дней плана питания.
+
+    Пересчет - после фиксации транзакции, один на рецепт: замена
+    состава рецепта удаляет и создает много строк сразу.
+    '''
+    if not raw:
+        on_commit_batch('recipes_changed', partial(
+            refresh_recipes, using=using), [instance.recipe_id], using)
+
+
+@bulk_delete_hook(IngredientRecipe)
+def ingredients_deleted(queryset):
+    '''То же для удаления строк пачкой; рецепты, которые удаляются
+    целиком, пересчитывать не нужно'''
+    recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+    using = queryset.db
+    on_commit_batch('recipes_changed', partial(refresh_recipes, using=using),
+                    recipe_ids - deleting(Recipe), using)
+
+
+def refresh_recipes(recipe_ids, using):
+    bump_cart_version(shopping_cart__recipe__in=recipe_ids)
+    meal_plan.recipes_changed(recipe_ids, using)
+
+
+@receiver(post_save, sender=Recipe)
+def count_recipe(sender, instance, created, **kwargs):
+    if created:
+        counters.change(User, 'recipes_count', {instance.author_id: 1})
+
+
+@receiver(post_delete, sender=Recipe)
+def uncount_recipe(sender, instance, **kwargs):
+    counters.change(User, 'recipes_count', {instance.author_id: -1})
+
+
+@bulk_delete_hook(Recipe)
+def uncount_recipes(queryset):
+    counts = counters.grouped(queryset, 'author_id')
+    counters.change(User, 'recipes_count',
+                    {pk: -total for pk, total in counts.items()})
+
+
+COLLECTIONS = {
+    Favorite: CollectionChange.FAVORITE,
+    ShoppingСart: CollectionChange.SHOPPING_CART,
+}
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingСart)
+def record_added(sender, instance, created, using, raw=False, **kwargs):
+    '''Добавление рецепта в избранное или корзину - в журнал изменений'''
+    if created and not raw:
+        changes.record(instance.user_id, COLLECTIONS[sender],
+                       [instance.recipe_id], True, using)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingСart)
+def record_removed(sender, instance, using, **kwargs):
+    changes.record(instance.user_id, COLLECTIONS[sender],
+                   [instance.recipe_id], False, using)
+
+
+@bulk_delete_hook(Favorite)
+def record_removed_favorites(queryset):
+    changes.record_deleted(queryset, CollectionChange.FAVORITE)
+
+
+@bulk_delete_hook(ShoppingСart)
+def record_removed_from_carts(queryset):
+    changes.record_deleted(queryset, CollectionChange.SHOPPING_CART)
+
+
+@receiver(pre_save, sender=MealPlanEntry)
+def remember_planned(sender, instance, using, raw=False, **kwargs):
+    '''Прежние рецепт, день и множитель изменяемой записи плана'''
+    instance._planned = None
+    if instance.pk and not raw:
+        instance._planned = MealPlanEntry.objects.using(using).filter(
+            pk=instance.pk).values_list(
+                'recipe_id', 'date', 'multiplier').first()
+
+
+@receiver(post_save, sender=MealPlanEntry)
+def add_to_day_totals(sender, instance, using, raw=False, **kwargs):
+    '''Вклад записи плана в итоги ее дня'''
+    if raw:
+        return
+    previous = getattr(instance, '_planned', None)
+    if previous is not None:
+        recipe_id, day, multiplier = previous
+        meal_plan.add(instance.user_id, day, {
+            ingredient_id: -amount for ingredient_id, amount in
+            meal_plan.contribution(recipe_id, multiplier, using).items()
+        }, using)
+    meal_plan.add(instance.user_id, instance.date, meal_plan.contribution(
+        instance.recipe_id, instance.multiplier, using), using)
+
+
+@receiver(post_delete, sender=MealPlanEntry)
+def rebuild_day_totals(sender, instance, using, **kwargs):
+    days = {(instance.user_id, instance.date)}
+    transaction.on_commit(lambda: meal_plan.rebuild(days, using),
+                          using=using)
+
+
+@bulk_delete_hook(MealPlanEntry)
+def rebuild_days_totals(queryset):
+    days = set(queryset.values_list('user_id', 'date'))
+    using = queryset.db
+    transaction.on_commit(lambda: meal_plan.rebuild(days, using),
+                          using=using)
@@ -0,0 +1,141 @@
+'''Похожие рецепты: MinHash-сигнатуры наборов ингредиентов и LSH.
+
+Сигнатура рецепта - SIMILARITY_BANDS * SIMILARITY_ROWS минимальных
+значений хеш-функций по id ингредиентов; доля совпавших позиций двух
+сигнатур оценивает коэффициент Жаккара их наборов. Сигнатура режется на
+полосы по SIMILARITY_ROWS значений, хеш каждой полосы - ключ корзины
+(RecipeBucket). Кандидаты в похожие - рецепты, совпавшие хотя бы в одной
+корзине, поэтому поиск не перебирает весь каталог. Больше полос - выше
+полнота, больше строк в полосе - выше точность; порог срабатывания
+примерно (1 / bands) ** (1 / rows). Вместе с сигнатурой хранится форма
+(bands x rows), с которой она посчитана: после изменения настроек
+сигнатуры другой формы не участвуют в поиске, сигнатура самого рецепта
+пересчитывается при запросе, а весь индекс пересобирается командой
+build_similarity_index.
+'''
+import hashlib
+import random
+import struct
+from array import array
+from functools import lru_cache
+
+from django.conf import settings
+
+PRIME = (1 << 61) - 1
+SEED = 20230507
+
+
+def _shape():
+    return settings.SIMILARITY_BANDS, settings.SIMILARITY_ROWS
+
+
+def shape_label(shape=None):
+    '''Форма сигнатуры для RecipeSignature.shape: "32x3"'''
+    bands, rows = shape or _shape()
+    return f'{bands}x{rows}'
+
+
+@lru_cache(maxsize=None)
+def _permutations(count):
+    generator = random.Random(SEED)
+    return tuple((generator.randrange(1, PRIME), generator.randrange(PRIME))
+                 for _ in range(count))
+
+
+@lru_cache(maxsize=8192)
+def _hashes(ingredient_id, count):
+    return tuple((a * ingredient_id + b) % PRIME
+                 for a, b in _permutations(count))
+
+
+def signature(ingredient_ids, shape=None):
+    '''MinHash-сигнатура набора ингредиентов'''
+    bands, rows = shape or _shape()
+    count = bands * rows
+    if not ingredient_ids:
+        return [PRIME] * count
+    return list(map(min, zip(*(_hashes(pk, count)
+                               for pk in ingredient_ids))))
+
+
+def bucket_keys(values, shape=None):
+    '''Ключи LSH-корзин: по одному на полосу сигнатуры'''
+    bands, rows = shape or _shape()
+    keys = []
+    for band in range(bands):
+        chunk = values[band * rows:(band + 1) * rows]
+        digest = hashlib.blake2b(
+            struct.pack(f'<H{rows}Q', band, *chunk), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def estimate(first, second):
+    '''Оценка коэффициента Жаккара по двум сигнатурам'''
+    if len(first) != len(second):
+        return 0.0
+    return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+
+def pack(values):
+    return array('Q', values).tobytes()
+
+
+def unpack(data):
+    values = array('Q')
+    values.frombytes(bytes(data))
+    return list(values)
+
+
+def update_index(recipe_id, ingredient_ids, using='default'):
+    '''Пересчитывает сигнатуру и корзины рецепта; возвращает сигнатуру'''
+    from .models import RecipeBucket, RecipeSignature
+
+    values = signature(sorted(ingredient_ids))
+    RecipeSignature.objects.using(using).update_or_create(
+        recipe_id=recipe_id,
+        defaults={'signature': pack(values), 'shape': shape_label()})
+    RecipeBucket.objects.using(using).filter(recipe_id=recipe_id).delete()
+    RecipeBucket.objects.using(using).bulk_create(
+        RecipeBucket(recipe_id=recipe_id, bucket=key)
+        for key in set(bucket_keys(values)))
+    return values
+
+
+def similar_recipes(recipe_id, limit=10, threshold=None):
+    '''id похожих рецептов с оценкой сходства, по убыванию сходства'''
+    from django.db.models import Count
+
+    from .models import IngredientRecipe, RecipeBucket, RecipeSignature
+
+    if threshold is None:
+        threshold = settings.SIMILARITY_THRESHOLD
+    shape = shape_label()
+    own = RecipeSignature.objects.filter(recipe_id=recipe_id).values_list(
+        'signature', 'shape').first()
+    if own is None:
+        return []
+    if own[1] != shape:
+        # Сигнатура посчитана с другими настройками.
+        values = update_index(recipe_id, IngredientRecipe.objects.filter(
+            recipe_id=recipe_id).values_list('ingredient_id', flat=True))
+    else:
+        values = unpack(own[0])
+    candidates = (
+        RecipeBucket.objects
+        .filter(bucket__in=bucket_keys(values))
+        .exclude(recipe_id=recipe_id)
+        .values('recipe_id')
+        .annotate(hits=Count('id'))
+        .order_by('-hits')
+        .values_list('recipe_id', flat=True)[:settings.SIMILARITY_CANDIDATES]
+    )
+    scored = [
+        (estimate(values, unpack(data)), pk)
+        for pk, data in RecipeSignature.objects.filter(
+            recipe_id__in=list(candidates), shape=shape).values_list(
+                'recipe_id', 'signature')
+    ]
+    scored = [item for item in scored if item[0] >= threshold]
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [(pk, score) for score, pk in scored[:limit]]
@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from foodgram.deletion import bulk_delete
+from jobs.queue import task
+
+from .models import Recipe
+from .shopping_list import shopping_list_document, shopping_list_filename
+
+User = get_user_model()
+
+
+@task('recipes.delete_recipes')
+def delete_recipes(recipe_ids):
+    '''Удаление рецептов вместе со всеми связанными записями'''
+    deleted, _ = bulk_delete(Recipe.objects.filter(pk__in=recipe_ids))
+    return {'deleted': deleted}
+
+
+@task('recipes.export_shopping_cart')
+def export_shopping_cart(user_id):
+    '''Формирование списка покупок пользователя'''
+    user = User.objects.get(pk=user_id)
+    return {'filename': shopping_list_filename(user),
+            'document': shopping_list_document(user)}
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.test import TestCase
+from django.urls import reverse
+from foodgram.testing import ChangelistQueriesMixin
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingСart)
+
+User = get_user_model()
+
+
+class ChangelistQueriesTest(ChangelistQueriesMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г')
+
+    def add_rows(self, count):
+        '''Рецепты со всеми связанными строками от новых пользователей'''
+        start = Recipe.objects.count()
+        for number in range(start, start + count):
+            user = User.objects.create_user(
+                username=f'user{number}', email=f'user{number}@example.com')
+            recipe = Recipe.objects.create(
+                author=user, name=f'Рецепт {number}', image='recipes/x.jpg',
+                text='Текст', cooking_time=10)
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=self.ingredient, amount=100)
+            Favorite.objects.create(user=self.admin, recipe=recipe)
+            ShoppingСart.objects.create(user=user, recipe=recipe)
+
+    def test_recipe_changelist(self):
+        self.assert_constant_queries(Recipe)
+
+    def test_favorite_changelist(self):
+        self.assert_constant_queries(Favorite)
+
+    def test_ingredient_recipe_changelist(self):
+        self.assert_constant_queries(IngredientRecipe)
+
+    def test_shopping_cart_changelist(self):
+        self.assert_constant_queries(ShoppingСart)
+
+
+class BulkDeletePermissionsTest(TestCase):
+    '''Каскадное удаление из админки требует прав на зависимые модели'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', is_staff=True)
+        cls.staff.user_permissions.set(Permission.objects.filter(
+            content_type__app_label='recipes',
+            codename__in=('view_recipe', 'delete_recipe')))
+        cls.recipe = Recipe.objects.create(
+            author=cls.staff, name='Рецепт', image='recipes/x.jpg',
+            text='Текст', cooking_time=10)
+        Favorite.objects.create(user=cls.staff, recipe=cls.recipe)
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+        self.url = reverse('admin:recipes_recipe_delete',
+                           args=(self.recipe.pk,))
+
+    def test_missing_cascade_permission(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['perms_lacking'],
+                         {Favorite._meta.verbose_name})
+        self.assertEqual(self.client.post(self.url, {'post': 'yes'})
+                         .status_code, 403)
+        self.assertTrue(Recipe.objects.filter(pk=self.recipe.pk).exists())
+
+    def test_with_cascade_permission(self):
+        self.staff.user_permissions.add(Permission.objects.get(
+            content_type__app_label='recipes', codename='delete_favorite'))
+        response = self.client.post(self.url, {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Recipe.objects.filter(pk=self.recipe.pk).exists())
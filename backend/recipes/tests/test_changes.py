@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from recipes import changes
+from recipes.models import CollectionChange, Favorite, Recipe, ShoppingСart
+
+User = get_user_model()
+
+
+class ChangeFeedTest(TestCase):
+    '''Журнал изменений избранного и корзины: курсор, граница и сжатие'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com')
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.user, name=f'Рецепт {number}',
+                image='recipes/x.jpg', text='Текст', cooking_time=10)
+            for number in range(3)]
+
+    def feed(self, since, limit=None):
+        return changes.changes_since(self.user, since, limit)
+
+    def test_without_cursor_requires_resync(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipes[0])
+        feed = self.feed(None)
+        self.assertTrue(feed['resync_required'])
+        self.assertEqual(feed['cursor'], 1)
+        self.assertEqual(feed['favorite'], {'added': [], 'removed': []})
+
+    def test_cursor_from_the_future_requires_resync(self):
+        self.assertTrue(self.feed(1)['resync_required'])
+
+    def test_changes_after_cursor(self):
+        first, second, third = self.recipes
+        Favorite.objects.create(user=self.user, recipe=first)
+        cursor = self.feed(None)['cursor']
+        Favorite.objects.create(user=self.user, recipe=second)
+        ShoppingСart.objects.create(user=self.user, recipe=third)
+        Favorite.objects.filter(recipe=first).delete()
+        feed = self.feed(cursor)
+        self.assertFalse(feed['resync_required'])
+        self.assertFalse(feed['has_more'])
+        self.assertEqual(feed['cursor'], 4)
+        self.assertEqual(feed['favorite'],
+                         {'added': [second.pk], 'removed': [first.pk]})
+        self.assertEqual(feed['shopping_cart'],
+                         {'added': [third.pk], 'removed': []})
+        self.assertEqual(self.feed(feed['cursor'])['favorite'],
+                         {'added': [], 'removed': []})
+
+    def test_latest_change_per_recipe(self):
+        recipe = self.recipes[0]
+        for _ in range(2):
+            Favorite.objects.create(user=self.user, recipe=recipe)
+            Favorite.objects.filter(recipe=recipe).delete()
+        self.assertEqual(self.feed(0)['favorite'],
+                         {'added': [], 'removed': [recipe.pk]})
+
+    def test_pages(self):
+        for recipe in self.recipes:
+            Favorite.objects.create(user=self.user, recipe=recipe)
+        page = self.feed(0, limit=2)
+        self.assertTrue(page['has_more'])
+        self.assertEqual(page['cursor'], 2)
+        self.assertEqual(page['favorite']['added'],
+                         [recipe.pk for recipe in self.recipes[:2]])
+        page = self.feed(page['cursor'], limit=2)
+        self.assertFalse(page['has_more'])
+        self.assertEqual(page['cursor'], 3)
+        self.assertEqual(page['favorite']['added'], [self.recipes[2].pk])
+
+    def test_compact_superseded(self):
+        recipe = self.recipes[0]
+        Favorite.objects.create(user=self.user, recipe=recipe)
+        Favorite.objects.filter(recipe=recipe).delete()
+        ShoppingСart.objects.create(user=self.user, recipe=recipe)
+        self.assertEqual(changes.compact(), (1, 0))
+        self.assertEqual(
+            list(CollectionChange.objects.order_by('version').values_list(
+                'collection', 'added', 'version')),
+            [(CollectionChange.FAVORITE, False, 2),
+             (CollectionChange.SHOPPING_CART, True, 3)])
+        # Курсор до сжатия по-прежнему действителен.
+        self.assertEqual(self.feed(0)['favorite'],
+                         {'added': [], 'removed': [recipe.pk]})
+        self.assertEqual(changes.compact(), (0, 0))
+
+    def test_compact_expired_moves_floor(self):
+        first, second, _ = self.recipes
+        Favorite.objects.create(user=self.user, recipe=first)
+        Favorite.objects.create(user=self.user, recipe=second)
+        CollectionChange.objects.filter(version=1).update(
+            created=timezone.now() - timedelta(days=31))
+        self.assertEqual(changes.compact(retention_days=30), (0, 1))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.changes_floor, 1)
+        self.assertTrue(self.feed(0)['resync_required'])
+        self.assertEqual(self.feed(1)['favorite'],
+                         {'added': [second.pk], 'removed': []})
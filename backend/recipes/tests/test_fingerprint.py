@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from api.serializers import RecipeCreateSerializer
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import TestCase
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.exceptions import ValidationError
+
+User = get_user_model()
+
+
+class MakeFingerprintTest(TestCase):
+
+    def test_normalized_name(self):
+        fingerprint = Recipe.make_fingerprint(
+            'Ёжик в тумане', 10, [(1, 100), (2, 5)])
+        self.assertEqual(Recipe.make_fingerprint(
+            '  ежик,  В ТУМАНЕ!', 10, [(2, 5), (1, 100)]), fingerprint)
+
+    def test_content_matters(self):
+        fingerprint = Recipe.make_fingerprint('Суп', 10, [(1, 100)])
+        for other in (('Борщ', 10, [(1, 100)]),
+                      ('Суп', 20, [(1, 100)]),
+                      ('Суп', 10, [(1, 200)]),
+                      ('Суп', 10, [(1, 100), (2, 1)])):
+            with self.subTest(other=other):
+                self.assertNotEqual(
+                    Recipe.make_fingerprint(*other), fingerprint)
+
+
+class DuplicateRecipeTest(TestCase):
+    '''Повторная отправка того же рецепта не создает второй'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='cook', email='cook@example.com')
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#f4a261', slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г')
+
+    def serializer(self, instance=None):
+        return RecipeCreateSerializer(instance, context={
+            'request': SimpleNamespace(user=self.author)})
+
+    def data(self, name='Блины', amount=200):
+        return {
+            'name': name, 'text': 'Текст', 'cooking_time': 30,
+            'image': 'recipes/x.jpg', 'tags': [self.tag],
+            'ingredients': [{'id': self.ingredient.pk, 'amount': amount}],
+        }
+
+    def test_resubmission_returns_existing(self):
+        recipe = self.serializer().create(self.data())
+        self.assertEqual(self.serializer().create(self.data('блины!')),
+                         recipe)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_different_recipe_is_created(self):
+        self.serializer().create(self.data())
+        self.serializer().create(self.data(amount=300))
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_parallel_create_returns_winner(self):
+        '''Параллельный запрос создал рецепт между проверкой и вставкой:
+        IntegrityError дает уже созданный рецепт'''
+        winner = self.serializer().create(self.data())
+        lookup = Recipe.objects.filter
+        misses = [Recipe.objects.none()]
+
+        def filter_after_parallel(*args, **kwargs):
+            return misses.pop() if misses else lookup(*args, **kwargs)
+
+        with mock.patch.object(Recipe.objects, 'filter',
+                               side_effect=filter_after_parallel):
+            recipe = self.serializer().create(self.data())
+        self.assertFalse(misses)
+        self.assertEqual(recipe, winner)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_other_integrity_errors_are_raised(self):
+        with mock.patch.object(Recipe.objects, 'create',
+                               side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                self.serializer().create(self.data())
+
+    def test_update_to_duplicate_is_rejected(self):
+        self.serializer().create(self.data())
+        other = self.serializer().create(self.data('Оладьи'))
+        with self.assertRaises(ValidationError):
+            self.serializer(other).update(other, self.data())
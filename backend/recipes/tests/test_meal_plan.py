@@ -0,0 +1,117 @@
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TransactionTestCase
+from foodgram.deletion import bulk_delete
+from recipes import meal_plan
+from recipes.models import (Ingredient, IngredientRecipe, MealPlanDayTotal,
+                            MealPlanEntry, Recipe)
+
+User = get_user_model()
+
+MONDAY = date(2024, 1, 1)
+TUESDAY = date(2024, 1, 2)
+
+
+class DayTotalsTest(TransactionTestCase):
+    '''Итоги дней плана питания меняются вместе с записями и рецептами.
+
+    Пересчеты выполняются после фиксации транзакции, поэтому тест
+    работает без общей транзакции TestCase.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='cook', email='cook@example.com')
+        self.flour = Ingredient.objects.create(
+            name='Мука', measurement_unit='г')
+        self.milk = Ingredient.objects.create(
+            name='Молоко', measurement_unit='мл')
+        self.pancakes = self.recipe('Блины', flour=200, milk=500)
+        self.bread = self.recipe('Хлеб', flour=300)
+
+    def recipe(self, name, **amounts):
+        recipe = Recipe.objects.create(
+            author=self.user, name=name, image='recipes/x.jpg',
+            text='Текст', cooking_time=10)
+        for ingredient, amount in amounts.items():
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=getattr(self, ingredient),
+                amount=amount)
+        return recipe
+
+    def plan(self, recipe, day=MONDAY, multiplier=1):
+        return MealPlanEntry.objects.create(
+            user=self.user, recipe=recipe, date=day,
+            multiplier=Decimal(multiplier))
+
+    def totals(self):
+        return {
+            (day, ingredient): amount
+            for day, ingredient, amount in
+            MealPlanDayTotal.objects.values_list(
+                'date', 'ingredient__name', 'amount')
+        }
+
+    def test_add_entries(self):
+        self.plan(self.pancakes, multiplier='1.5')
+        self.plan(self.bread)
+        self.assertEqual(self.totals(), {
+            (MONDAY, 'Мука'): 600, (MONDAY, 'Молоко'): 750})
+
+    def test_change_multiplier(self):
+        entry = self.plan(self.pancakes)
+        self.plan(self.bread)
+        entry.multiplier = Decimal(2)
+        entry.save()
+        self.assertEqual(self.totals(), {
+            (MONDAY, 'Мука'): 700, (MONDAY, 'Молоко'): 1000})
+
+    def test_move_to_other_day(self):
+        entry = self.plan(self.pancakes)
+        self.plan(self.bread)
+        entry.date = TUESDAY
+        entry.save()
+        self.assertEqual(self.totals(), {
+            (MONDAY, 'Мука'): 300,
+            (TUESDAY, 'Мука'): 200, (TUESDAY, 'Молоко'): 500})
+
+    def test_delete_entry(self):
+        entry = self.plan(self.pancakes)
+        self.plan(self.bread)
+        entry.delete()
+        self.assertEqual(self.totals(), {(MONDAY, 'Мука'): 300})
+
+    def test_recipe_ingredients_change(self):
+        self.plan(self.pancakes, multiplier=2)
+        with mock.patch.object(meal_plan, 'recipes_changed',
+                               wraps=meal_plan.recipes_changed) as changed:
+            with transaction.atomic():
+                IngredientRecipe.objects.filter(
+                    recipe=self.pancakes, ingredient=self.milk).delete()
+                row = IngredientRecipe.objects.get(
+                    recipe=self.pancakes, ingredient=self.flour)
+                row.amount = 250
+                row.save()
+        # Один пересчет после фиксации, сколько бы строк ни изменилось.
+        changed.assert_called_once_with({self.pancakes.pk}, 'default')
+        self.assertEqual(self.totals(), {(MONDAY, 'Мука'): 500})
+
+    def test_rollback_does_not_lose_refresh(self):
+        self.plan(self.pancakes)
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                IngredientRecipe.objects.filter(ingredient=self.milk).delete()
+                raise ValueError
+        IngredientRecipe.objects.filter(ingredient=self.flour).delete()
+        self.assertEqual(self.totals(), {(MONDAY, 'Молоко'): 500})
+
+    def test_bulk_delete_of_ingredients(self):
+        self.plan(self.pancakes)
+        self.plan(self.bread, TUESDAY)
+        bulk_delete(IngredientRecipe.objects.filter(ingredient=self.milk))
+        self.assertEqual(self.totals(), {
+            (MONDAY, 'Мука'): 200, (TUESDAY, 'Мука'): 300})
@@ -0,0 +1,75 @@
+from django.test import SimpleTestCase
+from recipes.search import NgramIndex, bounded_distance
+
+NAMES = (
+    'Мука пшеничная',
+    'Мука ржаная',
+    'Сгущенное молоко',
+    'Молоко',
+    'Сметана',
+    'Сыр пармезан',
+    'Ёжевика',
+)
+
+
+class BoundedDistanceTest(SimpleTestCase):
+
+    def test_bounded_distance(self):
+        cases = (
+            ('молоко', 'молоко', 2, 0),
+            ('малоко', 'молоко', 2, 1),
+            ('молко', 'молоко', 2, 1),
+            ('мллоко', 'молоко', 2, 1),
+            ('смитана', 'сметана', 1, 1),
+            ('пармезан', 'пармизон', 2, 2),
+            # Больше limit правок - limit + 1, в том числе по длине.
+            ('пармезан', 'пармизон', 1, 2),
+            ('сыр', 'сырники', 2, 3),
+            ('', 'мука', 4, 4),
+        )
+        for first, second, limit, expected in cases:
+            with self.subTest(first=first, second=second, limit=limit):
+                self.assertEqual(
+                    bounded_distance(first, second, limit), expected)
+
+
+class NgramIndexTest(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.index = NgramIndex(NAMES)
+
+    def names(self, query, limit=10):
+        return [NAMES[position]
+                for position, _ in self.index.search(query, limit)]
+
+    def test_match_at_start_first(self):
+        self.assertEqual(self.names('молоко'),
+                         ['Молоко', 'Сгущенное молоко'])
+
+    def test_typos(self):
+        self.assertEqual(self.names('малоко'),
+                         ['Молоко', 'Сгущенное молоко'])
+        self.assertEqual(self.names('смитана'), ['Сметана'])
+
+    def test_prefix_of_last_word(self):
+        self.assertEqual(self.names('мука пшен'), ['Мука пшеничная'])
+        self.assertEqual(self.names('пармез'), ['Сыр пармезан'])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.names('мука молоко'), [])
+
+    def test_short_words_need_exact_match(self):
+        self.assertEqual(self.names('сир'), [])
+
+    def test_yo_and_case(self):
+        self.assertEqual(self.names('ЕЖЕВИКА'), ['Ёжевика'])
+
+    def test_limit_and_scores(self):
+        results = self.index.search('мука', 1)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][1], 1.0)
+
+    def test_empty_query(self):
+        self.assertEqual(self.index.search(' , ', 10), [])
@@ -0,0 +1,87 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from recipes.models import (Ingredient, IngredientRecipe, Recipe, ShoppingСart,
+                            UnitConversion)
+from recipes.shopping_list import format_amount, shopping_list_items
+
+User = get_user_model()
+
+
+class ShoppingListItemsTest(TestCase):
+    '''Сводный список покупок: множители порций и пересчет единиц'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com')
+        cls.ingredients = {
+            unit: Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (('Мука', 'г'), ('Мука', 'кг'),
+                               ('Молоко', 'мл'), ('Молоко', 'л'),
+                               ('Соль', 'щепотка'))}
+
+    def add_recipe(self, multiplier, **amounts):
+        '''Рецепт с ингредиентами {единица: количество} в корзине'''
+        recipe = Recipe.objects.create(
+            author=self.user, name=f'Рецепт {Recipe.objects.count()}',
+            image='recipes/x.jpg', text='Текст', cooking_time=10)
+        for unit, amount in amounts.items():
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=self.ingredients[unit],
+                amount=amount)
+        ShoppingСart.objects.create(
+            user=self.user, recipe=recipe, multiplier=Decimal(multiplier))
+        return recipe
+
+    def items(self):
+        return [(name, format_amount(total), unit)
+                for name, total, unit in shopping_list_items(self.user)]
+
+    def test_empty_cart(self):
+        self.assertEqual(shopping_list_items(self.user), [])
+
+    def test_multipliers(self):
+        self.add_recipe('1.5', г=200)
+        self.add_recipe('0.25', г=100)
+        self.assertEqual(self.items(), [('Мука', '325', 'г')])
+
+    def test_grams_and_kilograms_merge(self):
+        self.add_recipe('1', г=500)
+        self.add_recipe('0.5', кг=3)
+        self.assertEqual(self.items(), [('Мука', '2000', 'г')])
+
+    def test_millilitres_and_litres_merge(self):
+        self.add_recipe('2', мл=250, л=1)
+        self.assertEqual(self.items(), [('Молоко', '2500', 'мл')])
+
+    def test_unit_without_conversion(self):
+        self.add_recipe('3', г=100, щепотка=1)
+        self.assertEqual(self.items(), [('Мука', '300', 'г'),
+                                        ('Соль', '3', 'щепотка')])
+
+    def test_empty_conversion_table(self):
+        UnitConversion.objects.all().delete()
+        self.add_recipe('1', г=500, кг=1)
+        self.add_recipe('2', кг=1)
+        self.assertEqual(self.items(), [('Мука', '500', 'г'),
+                                        ('Мука', '3', 'кг')])
+
+
+class FormatAmountTest(TestCase):
+
+    def test_format_amount(self):
+        cases = (
+            (Decimal('1500'), '1500'),
+            (Decimal('1500.000000'), '1500'),
+            (Decimal('0.5000'), '0.5'),
+            (Decimal('2.25'), '2.25'),
+            (Decimal('0.666'), '0.67'),
+            (Decimal('0.333'), '0.33'),
+            (Decimal('0.001'), '0'),
+            (3, '3'),
+        )
+        for value, expected in cases:
+            with self.subTest(value=value):
+                self.assertEqual(format_amount(value), expected)
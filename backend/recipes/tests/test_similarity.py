@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from recipes import similarity
+from recipes.models import (Ingredient, IngredientRecipe, Recipe,
+                            RecipeSignature)
+
+User = get_user_model()
+
+
+class SignatureShapeTest(TestCase):
+    '''Сигнатуры другой формы (bands x rows) не сравниваются с текущими'''
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='cook', email='cook@example.com')
+        ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('Мука', 'Сахар', 'Соль', 'Масло')]
+        cls.recipes = []
+        for number in range(2):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}',
+                image='recipes/x.jpg', text='Текст', cooking_time=10)
+            for ingredient in ingredients:
+                IngredientRecipe.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=100)
+            similarity.update_index(
+                recipe.pk, [ingredient.pk for ingredient in ingredients])
+            cls.recipes.append(recipe)
+
+    def test_same_shape(self):
+        first, second = self.recipes
+        self.assertEqual(similarity.similar_recipes(first.pk),
+                         [(second.pk, 1.0)])
+
+    @override_settings(SIMILARITY_BANDS=16, SIMILARITY_ROWS=4)
+    def test_other_shape(self):
+        first, second = self.recipes
+        self.assertEqual(similarity.similar_recipes(first.pk), [])
+        self.assertEqual(RecipeSignature.objects.get(pk=first.pk).shape,
+                         '16x4')
+        similarity.update_index(second.pk, IngredientRecipe.objects.filter(
+            recipe=second).values_list('ingredient_id', flat=True))
+        self.assertEqual(similarity.similar_recipes(first.pk),
+                         [(second.pk, 1.0)])
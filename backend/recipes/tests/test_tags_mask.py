@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from recipes.models import Recipe, Tag
+
+User = get_user_model()
+
+
+class TagsMaskTest(TestCase):
+    '''Recipe.tags_mask следует за тегами рецепта с обеих сторон связи'''
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='cook', email='cook@example.com')
+        cls.tags = [
+            Tag.objects.create(name=name, color='#f4a261', slug=slug)
+            for name, slug in (('Завтрак', 'breakfast'), ('Обед', 'lunch'),
+                               ('Ужин', 'dinner'))]
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}',
+                image='recipes/x.jpg', text='Текст', cooking_time=10)
+            for number in range(2)]
+
+    def masks(self):
+        return [Recipe.objects.get(pk=recipe.pk).tags_mask
+                for recipe in self.recipes]
+
+    def mask(self, *tags):
+        return sum(1 << tag.bit for tag in tags)
+
+    def test_bits_are_distinct(self):
+        self.assertEqual(len({tag.bit for tag in self.tags}), 3)
+
+    def test_recipe_side(self):
+        breakfast, lunch, dinner = self.tags
+        recipe = self.recipes[0]
+        recipe.tags.add(breakfast, dinner)
+        self.assertEqual(recipe.tags_mask, self.mask(breakfast, dinner))
+        recipe.tags.remove(breakfast)
+        self.assertEqual(self.masks()[0], self.mask(dinner))
+        recipe.tags.set([lunch])
+        self.assertEqual(self.masks()[0], self.mask(lunch))
+        recipe.tags.clear()
+        self.assertEqual(self.masks(), [0, 0])
+
+    def test_tag_side(self):
+        breakfast, lunch, _ = self.tags
+        self.recipes[0].tags.add(lunch)
+        breakfast.recipe_set.add(*self.recipes)
+        self.assertEqual(self.masks(), [self.mask(breakfast, lunch),
+                                        self.mask(breakfast)])
+        breakfast.recipe_set.remove(self.recipes[1])
+        self.assertEqual(self.masks(), [self.mask(breakfast, lunch), 0])
+
+    def test_tag_side_clear(self):
+        breakfast, lunch, _ = self.tags
+        breakfast.recipe_set.add(*self.recipes)
+        lunch.recipe_set.add(self.recipes[0])
+        breakfast.recipe_set.clear()
+        self.assertEqual(self.masks(), [self.mask(lunch), 0])
+
+    def test_tag_delete(self):
+        breakfast, lunch, _ = self.tags
+        self.recipes[0].tags.add(breakfast, lunch)
+        breakfast.delete()
+        self.assertEqual(self.masks()[0], self.mask(lunch))
@@ -1,22 +1,30 @@
 from django.contrib import admin
+from foodgram.deletion import BulkDeleteAdminMixin
+from foodgram.paginator import EstimatedCountPaginator
 
 from . import models
 
 
 @admin.register(models.User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(BulkDeleteAdminMixin, admin.ModelAdmin):
     '''Админка для модели пользователей'''
     list_display = (
         'username', 'pk', 'email', 'password', 'first_name', 'last_name',
     )
     list_editable = ('password', )
-    list_filter = ('username', 'email')
+    list_filter = ('is_staff', 'is_active')
     search_fields = ('username', 'email')
     empty_value_display = '-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(models.Subscribe)
 class SubscribeAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'author')
-    list_editable = ('user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    autocomplete_fields = ('user', 'author')
     empty_value_display = '-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,66 @@
+'''Денормализованные счетчики пользователя.
+
+followers_count, following_count и recipes_count меняются сигналами при
+создании и удалении подписок и рецептов (в той же транзакции, через
+UPDATE ... SET x = x + n), а при удалении пачками - хуками bulk_delete.
+Расхождения исправляет команда reconcile_user_counters.
+'''
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+
+FIELDS = ('followers_count', 'following_count', 'recipes_count')
+
+
+def change(model, field, counts):
+    '''Прибавляет к счетчику field пользователей значения из counts
+    ({id: изменение}); отрицательный результат обрезается до нуля'''
+    for pk, delta in counts.items():
+        if delta:
+            model.objects.filter(pk=pk).update(
+                **{field: Greatest(F(field) + delta, Value(0))})
+
+
+def actual(user_model, subscribe_model, recipe_model, pks):
+    '''Счетчики пользователей pks, посчитанные по таблицам'''
+    counts = {pk: dict.fromkeys(FIELDS, 0) for pk in pks}
+    sources = (
+        ('followers_count', subscribe_model, 'author_id'),
+        ('following_count', subscribe_model, 'user_id'),
+        ('recipes_count', recipe_model, 'author_id'),
+    )
+    for field, model, column in sources:
+        rows = (model.objects.filter(**{f'{column}__in': pks})
+                .values(column).annotate(total=Count('pk')).order_by())
+        for row in rows:
+            counts[row[column]][field] = row['total']
+    return counts
+
+
+def reconcile(user_model, subscribe_model, recipe_model, batch_size=1000):
+    '''Пересчитывает счетчики пачками; возвращает число исправленных'''
+    fixed = 0
+    last_pk = 0
+    while True:
+        users = list(user_model.objects.filter(pk__gt=last_pk)
+                     .order_by('pk').only('pk', *FIELDS)[:batch_size])
+        if not users:
+            return fixed
+        last_pk = users[-1].pk
+        counts = actual(user_model, subscribe_model, recipe_model,
+                        [user.pk for user in users])
+        changed = []
+        for user in users:
+            values = counts[user.pk]
+            if any(getattr(user, field) != values[field]
+                   for field in FIELDS):
+                for field in FIELDS:
+                    setattr(user, field, values[field])
+                changed.append(user)
+        user_model.objects.bulk_update(changed, FIELDS)
+        fixed += len(changed)
+
+
+def grouped(queryset, column):
+    '''{id: число строк} по столбцу column'''
+    return dict(queryset.values(column).annotate(total=Count('pk'))
+                .order_by().values_list(column, 'total'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+from users.counters import reconcile
+from users.models import Subscribe, User
+
+
+class Command(BaseCommand):
+    help = ('Recount followers_count, following_count and recipes_count '
+            'of users from the tables and fix drifted values.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = reconcile(User, Subscribe, Recipe, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Users fixed: {fixed}.'))
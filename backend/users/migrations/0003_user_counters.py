@@ -0,0 +1,42 @@
+# Generated by Django 3.2.18 on 2026-10-19 09:37
+
+from django.db import migrations, models
+
+from users.counters import reconcile
+
+
+def fill_counters(apps, schema_editor):
+    reconcile(apps.get_model('users', 'User'),
+              apps.get_model('users', 'Subscribe'),
+              apps.get_model('recipes', 'Recipe'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_shopping_cart_version'),
+        ('recipes', '0008_recipe_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписок'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Рецептов'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-followers_count', 'id'], name='user_popular_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
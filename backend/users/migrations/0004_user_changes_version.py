@@ -0,0 +1,23 @@
+# Generated by Django 3.2.18 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='changes_floor',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Версия, до которой журнал сжат'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='changes_version',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Версия журнала изменений списков'),
+        ),
+    ]
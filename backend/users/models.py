@@ -4,11 +4,39 @@ from django.db import models
 
 class User(AbstractUser):
     email = models.EmailField(max_length=250, unique=True)
+    shopping_cart_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия списка покупок')
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков')
+    following_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписок')
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецептов')
+    changes_version = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия журнала изменений списков')
+    changes_floor = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия, до которой журнал сжат')
 
     class Meta:
         ordering = ['id']
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
+        indexes = [
+            models.Index(fields=['-followers_count', 'id'],
+                         name='user_popular_idx'),
+        ]
 
     def __str__(self):
         return self.username
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from foodgram.deletion import bulk_delete_hook
+
+from . import counters
+from .models import Subscribe, User
+
+
+@receiver(post_save, sender=Subscribe)
+def count_subscription(sender, instance, created, **kwargs):
+    if created:
+        counters.change(User, 'followers_count', {instance.author_id: 1})
+        counters.change(User, 'following_count', {instance.user_id: 1})
+
+
+@receiver(post_delete, sender=Subscribe)
+def uncount_subscription(sender, instance, **kwargs):
+    counters.change(User, 'followers_count', {instance.author_id: -1})
+    counters.change(User, 'following_count', {instance.user_id: -1})
+
+
+@bulk_delete_hook(Subscribe)
+def uncount_subscriptions(queryset):
+    for field, column in (('followers_count', 'author_id'),
+                          ('following_count', 'user_id')):
+        counts = counters.grouped(queryset, column)
+        counters.change(User, field, {pk: -total
+                                      for pk, total in counts.items()})
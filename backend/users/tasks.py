@@ -0,0 +1,11 @@
+from foodgram.deletion import bulk_delete
+from jobs.queue import task
+
+from .models import User
+
+
+@task('users.delete_users')
+def delete_users(user_ids):
+    '''Удаление пользователей со всеми рецептами, подписками и т.д.'''
+    deleted, _ = bulk_delete(User.objects.filter(pk__in=user_ids))
+    return {'deleted': deleted}
@@ -0,0 +1,20 @@
+from django.test import TestCase
+from foodgram.testing import ChangelistQueriesMixin
+from users.models import Subscribe, User
+
+
+class ChangelistQueriesTest(ChangelistQueriesMixin, TestCase):
+
+    def add_rows(self, count):
+        '''Новые пользователи, подписанные на администратора'''
+        start = User.objects.count()
+        for number in range(start, start + count):
+            user = User.objects.create_user(
+                username=f'user{number}', email=f'user{number}@example.com')
+            Subscribe.objects.create(user=user, author=self.admin)
+
+    def test_user_changelist(self):
+        self.assert_constant_queries(User)
+
+    def test_subscribe_changelist(self):
+        self.assert_constant_queries(Subscribe)